@@ -12,7 +12,11 @@ def get_recv_latency(experiment: Experiment):
 
 
 def get_number_of_dropped_tuples(experiment: Experiment):
-    return experiment.sink_data['measurements'][0]['number_of_tuples_recv'] - experiment.source_data.number_of_tuples_passing_the_filter
+    measurement = experiment.sink_data['measurements'][0]
+    # the sink verifies the delivered tuple ids, older experiments only allow comparing the counters
+    if measurement.get('delivery') is not None:
+        return measurement['delivery']['number_of_lost_tuples']
+    return measurement['number_of_tuples_recv'] - experiment.source_data.number_of_tuples_passing_the_filter
 
 def p99_latency(values: [float]):
     latencies_sorted = sorted(values)  # sort the latencies
@@ -1,10 +1,15 @@
 import datetime
 import json
+import sys
 from typing import Optional, List
 from pathlib import Path
 
 from get_from_gcp import get_bucket, get_blobs_by_id
 
+# measurements are decoded by the same module the source and sink encode them with
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from testbench.common.arrays import decode
+
 
 # class ControlMeasurements:
 #     uut_serial_log: str
@@ -38,6 +43,11 @@ from get_from_gcp import get_bucket, get_blobs_by_id
 #     packets_received: int
 #     packets_dropped_in: int
 #     packets_dropped_out: int
+#
+#
+# Tuples on the wire (see testbench/README.md): "b" is the tuple id, "c" the source timestamp in microseconds truncated
+# to int32. Binary tuples of experiments with per-tuple latencies do not carry the third dataset column, older binary
+# experiments have it in "c" and no source timestamp.
 
 
 class Experiment:
@@ -92,4 +102,11 @@ def load_from_folder(id: str) -> Optional[Experiment]:
 
 def load_data_from_json(file: str) -> dict:
     with open(file, 'r') as fd:
-        return json.loads(fd.read())
\ No newline at end of file
+        data = json.loads(fd.read())
+
+    for measurement in data.get('measurements', []):
+        for key, value in measurement.items():
+            # compact arrays and id sets are expanded into plain lists
+            measurement[key] = decode(value)
+    return data
+
@@ -0,0 +1,214 @@
+####
+####### This Script contains compact storage for measurements
+####
+
+import base64
+import zlib
+
+import numpy as np
+
+INITIAL_CAPACITY = 4096
+COMPRESSION_LEVEL = 1
+
+
+def encode_bytes(data) -> str:
+    return base64.b64encode(zlib.compress(data, COMPRESSION_LEVEL)).decode('ascii')
+
+
+def decode_bytes(data: str) -> bytes:
+    return zlib.decompress(base64.b64decode(data))
+
+
+class GrowableArray:
+    """
+    Typed append-only array. Storage is preallocated and doubles whenever it is full, values are stored unboxed.
+    """
+
+    def __init__(self, dtype=np.float64, capacity: int = INITIAL_CAPACITY) -> None:
+        super().__init__()
+        self.data = np.empty(max(1, capacity), dtype=dtype)
+        self.length = 0
+
+    @staticmethod
+    def from_numpy(values: np.ndarray) -> 'GrowableArray':
+        array = GrowableArray(values.dtype, len(values))
+        array.extend(values)
+        return array
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, item):
+        return self.to_numpy()[item]
+
+    def __iter__(self):
+        return iter(self.to_numpy())
+
+    def grow(self, minimum_capacity: int):
+        capacity = len(self.data)
+        while capacity < minimum_capacity:
+            capacity *= 2
+        data = np.empty(capacity, dtype=self.data.dtype)
+        data[:self.length] = self.data[:self.length]
+        self.data = data
+
+    def append(self, value):
+        if self.length == len(self.data):
+            self.grow(self.length + 1)
+        self.data[self.length] = value
+        self.length += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        if self.length + len(values) > len(self.data):
+            self.grow(self.length + len(values))
+        self.data[self.length:self.length + len(values)] = values
+        self.length += len(values)
+
+    def to_numpy(self) -> np.ndarray:
+        return self.data[:self.length]
+
+    def tolist(self) -> list:
+        return self.to_numpy().tolist()
+
+    def encode(self) -> dict:
+        values = self.to_numpy()
+        return {
+            "encoding": "array",
+            "dtype": values.dtype.newbyteorder('<').str,
+            "length": self.length,
+            "data": encode_bytes(values.astype(values.dtype.newbyteorder('<')).tobytes()),
+        }
+
+
+class IdSet:
+    """
+    Set of tuple ids stored as a bitmap relative to the first id that was added. Ids are expected to be mostly
+    ascending, the bitmap grows geometrically in both directions.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.offset = None
+        self.bits = bytearray()
+
+    def make_room(self, first_id: int, last_id: int):
+        if self.offset is None:
+            # keep the offset byte aligned with the ids, so ranges of ids map onto whole bytes
+            self.offset = first_id - first_id % 8
+            self.bits = bytearray(INITIAL_CAPACITY)
+
+        if first_id < self.offset:
+            missing = (self.offset - first_id + 7) // 8
+            prepend = max(missing, len(self.bits))
+            self.bits[0:0] = bytes(prepend)
+            self.offset -= prepend * 8
+
+        last_byte = (last_id - self.offset) >> 3
+        if last_byte >= len(self.bits):
+            capacity = len(self.bits)
+            while capacity <= last_byte:
+                capacity *= 2
+            self.bits.extend(bytes(capacity - len(self.bits)))
+
+    def append(self, tuple_id: int):
+        index = tuple_id - self.offset if self.offset is not None else -1
+        if index < 0 or (index >> 3) >= len(self.bits):
+            self.make_room(tuple_id, tuple_id)
+            index = tuple_id - self.offset
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def add_mask(self, first_id: int, mask: np.ndarray) -> int:
+        """
+        Adds `first_id + i` for every i where mask[i] is set and returns how many of them were already contained.
+        """
+        if len(mask) == 0:
+            return 0
+        self.make_room(first_id, first_id + len(mask) - 1)
+
+        start = first_id - self.offset
+        first_byte = start >> 3
+        last_byte = (start + len(mask) - 1) >> 3
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        region = np.unpackbits(bits[first_byte:last_byte + 1], bitorder='little')
+        contained = int(np.count_nonzero(region[start & 7:(start & 7) + len(mask)] & mask))
+        region[start & 7:(start & 7) + len(mask)] |= mask.astype(np.uint8)
+        bits[first_byte:last_byte + 1] = np.packbits(region, bitorder='little')
+        return contained
+
+    def add_ids(self, ids: np.ndarray) -> int:
+        """
+        Adds all `ids` and returns how many of them were already contained, including repetitions within `ids`.
+        """
+        if len(ids) == 0:
+            return 0
+        self.make_room(int(ids.min()), int(ids.max()))
+
+        first_byte = (int(ids.min()) - self.offset) >> 3
+        last_byte = (int(ids.max()) - self.offset) >> 3
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        region = np.unpackbits(bits[first_byte:last_byte + 1], bitorder='little')
+        contained_before = int(np.count_nonzero(region))
+        region[ids - self.offset - first_byte * 8] = 1
+        added = int(np.count_nonzero(region)) - contained_before
+        bits[first_byte:last_byte + 1] = np.packbits(region, bitorder='little')
+        return len(ids) - added
+
+    def update(self, other: 'IdSet') -> int:
+        # returns the number of ids contained in both sets
+        if other.offset is None:
+            return 0
+        return self.add_mask(other.offset, other.bitmap())
+
+    def bitmap(self) -> np.ndarray:
+        return np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), bitorder='little').astype(bool)
+
+    def to_numpy(self) -> np.ndarray:
+        if self.offset is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.bitmap()) + self.offset
+
+    def __len__(self) -> int:
+        return int(np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8)).sum())
+
+    def tolist(self) -> list:
+        return self.to_numpy().tolist()
+
+    def ranges(self) -> np.ndarray:
+        # [start, end) of every run of consecutive ids
+        if self.offset is None:
+            return np.empty((0, 2), dtype=np.int64)
+        padded = np.concatenate(([False], self.bitmap(), [False])).astype(np.int8)
+        changes = np.flatnonzero(np.diff(padded))
+        return changes.reshape(-1, 2) + self.offset
+
+    def encode(self) -> dict:
+        # the smaller of both representations is emitted
+        ranges = self.ranges()
+        used_bytes = len(self.bits)
+        if self.offset is not None:
+            used_bytes = (int(ranges[-1, 1]) - self.offset + 7) // 8 if len(ranges) > 0 else 0
+
+        bitmap = encode_bytes(bytes(self.bits[:used_bytes]))
+        if len(ranges) * 2 * 8 < len(bitmap):
+            return {"encoding": "ranges", "ranges": ranges.tolist()}
+
+        return {"encoding": "bitmap", "offset": self.offset or 0, "data": bitmap}
+
+
+def decode(value):
+    """
+    Inverse of GrowableArray.encode / IdSet.encode, plain values are returned unchanged.
+    """
+    if not isinstance(value, dict) or "encoding" not in value:
+        return value
+
+    if value["encoding"] == "array":
+        return np.frombuffer(decode_bytes(value["data"]), dtype=np.dtype(value["dtype"]))[:value["length"]].tolist()
+    if value["encoding"] == "ranges":
+        return [i for start, end in value["ranges"] for i in range(start, end)]
+    if value["encoding"] == "bitmap":
+        bits = np.unpackbits(np.frombuffer(decode_bytes(value["data"]), dtype=np.uint8), bitorder='little')
+        return (np.flatnonzero(bits) + value["offset"]).tolist()
+
+    raise ValueError(f"Unknown encoding: {value['encoding']}")
@@ -0,0 +1,96 @@
+####
+####### This Script contains the local dataset cache
+####
+
+import os
+import threading
+
+import numpy as np
+
+import testbench.common.CustomGoogleCloudStorage as gcs
+
+CACHE_DIRECTORY = "/tmp/dataset-cache"
+# Least recently used datasets are evicted once the cache grows beyond this size
+MAX_CACHE_SIZE_IN_BYTES = 4 * 1024 * 1024 * 1024
+NUMBER_OF_COLUMNS = 5
+
+# Datasets are stored column by column as (NUMBER_OF_COLUMNS, number_of_tuples) native int32 arrays
+COLUMN_DTYPE = np.int32
+
+
+class DatasetCache:
+
+    def __init__(self, directory: str = CACHE_DIRECTORY, max_size_in_bytes: int = MAX_CACHE_SIZE_IN_BYTES) -> None:
+        super().__init__()
+        self.directory = directory
+        self.max_size_in_bytes = max_size_in_bytes
+        self.lock = threading.Lock()
+
+    def path(self, dataset_id: str) -> str:
+        return os.path.join(self.directory, f"{dataset_id}.npy")
+
+    def get(self, dataset_id: str, download=gcs.downloadDataset) -> np.ndarray:
+        """
+        Returns the columns of a dataset as a read only memory mapped array. On a cache miss the legacy pickle is
+        downloaded once and converted into the columnar format.
+        """
+        with self.lock:
+            path = self.path(dataset_id)
+            if not os.path.exists(path):
+                self.store(dataset_id, download(dataset_id))
+            else:
+                # mark as recently used
+                os.utime(path)
+
+            columns = np.load(path, mmap_mode='r')
+            self.evict(keep=path)
+            return columns
+
+    def store(self, dataset_id: str, data):
+        os.makedirs(self.directory, exist_ok=True)
+        columns = to_columns(data)
+        path = self.path(dataset_id)
+        # write to a temporary file first, so a crash never leaves a truncated dataset behind
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, columns)
+        os.replace(tmp_path, path)
+
+    def evict(self, keep: str):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_in_bytes:
+                break
+            if path == keep:
+                continue
+            # memory mapped readers keep their mapping after the file was unlinked
+            os.remove(path)
+            total_size -= size
+
+
+def to_columns(data) -> np.ndarray:
+    rows = np.asarray(data, dtype=np.int64)
+    if rows.ndim != 2 or rows.shape[1] < NUMBER_OF_COLUMNS:
+        raise ValueError(f"Expected a dataset with {NUMBER_OF_COLUMNS} columns, got shape {rows.shape}")
+
+    rows = rows[:, :NUMBER_OF_COLUMNS]
+    info = np.iinfo(COLUMN_DTYPE)
+    if len(rows) > 0 and (rows.min() < info.min or rows.max() > info.max):
+        raise ValueError("Dataset contains values that do not fit into int32")
+
+    return np.ascontiguousarray(rows.T.astype(COLUMN_DTYPE))
+
+
+dataset_cache = DatasetCache()
+
+
+def load_dataset(dataset_id: str) -> np.ndarray:
+    return dataset_cache.get(dataset_id)
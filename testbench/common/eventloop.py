@@ -0,0 +1,121 @@
+####
+####### This Script contains the bridge between the pub/sub callbacks and the event loop of an experiment
+####
+
+import asyncio
+import socket
+import threading
+
+from testbench.common.experiment import ExperimentAbortedException
+
+
+class StopSignal:
+    """
+    Abort and restart requests arrive on the pub/sub callback threads, while the experiment runs on an asyncio event
+    loop. Setting the signal wakes up coroutines waiting for it and cancels the task that currently serves a
+    connection, so a request is handled at the next await instead of after the next socket timeout. Hot loops that
+    never yield to the event loop check `stop_event`, which is set synchronously.
+    """
+
+    def __init__(self, stop_event=None) -> None:
+        super().__init__()
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.stopped: asyncio.Event | None = None
+        self.tasks = set()
+
+    def attach(self):
+        # has to be called on the event loop of the experiment
+        self.stopped = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if self.stop_event.is_set():
+            self.wake()
+
+    def detach(self):
+        self.loop = None
+
+    def set(self):
+        # thread safe
+        self.stop_event.set()
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.wake)
+        except RuntimeError:
+            # the event loop has already been closed
+            pass
+
+    def is_set(self) -> bool:
+        return self.stop_event.is_set()
+
+    def clear(self):
+        self.stop_event.clear()
+        if self.stopped is not None:
+            self.stopped.clear()
+
+    def wake(self):
+        self.stopped.set()
+        for task in self.tasks:
+            task.cancel()
+
+    async def wait(self):
+        await self.stopped.wait()
+
+    async def watch(self, interval: float):
+        """
+        Wakes up the experiment once `stop_event` was set by another process, which cannot call `set` on this loop.
+        """
+        while not self.is_set():
+            await asyncio.sleep(interval)
+        self.wake()
+
+    async def run_until_stopped(self, coroutine):
+        """
+        Runs `coroutine` as a task that is cancelled as soon as the signal is set. The cancellation is reported as
+        ExperimentAbortedException.
+        """
+        if self.is_set():
+            coroutine.close()
+            raise ExperimentAbortedException()
+
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not self.is_set():
+                raise
+            raise ExperimentAbortedException()
+        finally:
+            self.tasks.discard(task)
+
+
+async def wait_readable(sock: socket.socket, timeout: float) -> bool:
+    """
+    Waits until `sock` is readable or `timeout` has passed, returns whether it became readable. The wait is a plain
+    future with a timer, no task is created per call.
+    """
+    loop = asyncio.get_running_loop()
+    return await _wait_for_socket(loop.add_reader, loop.remove_reader, sock, timeout)
+
+
+async def wait_writable(sock: socket.socket, timeout: float) -> bool:
+    loop = asyncio.get_running_loop()
+    return await _wait_for_socket(loop.add_writer, loop.remove_writer, sock, timeout)
+
+
+async def _wait_for_socket(add, remove, sock: socket.socket, timeout: float) -> bool:
+    ready = asyncio.get_running_loop().create_future()
+
+    def resolve(result: bool):
+        if not ready.done():
+            ready.set_result(result)
+
+    add(sock.fileno(), resolve, True)
+    timer = asyncio.get_running_loop().call_later(timeout, resolve, False)
+    try:
+        return await ready
+    finally:
+        timer.cancel()
+        remove(sock.fileno())
@@ -0,0 +1,44 @@
+import socket
+import struct
+import time
+from typing import Any, Tuple, Union
+
+# Not exported by every python version, the value is the same on all common Linux architectures
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+SCM_TIMESTAMPNS = SO_TIMESTAMPNS
+# struct timespec
+TIMESPEC = struct.Struct('@qq')
+ANCILLARY_BUFFER_SIZE = socket.CMSG_SPACE(TIMESPEC.size)
+
+
+def enable_kernel_timestamps(sock: socket.socket):
+    # the kernel attaches the time the data was received by the network stack to every read
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+
+
+def receive_with_kernel_timestamp(sock: socket.socket, buffer: memoryview) -> Tuple[int, Union[int, None]]:
+    """
+    Receives into `buffer` and returns the number of bytes and the kernel receive time in nanoseconds of the wall
+    clock. For TCP this is the arrival time of the most recent segment that contributed to the read.
+    """
+    number_of_bytes, ancillary_data, _, _ = sock.recvmsg_into([buffer], ANCILLARY_BUFFER_SIZE)
+    for level, kind, data in ancillary_data:
+        if level == socket.SOL_SOCKET and kind == SCM_TIMESTAMPNS and len(data) >= TIMESPEC.size:
+            seconds, nanoseconds = TIMESPEC.unpack_from(data)
+            return number_of_bytes, seconds * 1_000_000_000 + nanoseconds
+    return number_of_bytes, None
+
+
+def receive_datagram_with_kernel_timestamp(sock: socket.socket, size: int) -> Tuple[bytes, Any, Union[int, None]]:
+    # like socket.recvfrom, additionally returns the kernel receive time in nanoseconds of the wall clock
+    data, ancillary_data, _, address = sock.recvmsg(size, ANCILLARY_BUFFER_SIZE)
+    for level, kind, timestamp in ancillary_data:
+        if level == socket.SOL_SOCKET and kind == SCM_TIMESTAMPNS and len(timestamp) >= TIMESPEC.size:
+            seconds, nanoseconds = TIMESPEC.unpack_from(timestamp)
+            return data, address, seconds * 1_000_000_000 + nanoseconds
+    return data, address, None
+
+
+def to_perf_counter(wall_clock_ns: int) -> float:
+    # maps a wall clock time onto the perf_counter clock the other sink timestamps are taken with
+    return wall_clock_ns / 1e9 - (time.time() - time.perf_counter())
@@ -22,6 +22,11 @@ RESPONSE_MEASUREMENTS = "RESPONSE_MEASUREMENTS"
 SOURCE_SINK_TOPIC = "test-bench-source-sink-topic"
 CONTROL_TOPIC = "test-bench-control-topic"
 
+# Seconds without data after which the sink records an idle period
+DEFAULT_IDLE_TIMEOUT_IN_SECONDS = 1.0
+# Port the source and the sink listen on for the operator
+DEFAULT_DATA_PORT = 8081
+
 
 def send_message(topic_name, data, service_type):
     # function expects a json object as data
@@ -39,9 +44,10 @@ def send_message(topic_name, data, service_type):
     publisher.publish(topic_path, data=data.encode('utf-8'), **{'service_type': service_type})
 
 
-def abort_experiment():
-    send_message(SOURCE_SINK_TOPIC, {}, ABORT_EXPERIMENT)
-    send_message(CONTROL_TOPIC, {}, ABORT_EXPERIMENT)
+def abort_experiment(test_id: str = None):
+    # without a test id every running experiment is aborted
+    send_message(SOURCE_SINK_TOPIC, {'test_id': test_id}, ABORT_EXPERIMENT)
+    send_message(CONTROL_TOPIC, {'test_id': test_id}, ABORT_EXPERIMENT)
 
 
 def get_service_type(message):
@@ -62,6 +68,7 @@ class ResponseMeasurementsMessage:
         data = get_data(message)
         self.measurements = data['measurements']
         self.source_or_sink = data['source_or_sink']
+        self.test_id = data.get('test_id')
 
     def __str__(self) -> str:
         as_str = "ResponseMeasurementsMessage\n"
@@ -100,6 +107,18 @@ class StartExperimentMessage:
         self.sample_rate = int(data['sample_rate'])
         self.restarts = int(data['restarts'])
         self.tuple_format = data['tuple_format']
+        self.rate_profile = data.get('rate_profile', 'geometric')
+        self.rate_profile_parameters = data.get('rate_profile_parameters', {})
+        self.batch_size = int(data.get('batch_size', 1))
+        self.batch_size_in_bytes = int(data.get('batch_size_in_bytes', 0))
+        self.source_workers = int(data.get('source_workers', 1))
+        self.tuple_delimiter = data.get('tuple_delimiter', '')
+        self.adaptive_backpressure = bool(data.get('adaptive_backpressure', False))
+        self.idle_timeout = float(data.get('idle_timeout', DEFAULT_IDLE_TIMEOUT_IN_SECONDS))
+        self.sink_connections = int(data.get('sink_connections', 1))
+        self.sink_reuse_port = bool(data.get('sink_reuse_port', False))
+        self.capture_size_in_bytes = int(data.get('capture_size_in_bytes', 0))
+        self.kernel_timestamps = bool(data.get('kernel_timestamps', False))
 
     def __str__(self) -> str:
         as_str = "StartExperimentMessage\n"
@@ -118,6 +137,7 @@ class ReadyForRestartMessage:
         assert get_service_type(message) == READY_FOR_RESTART
         data = get_data(message)
         self.source_or_sink = data['source_or_sink']
+        self.test_id = data.get('test_id')
 
     def __str__(self) -> str:
         as_str = "ReadyForRestartMessage\n"
@@ -134,6 +154,7 @@ class RestartMessage:
     def __init__(self, message) -> None:
         super().__init__()
         assert get_service_type(message) == RESTART_EXPERIMENT
+        self.test_id = get_data(message).get('test_id')
 
     def __str__(self) -> str:
         as_str = "RestartMessage\n"
@@ -150,6 +171,7 @@ class AbortExperimentMessage:
     def __init__(self, message) -> None:
         super().__init__()
         assert get_service_type(message) == ABORT_EXPERIMENT
+        self.test_id = get_data(message).get('test_id')
 
     def __str__(self) -> str:
         as_str = "AbortExperimentMessage\n"
@@ -175,6 +197,20 @@ class ThroughputStartMessage:
         self.sample_rate = int(data['sample_rate'])
         self.restarts = int(data['restarts'])
         self.tuple_format = data['tuple_format']
+        self.rate_profile = data.get('rate_profile', 'geometric')
+        self.rate_profile_parameters = data.get('rate_profile_parameters', {})
+        self.batch_size = int(data.get('batch_size', 1))
+        self.batch_size_in_bytes = int(data.get('batch_size_in_bytes', 0))
+        self.source_workers = int(data.get('source_workers', 1))
+        self.tuple_delimiter = data.get('tuple_delimiter', '')
+        self.adaptive_backpressure = bool(data.get('adaptive_backpressure', False))
+        self.idle_timeout = float(data.get('idle_timeout', DEFAULT_IDLE_TIMEOUT_IN_SECONDS))
+        self.sink_connections = int(data.get('sink_connections', 1))
+        self.sink_reuse_port = bool(data.get('sink_reuse_port', False))
+        self.capture_size_in_bytes = int(data.get('capture_size_in_bytes', 0))
+        self.kernel_timestamps = bool(data.get('kernel_timestamps', False))
+        self.source_port = int(data.get('source_port', DEFAULT_DATA_PORT))
+        self.sink_port = int(data.get('sink_port', DEFAULT_DATA_PORT))
 
     def __str__(self) -> str:
         as_str = "ThroughputStartMessage\n"
@@ -186,7 +222,12 @@ class ThroughputStartMessage:
 def start_experiment(control_port: int, control_address: str, sink_port: int, sink_address: str, source_port: int,
                      source_address: str, operator: str, github_token: str, image_name: str, iterations: int,
                      delay: float, ramp_factor: float, test_id: str, dataset_id: str, evaluation_id: str,
-                     force_rebuild: bool, sample_rate: int, restarts: int, tuple_format: str):
+                     force_rebuild: bool, sample_rate: int, restarts: int, tuple_format: str,
+                     rate_profile: str = 'geometric', rate_profile_parameters: dict = None, batch_size: int = 1,
+                     batch_size_in_bytes: int = 0, source_workers: int = 1, tuple_delimiter: str = '',
+                     adaptive_backpressure: bool = False, idle_timeout: float = DEFAULT_IDLE_TIMEOUT_IN_SECONDS,
+                     sink_connections: int = 1, sink_reuse_port: bool = False, capture_size_in_bytes: int = 0,
+                     kernel_timestamps: bool = False):
     data = {
         'force_rebuild': force_rebuild,
         'control_port': control_port,
@@ -207,20 +248,38 @@ def start_experiment(control_port: int, control_address: str, sink_port: int, si
         'sample_rate': sample_rate,
         'restarts': restarts,
         'tuple_format': tuple_format,
+        'rate_profile': rate_profile,
+        'rate_profile_parameters': rate_profile_parameters or {},
+        'batch_size': batch_size,
+        'batch_size_in_bytes': batch_size_in_bytes,
+        'source_workers': source_workers,
+        'tuple_delimiter': tuple_delimiter,
+        'adaptive_backpressure': adaptive_backpressure,
+        'idle_timeout': idle_timeout,
+        'sink_connections': sink_connections,
+        'sink_reuse_port': sink_reuse_port,
+        'capture_size_in_bytes': capture_size_in_bytes,
+        'kernel_timestamps': kernel_timestamps,
     }
     send_message(CONTROL_TOPIC, data, START_EXPERIMENT)
 
 
-def ready_for_restart(source_or_sink: str):
-    send_message(CONTROL_TOPIC, {'source_or_sink': source_or_sink}, READY_FOR_RESTART)
+def ready_for_restart(source_or_sink: str, test_id: str = None):
+    send_message(CONTROL_TOPIC, {'source_or_sink': source_or_sink, 'test_id': test_id}, READY_FOR_RESTART)
 
 
-def restart_experiment():
-    send_message(SOURCE_SINK_TOPIC, {}, RESTART_EXPERIMENT)
+def restart_experiment(test_id: str = None):
+    send_message(SOURCE_SINK_TOPIC, {'test_id': test_id}, RESTART_EXPERIMENT)
 
 
 def throughput_start(test_id: str, iterations: int, delay: float, ramp_factor: float, dataset_id: str,
-                     sample_rate: float, restarts: int, tuple_format: str):
+                     sample_rate: float, restarts: int, tuple_format: str, rate_profile: str = 'geometric',
+                     rate_profile_parameters: dict = None, batch_size: int = 1, batch_size_in_bytes: int = 0,
+                     source_workers: int = 1, tuple_delimiter: str = '', adaptive_backpressure: bool = False,
+                     idle_timeout: float = DEFAULT_IDLE_TIMEOUT_IN_SECONDS, sink_connections: int = 1,
+                     sink_reuse_port: bool = False, capture_size_in_bytes: int = 0,
+                     kernel_timestamps: bool = False, source_port: int = DEFAULT_DATA_PORT,
+                     sink_port: int = DEFAULT_DATA_PORT):
     data = {
         'dataset_id': dataset_id,
         'iterations': iterations,
@@ -230,14 +289,29 @@ def throughput_start(test_id: str, iterations: int, delay: float, ramp_factor: f
         'sample_rate': sample_rate,
         'restarts': restarts,
         'tuple_format': tuple_format,
+        'rate_profile': rate_profile,
+        'rate_profile_parameters': rate_profile_parameters or {},
+        'batch_size': batch_size,
+        'batch_size_in_bytes': batch_size_in_bytes,
+        'source_workers': source_workers,
+        'tuple_delimiter': tuple_delimiter,
+        'adaptive_backpressure': adaptive_backpressure,
+        'idle_timeout': idle_timeout,
+        'sink_connections': sink_connections,
+        'sink_reuse_port': sink_reuse_port,
+        'capture_size_in_bytes': capture_size_in_bytes,
+        'kernel_timestamps': kernel_timestamps,
+        'source_port': source_port,
+        'sink_port': sink_port,
     }
     send_message(SOURCE_SINK_TOPIC, data, START_THROUGHPUT)
 
 
-def response_measurements(source_or_sink: str, measurements: dict):
+def response_measurements(source_or_sink: str, measurements: dict, test_id: str = None):
     data = {
         'source_or_sink': source_or_sink,
-        'measurements': measurements
+        'measurements': measurements,
+        'test_id': test_id,
     }
 
     print("Send throughput done message", flush=True)
@@ -0,0 +1,89 @@
+####
+####### This Script contains the precomputed filter predicate of a dataset
+####
+
+import numpy as np
+
+# The filter operator forwards tuples whose first field is positive
+FILTER_COLUMN = 0
+
+
+class Selectivity:
+    """
+    Evaluates the filter predicate once per dataset. prefix_counts[i] is the number of passing tuples among the first
+    i tuples of the dataset, so the number of passing tuples in any range of the dataset is a single subtraction.
+    """
+
+    def __init__(self, columns: np.ndarray) -> None:
+        super().__init__()
+        self.mask = np.asarray(columns[FILTER_COLUMN]) > 0
+        self.prefix_counts = np.concatenate(([0], np.cumsum(self.mask, dtype=np.int64)))
+        self.number_of_passing_tuples = int(self.prefix_counts[-1])
+
+    def passing_ids(self, first_tuple_id: int) -> np.ndarray:
+        return np.flatnonzero(self.mask) + first_tuple_id
+
+
+class ExpectedTuples:
+    """
+    Ids of the tuples that pass the filter, derived from the way the source assigns ids: the dataset is split into
+    `number_of_shards` contiguous shards (one per source worker), every shard sends its tuples `scale` times and its
+    ids start behind the ids of all preceding shards. A single source worker is a single shard.
+    """
+
+    def __init__(self, selectivity: Selectivity, number_of_shards: int, scale: int) -> None:
+        super().__init__()
+        self.selectivity = selectivity
+        self.scale = scale
+
+        number_of_tuples = len(selectivity.mask)
+        # same split as numpy.array_split, empty shards never send any ids
+        sizes = [number_of_tuples // number_of_shards + (1 if i < number_of_tuples % number_of_shards else 0)
+                 for i in range(number_of_shards)]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+        non_empty = np.asarray(sizes) > 0
+        self.shard_sizes = np.asarray(sizes, dtype=np.int64)[non_empty]
+        # first tuple of every shard in the dataset and its first id
+        self.shard_starts = starts[non_empty]
+        self.shard_first_ids = self.shard_starts * scale
+        self.shard_passing_tuples = selectivity.prefix_counts[self.shard_starts + self.shard_sizes] - \
+            selectivity.prefix_counts[self.shard_starts]
+
+        self.number_of_shards = len(self.shard_sizes)
+        self.number_of_ids = number_of_tuples * scale
+        self.number_of_expected_tuples = selectivity.number_of_passing_tuples * scale
+
+    def shard_of(self, ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.shard_first_ids, ids, side='right') - 1
+
+    def is_expected(self, ids: np.ndarray, shards: np.ndarray) -> np.ndarray:
+        first_id, last_id = int(ids.min()), int(ids.max())
+        if 0 <= first_id and last_id < self.number_of_ids:
+            shard = int(self.shard_of(first_id))
+            iteration = (first_id - int(self.shard_first_ids[shard])) // int(self.shard_sizes[shard])
+            first_id_of_iteration = int(self.shard_first_ids[shard]) + iteration * int(self.shard_sizes[shard])
+            if last_id < first_id_of_iteration + int(self.shard_sizes[shard]):
+                # common case: all ids belong to the same iteration of a single shard
+                return self.selectivity.mask[ids + (int(self.shard_starts[shard]) - first_id_of_iteration)]
+
+        valid = (ids >= 0) & (ids < self.number_of_ids)
+        ids = np.where(valid, ids, 0)
+        shards = np.maximum(shards, 0)
+        positions = self.shard_starts[shards] + (ids - self.shard_first_ids[shards]) % self.shard_sizes[shards]
+        return valid & self.selectivity.mask[positions]
+
+    def number_of_expected_tuples_before(self, shard: int, tuple_id: int) -> int:
+        # expected ids of `shard` that are smaller than `tuple_id`
+        offset = max(0, tuple_id - int(self.shard_first_ids[shard]))
+        iterations, position = divmod(offset, int(self.shard_sizes[shard]))
+        if iterations >= self.scale:
+            return int(self.shard_passing_tuples[shard]) * self.scale
+        start = int(self.shard_starts[shard])
+        prefix_counts = self.selectivity.prefix_counts
+        return iterations * int(self.shard_passing_tuples[shard]) + \
+            int(prefix_counts[start + position] - prefix_counts[start])
+
+
+def number_of_samples(passed_before: int, passed_after: int, sample_rate: int) -> int:
+    # number of multiples of sample_rate in [passed_before, passed_after)
+    return -(-passed_after // sample_rate) + (-passed_before // sample_rate)
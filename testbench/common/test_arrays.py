@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+
+from testbench.common.arrays import GrowableArray, IdSet, decode
+
+
+def round_trip(value):
+    # measurements are uploaded as JSON
+    return decode(json.loads(json.dumps(value)))
+
+
+def test_growable_array_round_trip():
+    array = GrowableArray(np.float64, capacity=2)
+    for value in [0.5, 1.25, -3.0]:
+        array.append(value)
+    array.extend(np.linspace(0, 1, 10_000))
+
+    assert len(array) == 10_003
+    assert round_trip(array.encode()) == array.tolist()
+
+
+def test_growable_array_keeps_integer_types():
+    array = GrowableArray.from_numpy(np.array([1, -2, 2 ** 40], dtype=np.int64))
+    assert round_trip(array.encode()) == [1, -2, 2 ** 40]
+
+
+def test_empty_structures_round_trip():
+    assert round_trip(GrowableArray(np.float64).encode()) == []
+    assert round_trip(IdSet().encode()) == []
+
+
+def test_consecutive_ids_are_encoded_as_ranges():
+    ids = IdSet()
+    ids.add_mask(1000, np.ones(100_000, dtype=bool))
+    ids.add_ids(np.arange(500_000, 500_010))
+
+    encoded = ids.encode()
+    assert encoded["encoding"] == "ranges"
+    assert encoded["ranges"] == [[1000, 101_000], [500_000, 500_010]]
+    assert round_trip(encoded) == ids.tolist()
+
+
+def test_scattered_ids_are_encoded_as_bitmap():
+    ids = IdSet()
+    mask = np.random.default_rng(7).random(100_000) < 0.5
+    ids.add_mask(13, mask)
+
+    encoded = ids.encode()
+    assert encoded["encoding"] == "bitmap"
+    assert round_trip(encoded) == (np.flatnonzero(mask) + 13).tolist()
+
+
+def test_id_set_grows_in_both_directions():
+    ids = IdSet()
+    for tuple_id in [100_000, 5, 1_000_000, 3]:
+        ids.append(tuple_id)
+
+    assert ids.tolist() == [3, 5, 100_000, 1_000_000]
+    assert round_trip(ids.encode()) == [3, 5, 100_000, 1_000_000]
+
+
+def test_contained_ids_are_counted():
+    ids = IdSet()
+    assert ids.add_mask(0, np.array([True, False, True, True])) == 0
+    assert ids.add_ids(np.array([2, 3, 4, 4])) == 3
+
+    other = IdSet()
+    other.add_ids(np.array([0, 1, 9]))
+    assert ids.update(other) == 1
+    assert ids.tolist() == [0, 1, 2, 3, 4, 9]
+    assert len(ids) == 6
+
+
+def test_plain_values_are_returned_unchanged():
+    assert decode([1, 2]) == [1, 2]
+    assert decode({"count": 1}) == {"count": 1}
@@ -0,0 +1,29 @@
+####
+####### This Script contains the source timestamps embedded in the tuples
+####
+
+import time
+
+import numpy as np
+
+# Tuples carry the wall clock time at which they were sent in microseconds (field "c"). The binary format only has 32
+# bits for it, so latencies are computed modulo 2^32 us (about 71 minutes). Source and sink clocks have to be
+# synchronized, e.g. by NTP.
+TIMESTAMP_MODULUS = 1 << 32
+
+
+def timestamp_in_us() -> int:
+    return time.time_ns() // 1000
+
+
+def to_int32(timestamp: int) -> int:
+    # two's complement truncation, so the value fits into the big-endian int32 field of the binary format
+    return (timestamp + (TIMESTAMP_MODULUS >> 1)) % TIMESTAMP_MODULUS - (TIMESTAMP_MODULUS >> 1)
+
+
+def latencies_in_us(receive_timestamp: int, source_timestamps: np.ndarray) -> np.ndarray:
+    """
+    Latencies of tuples received at `receive_timestamp`. Values of TIMESTAMP_MODULUS / 2 or more are negative
+    latencies, i.e. the sink clock lags behind the source clock.
+    """
+    return (receive_timestamp - source_timestamps.astype(np.int64)) & (TIMESTAMP_MODULUS - 1)
@@ -0,0 +1,87 @@
+####
+####### This Script contains the worker processes that serve one connection each
+####
+
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.synchronize
+import threading
+from typing import Callable, List
+
+from testbench.common.eventloop import StopSignal
+from testbench.common.experiment import ExperimentAbortedException, ExperimentFailedException
+
+# Workers inherit the accepted sockets and the memory mapped dataset from the coordinator
+mp_context = multiprocessing.get_context('fork')
+
+# Interval in which the coordinator forwards abort requests to the workers, unless the stop event is shared with them
+STOP_POLL_INTERVAL_IN_SECONDS = 0.1
+
+
+async def run_in_worker(stop_signal: StopSignal, coroutine):
+    # abort requests are set by the coordinator process, so the worker polls for them
+    stop_signal.attach()
+    watcher = asyncio.ensure_future(stop_signal.watch(STOP_POLL_INTERVAL_IN_SECONDS))
+    try:
+        return await coroutine
+    finally:
+        watcher.cancel()
+        stop_signal.detach()
+
+
+def run_worker(target: Callable, args: tuple, stop_event, result_pipe):
+    try:
+        result_pipe.send(target(*args, stop_event))
+    except ExperimentAbortedException:
+        result_pipe.send(None)
+    except Exception as e:
+        result_pipe.send(e)
+    finally:
+        result_pipe.close()
+
+
+def run_workers(target: Callable, worker_args: List[tuple], stop_event: threading.Event) -> list:
+    """
+    Runs `target(*args, worker_stop_event)` in one process per entry of `worker_args` and returns their results in
+    order. A multiprocessing `stop_event` is passed to the workers as is, any other event is forwarded to them.
+    """
+    shared = isinstance(stop_event, multiprocessing.synchronize.Event)
+    worker_stop_event = stop_event if shared else mp_context.Event()
+    pipes = []
+    processes = []
+    for args in worker_args:
+        receiver, sender = mp_context.Pipe(duplex=False)
+        process = mp_context.Process(target=run_worker, args=(target, args, worker_stop_event, sender), daemon=True)
+        process.start()
+        sender.close()
+        pipes.append(receiver)
+        processes.append(process)
+
+    results = [None] * len(processes)
+    pending = dict(enumerate(pipes))
+    try:
+        while pending:
+            if stop_event.is_set():
+                worker_stop_event.set()
+
+            for ready in multiprocessing.connection.wait(list(pending.values()), STOP_POLL_INTERVAL_IN_SECONDS):
+                worker = next(i for i, pipe in pending.items() if pipe is ready)
+                try:
+                    results[worker] = pending[worker].recv()
+                except EOFError:
+                    results[worker] = ExperimentFailedException(f"Worker {worker} exited unexpectedly")
+                del pending[worker]
+    finally:
+        if pending:
+            worker_stop_event.set()
+        for process in processes:
+            process.join()
+
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    if stop_event.is_set() or any(result is None for result in results):
+        raise ExperimentAbortedException()
+
+    return results
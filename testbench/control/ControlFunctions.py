@@ -1,22 +1,24 @@
 import datetime
 import logging
-import os
 import re
-import socket
-import subprocess
 import threading
 import time
-from typing import Callable, Union, Tuple
+from typing import Callable, Dict, List, Union, Tuple
 
 import docker
 from docker.errors import ContainerError
 
 import launcher
+from async_launcher import AsyncLauncher
+from boot_listener import BootListener, BootWaiter
+from pool import InstancePool
 from testbench.common.CustomGoogleCloudStorage import store_evaluation_in_bucket
 from testbench.common.experiment import *
 from testbench.common.messages import StartExperimentMessage, throughput_start, abort_experiment, restart_experiment
 
 PORT = 8081
+# Seconds between two checks whether an experiment waiting for a boot packet was aborted
+BOOT_POLL_INTERVAL_IN_SECONDS = 0.1
 
 
 class Measurements:
@@ -27,12 +29,14 @@ class Measurements:
         self.start_timestamp = None
         self.start_datetime = None
         self.boot_packet_timestamp = None
+        self.boot_packet_address = None
         self.was_reset = was_reset
 
     def get_measurements(self) -> dict:
         return {
             "was_reset": self.was_reset,
             "boot_packet_timestamp": self.boot_packet_timestamp,
+            "boot_packet_address": self.boot_packet_address,
             "start_unix_timestamp": time.mktime(self.start_datetime.timetuple()),
             "start_timestamp": self.start_timestamp,
             "serial_log": self.uut_serial_log,
@@ -45,13 +49,14 @@ class TestContext:
         super().__init__()
         self.image_name = None
         self.instance_name = None
-        self.boot_socket: socket.socket | None = None
-        self.logger = logger
-        logger: logging.Logger
+        self.boot_waiter: BootWaiter | None = None
+        # concurrent experiments log through their own child logger
+        self.logger = logger.getChild(test_id)
         self.test_id = test_id
 
         self.stop_event: threading.Event = threading.Event()
         self.is_aborted: bool = False
+        self.has_failed: bool = False
         self.source_is_done: bool = False
         self.source_waits_for_restart: bool = False
         self.sink_is_done: bool = False
@@ -76,171 +81,166 @@ class TestContext:
         return {
             "measurements": [m.get_measurements() for m in self.measurements],
             "configuration": vars(self.configuration),
-            "image_name": self.image_name
+            "image_name": self.image_name,
+            # latencies of the instance operations of all experiments so far
+            "instance_operations": instance_launcher.summary(),
         }
 
     def clean_up(self):
-        if self.boot_socket is not None:
-            self.logger.debug("Closing Boot Socket")
-            self.boot_socket.close()
+        if self.boot_waiter is not None:
+            boot_listener.cancel(self.boot_waiter)
 
         if self.instance_clean_up is not None:
             self.logger.debug("Cleaning Up Instance")
             self.instance_clean_up()
 
 
-def clean_up_gcp(context: TestContext, project, zone, instance_name):
-    try:
-        launcher.delete_instance(project, zone, instance_name)
-    except Exception as e:
-        context.logger.error(e)
+# Runs all instance operations, experiments wait only for the operations they depend on. Set up by main with the
+# configured backend
+instance_launcher: Union[AsyncLauncher, None] = None
+# Keeps stopped instances between experiments, without it every experiment creates and deletes its own instance
+instance_pool: Union[InstancePool, None] = None
+# Receives the boot packets of all experiments, set up by main
+boot_listener: Union[BootListener, None] = None
 
 
-def get_serial_gcp(context: TestContext, project, zone, instance_name):
-    serial = launcher.print_serial_output(project, zone, instance_name)
-    context.logger.info(f"Unikernel Serial:\n {'#' * 20}\n{serial}\n{'#' * 20}\n")
-
-    return serial
+def clean_up_instance(context: TestContext, instance_name):
+    # the deletion runs in the background, failures are logged by the launcher
+    instance_launcher.delete(instance_name)
 
 
-def clean_up_locally(context: TestContext, p):
-    context.logger.info(f"Unikernel Serial:\n {'#' * 20}\n{context.current_measurement.uut_serial_log}\n{'#' * 20}\n")
-    p.terminate()
-
-
-def wait_for_serial_socket_to_exist(file_path: str, timeout: int) -> bool:
-    start_time = time.time()
-    while not os.path.exists(file_path):
-        time.sleep(0.1)
-        if time.time() - start_time > timeout:
-            return False
-    else:
-        return True
-
-
-def read_serial_socket(context: TestContext, socket_name: str):
-    context.logger.info(f"Waiting for socket: {socket_name}")
-    with open("/tmp/socat.out", "w+") as file:
-        p = subprocess.run(
-            ["sudo", "-A", 'socat', '-', f'UNIX-CONNECT:{socket_name}'],
-            stdout=file
-        )
-
-
-def launch_locally(context: TestContext, image_name: str) -> Callable:
-    import subprocess
-    p = subprocess.Popen(
-        ['sudo', '-A', '/home/ls/Uni/WiSe2223/DBPRO/Unikraft-Test-Operator/scripts/qemu_guest.sh', '-x', '-b', 'kraft0',
-         '-k',
-         '/home/ls/Uni/WiSe2223/DBPRO/Unikraft-Test-Operator/build/testoperator_kvm-x86_64'], stdout=subprocess.PIPE)
-
-    socket_name = ""
-    while True:
-        line = p.stdout.readline().decode().strip()
-        print(line)
-        if not line:
-            break
-        if line.startswith("Serial socket:"):
-            socket_name = line.split(":")[1].strip()
-            break
-
-    threading.Thread(target=read_serial_socket, args=(context, socket_name)).start()
+def get_serial(context: TestContext, instance_name):
+    serial = instance_launcher.serial_output(instance_name).result()
+    context.logger.info(f"Unikernel Serial:\n {'#' * 20}\n{serial}\n{'#' * 20}\n")
 
-    return lambda: clean_up_locally(context, p)
+    return serial
 
 
-def launch_gcp(context: TestContext) -> Callable:
+def launch_instance(context: TestContext) -> Callable:
     context.logger.info("Lauchning VM")
-    # Send an HTTP request using the requests library
-    project = 'bdspro'
-    zone = 'europe-west1-b'
     framework = "unikraft"
     instance_name = f"{framework}-{context.test_id[len('experiment_2023-02-04T15-57-46-'):]}"
     context.instance_name = instance_name
 
     context.start_timestamp = time.perf_counter()
-    response = launcher.create_from_custom_image(project, zone, instance_name,
-                                                 f"projects/bdspro/global/images/{context.image_name}")
+    created = instance_launcher.create(context.image_name, instance_name)
+    try:
+        created.result()
+    except Exception as e:
+        # a partially created instance is deleted as well
+        clean_up_instance(context, instance_name)
+        raise ExperimentFailedException(f"Cannot create instance: {e}")
 
-    return lambda: clean_up_gcp(context, project, zone, instance_name)
+    return lambda: clean_up_instance(context, instance_name)
 
 
-def receive_udp_packet(context: TestContext):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+def launch_from_pool(context: TestContext) -> Callable:
+    context.logger.info("Acquiring VM from the instance pool")
     try:
-        # Create a UDP socket and listen for incoming packets
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('0.0.0.0', PORT))
-        context.boot_socket = sock
-        # TODO: Verify data and addr
-        data, addr = sock.recvfrom(1024)
-        context.current_measurement.boot_packet_timestamp = time.perf_counter()
-        context.logger.debug(f"Received Boot Packet. Data = {data}, Addr = {addr}")
-    finally:
-        sock.close()
+        instance = instance_pool.acquire(context.image_name)
+    except Exception as e:
+        raise ExperimentFailedException(f"Cannot acquire instance: {e}")
+    context.instance_name = instance.name
+
+    # instances of failed experiments may be broken and are not reused
+    return lambda: instance_pool.release(instance, healthy=not context.has_failed)
+
+
+def expect_boot_packet(context: TestContext) -> BootWaiter:
+    # concurrent experiments are scheduled with different control ports
+    context.boot_waiter = boot_listener.expect(context.configuration.control_port or PORT)
+    return context.boot_waiter
+
 
+def resolve_boot_addresses(context: TestContext, waiter: BootWaiter):
+    # without the addresses of the instance, the boot packet of any instance on the control port is accepted
+    addresses = None
+    if context.instance_name is not None:
+        try:
+            addresses = instance_launcher.addresses(context.instance_name).result()
+        except Exception as e:
+            context.logger.warning(f"Cannot get the addresses of {context.instance_name}: {e}")
+    boot_listener.resolve(waiter, addresses)
 
-def restart_gcp(context: TestContext):
+
+def restart_instance(context: TestContext):
     try:
         context.logger.info("Resetting Instance")
-        launcher.reset_vm('bdspro', 'europe-west1-b', context.instance_name)
+        instance_launcher.reset(context.instance_name).result()
     except Exception as e:
         context.logger.error(f"Problem when resetting VM: {e}")
         raise ExperimentFailedException("Problem when resetting VM")
 
 
-def wait_for_unikernel_to_boot_with_timeout(timeout_in_seconds: int, thread: threading.Thread) -> bool:
-    time_left = float(timeout_in_seconds)
+def wait_for_unikernel_to_boot_with_timeout(context: TestContext, timeout_in_seconds: int,
+                                            waiter: BootWaiter) -> bool:
+    resolve_boot_addresses(context, waiter)
+    deadline = time.monotonic() + timeout_in_seconds
 
-    while time_left > 0:
-        if active_test_context.stop_event.wait(10):
-            if active_test_context.is_aborted:
-                raise ExperimentAbortedException()
-        thread.join(0.1)
-        if thread.is_alive():
-            time_left -= 0.1
-        else:
-            return True
-    return False
+    while not waiter.booted.wait(BOOT_POLL_INTERVAL_IN_SECONDS):
+        if context.is_aborted:
+            raise ExperimentAbortedException()
+        if time.monotonic() >= deadline:
+            return False
+
+    context.current_measurement.boot_packet_timestamp = waiter.timestamp
+    context.current_measurement.boot_packet_address = waiter.source[0]
+    context.logger.debug(f"Received Boot Packet from {waiter.source}")
+    return True
 
 
-def restart_unikernel(context: TestContext, reset_fn=restart_gcp):
-    udp_thread = threading.Thread(target=receive_udp_packet, args=(context,))
-    udp_thread.start()
+def restart_unikernel(context: TestContext, reset_fn=restart_instance):
+    waiter = expect_boot_packet(context)
 
     context.current_measurement.start_datetime = datetime.datetime.now()
     context.current_measurement.start_timestamp = time.perf_counter()
-    reset_fn(context)
+    try:
+        reset_fn(context)
 
-    if not wait_for_unikernel_to_boot_with_timeout(10, udp_thread):
-        context.logger.error("The Unikernel did not send a boot packet in 10 seconds! Aborting the Experiment")
-        raise ExperimentFailedException("Boot Packet Timeout")
+        if not wait_for_unikernel_to_boot_with_timeout(context, 10, waiter):
+            context.logger.error("The Unikernel did not send a boot packet in 10 seconds! Aborting the Experiment")
+            raise ExperimentFailedException("Boot Packet Timeout")
+    finally:
+        # a waiter left behind would take the boot packet of the next experiment on this port
+        boot_listener.cancel(waiter)
 
-    context.logger.info(
-        f"Unikernel Booted in {context.current_measurement.boot_packet_timestamp} - {context.current_measurement.start_timestamp}s.")
+    boot_time = context.current_measurement.boot_packet_timestamp - context.current_measurement.start_timestamp
+    context.logger.info(f"Unikernel Booted in {boot_time:.6f}s.")
 
 
-def test_boot_time(context: TestContext, launch_fn=launch_gcp):
-    udp_thread = threading.Thread(target=receive_udp_packet, args=(context,))
-    udp_thread.start()
+def test_boot_time(context: TestContext, launch_fn=launch_instance):
+    waiter = expect_boot_packet(context)
 
     context.current_measurement.start_datetime = datetime.datetime.now()
     context.current_measurement.start_timestamp = time.perf_counter()
 
-    clean_up = launch_fn(context)
+    # launch functions may replace how the serial output is read
+    context.instance_get_serial = lambda: get_serial(context, context.instance_name)
+    try:
+        clean_up = launch_fn(context)
+        context.instance_clean_up = clean_up
+
+        if not wait_for_unikernel_to_boot_with_timeout(context, 20, waiter):
+            context.logger.error("The Unikernel did not send a boot packet in 20 seconds! Aborting the Experiment")
+            raise ExperimentFailedException("Boot Packet Timeout")
+    finally:
+        boot_listener.cancel(waiter)
 
-    context.instance_get_serial = lambda: get_serial_gcp(context, 'bdspro', 'europe-west1-b', context.instance_name)
-    context.instance_clean_up = clean_up
+    boot_time = context.current_measurement.boot_packet_timestamp - context.current_measurement.start_timestamp
+    context.logger.info(f"Unikernel Booted in {boot_time:.6f}s.")
 
-    if not wait_for_unikernel_to_boot_with_timeout(20, udp_thread):
-        context.logger.error("The Unikernel did not send a boot packet in 20 seconds! Aborting the Experiment")
-        raise ExperimentFailedException("Boot Packet Timeout")
 
-    context.logger.info(
-        f"Unikernel Booted in {context.current_measurement.boot_packet_timestamp} - {context.current_measurement.start_timestamp}s.")
+# running experiments by test id
+active_test_contexts: Dict[str, TestContext] = {}
+active_test_contexts_lock = threading.Lock()
 
 
-active_test_context: Union[TestContext, None] = None
+def find_test_contexts(test_id: Union[str, None]) -> List[TestContext]:
+    # messages without a test id address every running experiment
+    with active_test_contexts_lock:
+        if test_id is None:
+            return list(active_test_contexts.values())
+        return [active_test_contexts[test_id]] if test_id in active_test_contexts else []
 
 
 def wait_for_restart(context: TestContext):
@@ -256,83 +256,88 @@ def wait_for_restart(context: TestContext):
         raise ExperimentFailedException("Expected Source and Sink to Notify when ready for next reset")
 
     context.logger.info("Ready for restart")
-    restart_experiment()
+    restart_experiment(context.test_id)
 
 
 def launch_experiment(message: StartExperimentMessage, logger: logging.Logger):
-    global active_test_context
-
-    if active_test_context is not None:
-        raise ExperimentAlreadyRunningException()
+    with active_test_contexts_lock:
+        if message.test_id in active_test_contexts:
+            raise ExperimentAlreadyRunningException()
+        context = TestContext(logger, message, message.test_id)
+        active_test_contexts[message.test_id] = context
 
     try:
-        active_test_context = TestContext(logger, message, message.test_id)
-        image_name = ensure_image_exists(active_test_context, message)
-        active_test_context.image_name = image_name
+        if instance_launcher.backend.uses_cloud_images:
+            context.image_name = ensure_image_exists(context, message)
+        else:
+            # local backends boot the image given by the experiment, e.g. a kernel path template of QEMU
+            context.image_name = message.image_name
         number_of_restarts = 0
 
         # Launch initial experiment
         throughput_start(message.test_id, message.iterations, message.delay, message.ramp_factor,
-                         message.dataset_id, message.sample_rate, message.restarts, message.tuple_format)
+                         message.dataset_id, message.sample_rate, message.restarts, message.tuple_format,
+                         message.rate_profile, message.rate_profile_parameters, message.batch_size,
+                         message.batch_size_in_bytes, message.source_workers, message.tuple_delimiter,
+                         message.adaptive_backpressure, message.idle_timeout, message.sink_connections,
+                         message.sink_reuse_port, message.capture_size_in_bytes, message.kernel_timestamps,
+                         message.source_port, message.sink_port)
 
-        test_boot_time(active_test_context)
+        test_boot_time(context, launch_from_pool if instance_pool is not None else launch_instance)
 
         while number_of_restarts < message.restarts:
-            wait_for_restart(active_test_context)
-            restart_unikernel(active_test_context)
+            wait_for_restart(context)
+            restart_unikernel(context)
             number_of_restarts += 1
 
-        active_test_context.restart()
-        active_test_context.logger.info("Wait for source and sink to stop")
+        context.restart()
+        context.logger.info("Wait for source and sink to stop")
         # Wait for source and sink to save results
-        active_test_context.stop_event.wait()
-        if active_test_context.is_aborted:
+        context.stop_event.wait()
+        if context.is_aborted:
             raise ExperimentAbortedException()
         else:
-            assert active_test_context.source_is_done and active_test_context.sink_is_done
+            assert context.source_is_done and context.sink_is_done
 
-            store_evaluation_in_bucket(logger, active_test_context.get_measurements(), 'control',
-                                       active_test_context.test_id)
-            logger.info("Experiment is Done!")
+            store_evaluation_in_bucket(context.logger, context.get_measurements(), 'control', context.test_id)
+            context.logger.info("Experiment is Done!")
 
     except ExperimentFailedException as e:
+        context.has_failed = True
         # Notify source and sink
-        abort_experiment()
-        logger.error(e)
+        abort_experiment(context.test_id)
+        context.logger.error(e)
     except ExperimentAbortedException as e:
-        logger.info("Experiment was aborted")
+        context.logger.info("Experiment was aborted")
     finally:
-        active_test_context.instance_clean_up()
-        active_test_context = None
-
+        context.clean_up()
+        with active_test_contexts_lock:
+            del active_test_contexts[message.test_id]
 
-def abort_current_experiment(logger: logging.Logger):
-    global active_test_context
 
-    if active_test_context is not None:
-        logger.warning(f"Experiment was aborted")
-        active_test_context.is_aborted = True
-        active_test_context.stop_event.set()
+def abort_current_experiment(logger: logging.Logger, test_id: str = None):
+    for context in find_test_contexts(test_id):
+        logger.warning(f"Experiment {context.test_id} was aborted")
+        context.is_aborted = True
+        context.stop_event.set()
 
 
-def source_is_done(source_measurements: dict):
-    global active_test_context
-    if active_test_context is not None:
-        active_test_context.source_is_done = True
-        active_test_context.source_measurements = source_measurements
+def source_is_done(test_id: Union[str, None], source_measurements: dict):
+    for context in find_test_contexts(test_id):
+        context.source_is_done = True
+        context.source_measurements = source_measurements
 
-    if active_test_context.sink_is_done:
-        active_test_context.stop_event.set()
+        if context.sink_is_done:
+            context.stop_event.set()
 
 
-def sink_is_done(sink_measurements: dict):
-    global active_test_context
-    if active_test_context is not None:
-        active_test_context.sink_is_done = True
-        active_test_context.sink_measurements = sink_measurements
+def sink_is_done(test_id: Union[str, None], sink_measurements: dict):
+    for context in find_test_contexts(test_id):
+        context.sink_is_done = True
+        context.sink_measurements = sink_measurements
 
-    if active_test_context.source_is_done:
-        active_test_context.stop_event.set()
+        if context.source_is_done:
+            context.stop_event.set()
 
 
 def get_description_from_image_name(image_name: str) -> Tuple[str, str]:
@@ -375,8 +380,9 @@ def build_unikraft_docker_image(context: TestContext, control_port, control_addr
         ).decode('utf-8').strip()
 
         context.logger.info(f"Image: {image_name} was created. Labeling the Image")
-        launcher.label_unikernel_image('bdspro', image_name, 'unikraft', operator, control_address, control_port,
-                                       source_address, source_port, sink_address, sink_port, tuple_format)
+        instance_launcher.label_image(image_name, launcher.image_labels(
+            'unikraft', operator, control_address, control_port, source_address, source_port, sink_address, sink_port,
+            tuple_format)).result()
         context.logger.info(f"Labeling done")
 
         return image_name
@@ -453,13 +459,12 @@ def ensure_image_exists(context: TestContext, message: StartExperimentMessage) -
     return latest_image_name
 
 
-def ready_for_restart(source_or_sink):
-    global active_test_context
-    if active_test_context is not None:
+def ready_for_restart(source_or_sink: str, test_id: Union[str, None]):
+    for context in find_test_contexts(test_id):
         if source_or_sink == "source":
-            active_test_context.source_waits_for_restart = True
+            context.source_waits_for_restart = True
         if source_or_sink == "sink":
-            active_test_context.sink_waits_for_restart = True
+            context.sink_waits_for_restart = True
 
-    if active_test_context.source_waits_for_restart and active_test_context.sink_waits_for_restart:
-        active_test_context.stop_event.set()
+        if context.source_waits_for_restart and context.sink_waits_for_restart:
+            context.stop_event.set()
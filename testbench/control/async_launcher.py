@@ -0,0 +1,106 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from backends import InstanceBackend
+
+# Instance operations mostly wait for the cloud, so many of them are in flight at once
+DEFAULT_MAX_PARALLEL_OPERATIONS = 16
+
+
+class OperationMetrics:
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.latencies: List[float] = []
+        self.number_of_failures = 0
+        self.number_of_pending_operations = 0
+
+    def percentile(self, percentile: float) -> float:
+        latencies = sorted(self.latencies)
+        return latencies[max(0, math.ceil(percentile / 100 * len(latencies)) - 1)]
+
+    def summary(self) -> dict:
+        return {
+            "count": len(self.latencies),
+            "number_of_failures": self.number_of_failures,
+            "number_of_pending_operations": self.number_of_pending_operations,
+            "mean": sum(self.latencies) / len(self.latencies) if self.latencies else None,
+            "p50": self.percentile(50) if self.latencies else None,
+            "p99": self.percentile(99) if self.latencies else None,
+            "max": max(self.latencies) if self.latencies else None,
+        }
+
+
+class AsyncLauncher:
+    """
+    Runs the operations of an instance backend on a thread pool and returns a future for each of them. The latency
+    of every operation is recorded per operation type, failed operations included.
+    """
+
+    def __init__(self, backend: InstanceBackend, logger: logging.Logger,
+                 max_parallel_operations: int = DEFAULT_MAX_PARALLEL_OPERATIONS) -> None:
+        super().__init__()
+        self.backend = backend
+        self.logger = logger
+        self.executor = ThreadPoolExecutor(max_parallel_operations, thread_name_prefix="launcher")
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, OperationMetrics] = {}
+
+    def submit(self, operation: str, function: Callable, *args) -> Future:
+        with self.lock:
+            metrics = self.metrics.setdefault(operation, OperationMetrics())
+            metrics.number_of_pending_operations += 1
+        return self.executor.submit(self.run, operation, metrics, function, *args)
+
+    def run(self, operation: str, metrics: OperationMetrics, function: Callable, *args):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = function(*args)
+            failed = False
+            return result
+        finally:
+            latency = time.perf_counter() - start
+            with self.lock:
+                metrics.number_of_pending_operations -= 1
+                metrics.latencies.append(latency)
+                metrics.number_of_failures += failed
+            if failed:
+                self.logger.error(f"Instance operation {operation}{args} failed after {latency:.3f}s")
+
+    def create(self, image_name: str, instance_name: str) -> Future:
+        return self.submit("create", self.backend.create, image_name, instance_name)
+
+    def start(self, instance_name: str) -> Future:
+        return self.submit("start", self.backend.start, instance_name)
+
+    def stop(self, instance_name: str) -> Future:
+        return self.submit("stop", self.backend.stop, instance_name)
+
+    def reset(self, instance_name: str) -> Future:
+        return self.submit("reset", self.backend.reset, instance_name)
+
+    def delete(self, instance_name: str) -> Future:
+        return self.submit("delete", self.backend.delete, instance_name)
+
+    def serial_output(self, instance_name: str) -> Future:
+        return self.submit("serial_output", self.backend.serial_output, instance_name)
+
+    def label_image(self, image_name: str, labels: Dict[str, str]) -> Future:
+        return self.submit("label_image", self.backend.label_image, image_name, labels)
+
+    def addresses(self, instance_name: str) -> Future:
+        return self.submit("addresses", self.backend.addresses, instance_name)
+
+    def summary(self) -> dict:
+        # latencies are in seconds
+        with self.lock:
+            return {operation: metrics.summary() for operation, metrics in self.metrics.items()}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.backend.close()
@@ -0,0 +1,166 @@
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, List, Union
+
+from google.cloud import compute_v1
+
+import launcher
+
+
+class InstanceBackend:
+    """
+    Operations on unikernel instances and images. A created instance is running, stopped instances keep their disk
+    and are booted again by start. Operations block until they are done, they may be called from many threads at once.
+    """
+
+    # whether instances boot images that are built and looked up in the cloud
+    uses_cloud_images = True
+
+    def create(self, image_name: str, instance_name: str):
+        raise NotImplementedError()
+
+    def start(self, instance_name: str):
+        raise NotImplementedError()
+
+    def stop(self, instance_name: str):
+        raise NotImplementedError()
+
+    def reset(self, instance_name: str):
+        raise NotImplementedError()
+
+    def delete(self, instance_name: str):
+        raise NotImplementedError()
+
+    def serial_output(self, instance_name: str) -> str:
+        raise NotImplementedError()
+
+    def label_image(self, image_name: str, labels: Dict[str, str]):
+        raise NotImplementedError()
+
+    def addresses(self, instance_name: str) -> Union[List[str], None]:
+        # source addresses the instance's boot packet may come from, None if they are unknown
+        return None
+
+    def close(self):
+        pass
+
+
+class GcpInstanceBackend(InstanceBackend):
+
+    def __init__(self, project: str = 'bdspro', zone: str = 'europe-west1-b') -> None:
+        super().__init__()
+        self.project = project
+        self.zone = zone
+        self.clients = threading.local()
+
+    def instances_client(self) -> compute_v1.InstancesClient:
+        # every thread keeps its client for all of its operations, clients are not shared between threads
+        client = getattr(self.clients, 'instances_client', None)
+        if client is None:
+            client = compute_v1.InstancesClient()
+            self.clients.instances_client = client
+        return client
+
+    def create(self, image_name: str, instance_name: str):
+        launcher.create_from_custom_image(self.project, self.zone, instance_name,
+                                          f"projects/{self.project}/global/images/{image_name}",
+                                          self.instances_client())
+
+    def start(self, instance_name: str):
+        launcher.start_instance(self.project, self.zone, instance_name, self.instances_client())
+
+    def stop(self, instance_name: str):
+        launcher.stop_instance(self.project, self.zone, instance_name, self.instances_client())
+
+    def reset(self, instance_name: str):
+        launcher.reset_vm(self.project, self.zone, instance_name, self.instances_client())
+
+    def delete(self, instance_name: str):
+        launcher.delete_instance(self.project, self.zone, instance_name, self.instances_client())
+
+    def serial_output(self, instance_name: str) -> str:
+        return launcher.print_serial_output(self.project, self.zone, instance_name, self.instances_client())
+
+    def label_image(self, image_name: str, labels: Dict[str, str]):
+        launcher.image_catalog.label(image_name, labels)
+
+    def addresses(self, instance_name: str) -> Union[List[str], None]:
+        return launcher.instance_addresses(self.project, self.zone, instance_name, self.instances_client())
+
+
+# Stand-in for a unikernel, prints a boot line and idles until it is stopped
+LOCAL_INSTANCE_PROGRAM = "import sys, time; print('Booted ' + sys.argv[1], flush=True); time.sleep(1 << 30)"
+
+
+def local_instance_command(image_name: str, instance_name: str) -> List[str]:
+    return [sys.executable, '-c', LOCAL_INSTANCE_PROGRAM, image_name]
+
+
+class LocalProcessBackend(InstanceBackend):
+    """
+    Runs every instance as a local process, the serial output is whatever the process writes to stdout. Allows
+    testing the pool without any cloud resources. The default command sends no boot packet, so experiments need a
+    command that starts a unikernel, like QemuBackend.
+    """
+
+    uses_cloud_images = False
+
+    def __init__(self, command: Callable[[str, str], List[str]] = local_instance_command) -> None:
+        super().__init__()
+        self.command = command
+        self.images: Dict[str, str] = {}
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.serial: Dict[str, List[str]] = {}
+        self.labels: Dict[str, Dict[str, str]] = {}
+        self.lock = threading.Lock()
+
+    def create(self, image_name: str, instance_name: str):
+        with self.lock:
+            self.images[instance_name] = image_name
+            self.serial[instance_name] = []
+        self.start(instance_name)
+
+    def start(self, instance_name: str):
+        process = subprocess.Popen(self.command(self.images[instance_name], instance_name), stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace')
+        with self.lock:
+            self.processes[instance_name] = process
+        threading.Thread(target=self.read_serial, args=(instance_name, process), daemon=True).start()
+
+    def read_serial(self, instance_name: str, process: subprocess.Popen):
+        for line in process.stdout:
+            with self.lock:
+                self.serial[instance_name].append(line)
+
+    def stop(self, instance_name: str):
+        with self.lock:
+            process = self.processes.pop(instance_name, None)
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    def reset(self, instance_name: str):
+        self.stop(instance_name)
+        self.start(instance_name)
+
+    def delete(self, instance_name: str):
+        self.stop(instance_name)
+        with self.lock:
+            self.images.pop(instance_name, None)
+            self.serial.pop(instance_name, None)
+
+    def serial_output(self, instance_name: str) -> str:
+        with self.lock:
+            return ''.join(self.serial.get(instance_name, []))
+
+    def close(self):
+        # instances that were not deleted would outlive the control service
+        with self.lock:
+            instance_names = list(self.processes)
+        for instance_name in instance_names:
+            self.stop(instance_name)
+
+    def label_image(self, image_name: str, labels: Dict[str, str]):
+        with self.lock:
+            self.labels[image_name] = dict(labels)
@@ -0,0 +1,145 @@
+import collections
+import logging
+import selectors
+import socket
+import threading
+import time
+from typing import Deque, Dict, List, Tuple, Union
+
+from testbench.common.kernel_timestamps import enable_kernel_timestamps, receive_datagram_with_kernel_timestamp, \
+    to_perf_counter
+
+# Unikraft sends "BOOTED!", MirageOS "BOOTED"
+BOOT_MESSAGE = b"BOOTED"
+# Seconds the listener thread blocks before it checks whether it was closed
+SELECT_TIMEOUT_IN_SECONDS = 0.5
+# Boot packets kept per port until the waiter they belong to knows the addresses of its instance
+MAX_UNCLAIMED_PACKETS_PER_PORT = 64
+
+
+class BootWaiter:
+
+    def __init__(self, port: int) -> None:
+        super().__init__()
+        self.port = port
+        # packets that arrived before the waiter was created belong to an earlier boot
+        self.created_timestamp = time.perf_counter()
+        # None until resolved, an empty list accepts packets from any address
+        self.addresses: List[str] | None = None
+        self.booted = threading.Event()
+        # perf_counter time the kernel received the boot packet
+        self.timestamp: float | None = None
+        self.source: Tuple[str, int] | None = None
+
+    def accepts(self, timestamp: float, source: Tuple[str, int]) -> bool:
+        return self.addresses is not None and timestamp >= self.created_timestamp and \
+            (not self.addresses or source[0] in self.addresses)
+
+
+class BootListener:
+    """
+    Receives the boot packets of all instances on one thread. Every control port is bound once and kept open, a packet
+    is handed to the waiter of its port that expects its source address. Packets that arrive before the addresses of
+    a waiter are resolved are kept until then. Boot times are taken from the kernel receive timestamps, so they do not
+    depend on how fast the packets are read.
+    """
+
+    def __init__(self, logger: logging.Logger, bind_address: str = '0.0.0.0') -> None:
+        super().__init__()
+        self.logger = logger
+        self.bind_address = bind_address
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.sockets: Dict[int, socket.socket] = {}
+        self.waiters: Dict[int, List[BootWaiter]] = {}
+        # (timestamp, source) of boot packets no waiter accepted yet
+        self.unclaimed: Dict[int, Deque[Tuple[float, Tuple[str, int]]]] = {}
+        # boot packets nobody accepted when they arrived, e.g. of instances that are warmed up for the pool
+        self.number_of_unclaimed_packets = 0
+
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.listen, name="boot-listener", daemon=True)
+        self.thread.start()
+
+    def listen_on(self, port: int):
+        with self.lock:
+            if port in self.sockets:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            enable_kernel_timestamps(sock)
+            sock.bind((self.bind_address, port))
+            sock.setblocking(False)
+            self.sockets[port] = sock
+            self.unclaimed[port] = collections.deque(maxlen=MAX_UNCLAIMED_PACKETS_PER_PORT)
+            self.selector.register(sock, selectors.EVENT_READ, port)
+
+    def expect(self, port: int) -> BootWaiter:
+        # has to be called before the instance boots, the waiter only accepts packets once it is resolved
+        self.listen_on(port)
+        waiter = BootWaiter(port)
+        with self.lock:
+            self.waiters.setdefault(port, []).append(waiter)
+        return waiter
+
+    def resolve(self, waiter: BootWaiter, addresses: Union[List[str], None]):
+        # None means the addresses of the instance are unknown, the waiter then accepts any boot packet on its port
+        with self.lock:
+            waiter.addresses = list(addresses or [])
+            unclaimed = self.unclaimed[waiter.port]
+            packet = next((p for p in unclaimed if waiter.accepts(*p)), None)
+            if packet is None:
+                return
+            unclaimed.remove(packet)
+            self.waiters[waiter.port].remove(waiter)
+        self.boot(waiter, *packet)
+
+    def cancel(self, waiter: BootWaiter):
+        with self.lock:
+            waiters = self.waiters.get(waiter.port, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    def listen(self):
+        while not self.closed.is_set():
+            for key, _ in self.selector.select(SELECT_TIMEOUT_IN_SECONDS):
+                try:
+                    self.receive(key.fileobj, key.data)
+                except OSError as e:
+                    self.logger.error(f"Cannot receive boot packet on port {key.data}: {e}")
+
+    def receive(self, sock: socket.socket, port: int):
+        data, source, kernel_timestamp = receive_datagram_with_kernel_timestamp(sock, 1024)
+        timestamp = time.perf_counter() if kernel_timestamp is None else to_perf_counter(kernel_timestamp)
+        if not data.startswith(BOOT_MESSAGE):
+            self.logger.warning(f"Ignoring packet from {source} on port {port}: {data[:32]}")
+            return
+
+        with self.lock:
+            waiters = self.waiters.get(port, [])
+            waiter = next((w for w in waiters if w.accepts(timestamp, source)), None)
+            if waiter is None:
+                self.number_of_unclaimed_packets += 1
+                self.unclaimed[port].append((timestamp, source))
+            else:
+                waiters.remove(waiter)
+        if waiter is None:
+            self.logger.debug(f"Keeping unclaimed boot packet from {source} on port {port}")
+            return
+        self.boot(waiter, timestamp, source)
+
+    @staticmethod
+    def boot(waiter: BootWaiter, timestamp: float, source: Tuple[str, int]):
+        waiter.timestamp = timestamp
+        waiter.source = source
+        waiter.booted.set()
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        with self.lock:
+            for sock in self.sockets.values():
+                self.selector.unregister(sock)
+                sock.close()
+            self.sockets.clear()
+        self.selector.close()
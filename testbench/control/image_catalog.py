@@ -0,0 +1,153 @@
+import threading
+import time
+from typing import Any, Dict, List, Tuple, Union
+
+import iso8601
+from google.cloud import compute_v1
+
+# Seconds a lookup is served from memory, images built by this service are recorded immediately
+DEFAULT_IMAGE_CACHE_TTL_IN_SECONDS = 300.0
+
+
+def label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+class ImageService:
+    """
+    Lists and labels unikernel images, images have a name, labels, a creation_timestamp and a deprecated state.
+    """
+
+    def list_images(self, labels: Dict[str, str]) -> List[Any]:
+        raise NotImplementedError()
+
+    def get_image(self, image_name: str) -> Any:
+        raise NotImplementedError()
+
+    def set_labels(self, image_name: str, labels: Dict[str, str]):
+        raise NotImplementedError()
+
+
+class GcpImageService(ImageService):
+
+    def __init__(self, project: str = 'bdspro') -> None:
+        super().__init__()
+        self.project = project
+        self.client: Union[compute_v1.ImagesClient, None] = None
+        self.lock = threading.Lock()
+
+    def images_client(self) -> compute_v1.ImagesClient:
+        # the client is kept, creating it sets up a new channel every time
+        with self.lock:
+            if self.client is None:
+                self.client = compute_v1.ImagesClient()
+            return self.client
+
+    def list_images(self, labels: Dict[str, str]) -> List[Any]:
+        request = compute_v1.types.ListImagesRequest(mapping={
+            "filter": " AND ".join([f"labels.{k} = \"{v}\"" for k, v in labels.items()]),
+            "project": self.project
+        })
+        return [image for page in self.images_client().list(request=request).pages for image in page.items]
+
+    def get_image(self, image_name: str) -> Any:
+        return self.images_client().get(project=self.project, image=image_name)
+
+    def set_labels(self, image_name: str, labels: Dict[str, str]):
+        image = self.get_image(image_name)
+        request = compute_v1.types.GlobalSetLabelsRequest(mapping={
+            "labels": labels,
+            "label_fingerprint": image.label_fingerprint
+        })
+        self.images_client().set_labels_unary(project=self.project, resource=image_name,
+                                               global_set_labels_request_resource=request)
+
+
+class FakeImage:
+
+    def __init__(self, name: str, labels: Dict[str, str], creation_timestamp: str, deprecated=None) -> None:
+        super().__init__()
+        self.name = name
+        self.labels = labels
+        self.creation_timestamp = creation_timestamp
+        self.deprecated = deprecated
+
+
+class FakeImageService(ImageService):
+    """
+    In memory image service, counts its list calls so the caching can be observed.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.images: Dict[str, FakeImage] = {}
+        self.number_of_list_calls = 0
+
+    def add_image(self, name: str, labels: Dict[str, str] = None, creation_timestamp: str = None,
+                  deprecated=None) -> FakeImage:
+        if creation_timestamp is None:
+            creation_timestamp = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+        image = FakeImage(name, dict(labels or {}), creation_timestamp, deprecated)
+        self.images[name] = image
+        return image
+
+    def list_images(self, labels: Dict[str, str]) -> List[Any]:
+        self.number_of_list_calls += 1
+        return [image for image in self.images.values() if labels.items() <= image.labels.items()]
+
+    def get_image(self, image_name: str) -> Any:
+        return self.images[image_name]
+
+    def set_labels(self, image_name: str, labels: Dict[str, str]):
+        self.images[image_name].labels = dict(labels)
+
+
+def newest_image(images: List[Any]) -> Any:
+    images = [image for image in images if not image.deprecated]
+    if not images:
+        return None
+    return max(images, key=lambda image: iso8601.parse_date(image.creation_timestamp))
+
+
+class ImageCatalog:
+    """
+    Caches the newest image per label configuration for `ttl_in_seconds`, misses are cached as well. Images labeled
+    through the catalog replace the cached entry right away, so a sweep does not list images again after a build.
+    """
+
+    def __init__(self, service: ImageService, ttl_in_seconds: float = DEFAULT_IMAGE_CACHE_TTL_IN_SECONDS) -> None:
+        super().__init__()
+        self.service = service
+        self.ttl_in_seconds = ttl_in_seconds
+        self.lock = threading.Lock()
+        # label key -> (image or None, expiry on the monotonic clock)
+        self.entries: Dict[Tuple[Tuple[str, str], ...], Tuple[Any, float]] = {}
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+    def find(self, labels: Dict[str, str]) -> Any:
+        key = label_key(labels)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.number_of_hits += 1
+                return entry[0]
+            self.number_of_misses += 1
+
+        image = newest_image(self.service.list_images(labels))
+        with self.lock:
+            self.entries[key] = (image, time.monotonic() + self.ttl_in_seconds)
+        return image
+
+    def label(self, image_name: str, labels: Dict[str, str]):
+        self.service.set_labels(image_name, labels)
+        image = self.service.get_image(image_name)
+        with self.lock:
+            self.entries[label_key(labels)] = (image, time.monotonic() + self.ttl_in_seconds)
+
+    def invalidate(self, labels: Dict[str, str] = None):
+        with self.lock:
+            if labels is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(label_key(labels), None)
@@ -4,11 +4,12 @@ import warnings
 from typing import Any, List, Optional
 
 import google
-import iso8601
 from google.api_core.exceptions import NotFound
 from google.api_core.extended_operation import ExtendedOperation
 from google.cloud import compute_v1
 
+from image_catalog import GcpImageService, ImageCatalog
+
 
 def get_image_from_url(project: str, image_url: str) -> Optional[compute_v1.Image]:
     image_client = compute_v1.ImagesClient()
@@ -23,76 +24,43 @@ def encode_ip(ip: str):
     return ip.replace(".", "-")
 
 
-def find_image_that_matches_configuration(control_port: int, control_address: str, source_port: int,
-                                          source_address: str, sink_port: int,
-                                          sink_address: str, operator: str, framework: str, tuple_format: str):
-    image_client = compute_v1.ImagesClient()
-
-    filter_by_label = " AND ".join([f"labels.{k} = \"{v}\"" for k, v in {
+def image_labels(framework: str, operator: str, control_addr: str, control_port: int, source_addr: str,
+                 source_port: int, sink_addr: str, sink_port: int, tuple_format: str) -> dict:
+    return {
         'framework': framework,
         'operator': operator,
-        'control_addr': encode_ip(control_address),
-        'source_addr': encode_ip(source_address),
-        'sink_addr': encode_ip(sink_address),
+        'control_addr': encode_ip(control_addr),
+        'source_addr': encode_ip(source_addr),
+        'sink_addr': encode_ip(sink_addr),
         'control_port': str(control_port),
         'source_port': str(source_port),
         'sink_port': str(sink_port),
         'tuple_format': tuple_format,
-    }.items()])
-
-    request = compute_v1.types.ListImagesRequest(mapping={
-        "filter": filter_by_label,
-        "project": "bdspro"
-    })
+    }
 
-    result = image_client.list(request=request)
 
-    newest = None
-    for page in result.pages:
-        for image in page.items:
-            if image.deprecated:
-                continue
+# Lookups of images by their configuration labels, replaced by a catalog over a FakeImageService in tests
+image_catalog = ImageCatalog(GcpImageService('bdspro'))
 
-            if newest is None:
-                newest = image
-            current_date = iso8601.parse_date(image.creation_timestamp)
-            newest_date = iso8601.parse_date(newest.creation_timestamp)
-            if current_date > newest_date:
-                newest = image
 
-    return newest
+def find_image_that_matches_configuration(control_port: int, control_address: str, source_port: int,
+                                          source_address: str, sink_port: int,
+                                          sink_address: str, operator: str, framework: str, tuple_format: str):
+    return image_catalog.find(image_labels(framework, operator, control_address, control_port, source_address,
+                                           source_port, sink_address, sink_port, tuple_format))
 
 
-def reset_vm(project: str, zone: str, instance_name: str):
-    client = compute_v1.InstancesClient()
+def reset_vm(project: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None):
+    client = instance_client or compute_v1.InstancesClient()
     client.reset(project=project, zone=zone, instance=instance_name)
 
 
 def label_unikernel_image(project: str, image_name: str, framework: str, operator: str, control_addr: str,
                           control_port: int,
                           source_addr: str, source_port: int, sink_addr: str, sink_port: int, tuple_format: str):
-    image_client = compute_v1.ImagesClient()
-    image = image_client.get(project=project, image=image_name)
-
-    labels = {
-        'framework': framework,
-        'operator': operator,
-        'control_addr': encode_ip(control_addr),
-        'source_addr': encode_ip(source_addr),
-        'sink_addr': encode_ip(sink_addr),
-        'control_port': str(control_port),
-        'source_port': str(source_port),
-        'sink_port': str(sink_port),
-        'tuple_format': tuple_format,
-    }
-
-    setLabelRequest = compute_v1.types.GlobalSetLabelsRequest(mapping={
-        "labels": labels,
-        "label_fingerprint": image.label_fingerprint
-    })
-
-    image_client.set_labels_unary(project=project, resource=image_name,
-                                  global_set_labels_request_resource=setLabelRequest)
+    # the catalog serves the new image right away, the next lookup does not have to list the images
+    image_catalog.label(image_name, image_labels(framework, operator, control_addr, control_port, source_addr,
+                                                 source_port, sink_addr, sink_port, tuple_format))
 
 
 def get_image_from_family(project: str, family: str) -> Optional[compute_v1.Image]:
@@ -209,6 +177,7 @@ def create_instance(
         instance_termination_action: str = "STOP",
         custom_hostname: str = None,
         delete_protection: bool = False,
+        instance_client: compute_v1.InstancesClient = None,
 ) -> compute_v1.Instance:
     """
     Send an instance creation request to the Compute Engine API and wait for it to complete.
@@ -246,10 +215,11 @@ def create_instance(
             Custom hostnames must conform to RFC 1035 requirements for valid hostnames.
         delete_protection: boolean value indicating if the new virtual machine should be
             protected against deletion or not.
+        instance_client: (optional) client to send the requests with, a new client is created otherwise.
     Returns:
         Instance object.
     """
-    instance_client = compute_v1.InstancesClient()
+    instance_client = instance_client or compute_v1.InstancesClient()
 
     # Use the network interface provided in the network_link argument.
     network_interface = compute_v1.NetworkInterface()
@@ -324,7 +294,8 @@ def create_instance(
 
 
 def create_from_custom_image(
-        project_id: str, zone: str, instance_name: str, custom_image_link: str
+        project_id: str, zone: str, instance_name: str, custom_image_link: str,
+        instance_client: compute_v1.InstancesClient = None
 ) -> compute_v1.Instance:
     """
     Create a new VM instance with custom image used as its boot disk.
@@ -334,24 +305,55 @@ def create_from_custom_image(
         instance_name: name of the new virtual machine (VM) instance.
         custom_image_link: link to the custom image you want to use in the form of:
             "projects/{project_name}/global/images/{image_name}"
+        instance_client: (optional) client to send the requests with, a new client is created otherwise.
     Returns:
         Instance object.
     """
     disk_type = f"zones/{zone}/diskTypes/pd-standard"
     disks = [disk_from_image(disk_type, 1, True, custom_image_link, True)]
-    instance = create_instance(project_id, zone, instance_name, disks)
+    instance = create_instance(project_id, zone, instance_name, disks, instance_client=instance_client)
     return instance
 
 
+def start_instance(
+        project_id: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None
+):
+    instance_client = instance_client or compute_v1.InstancesClient()
+    operation = instance_client.start(project=project_id, zone=zone, instance=instance_name)
+    wait_for_extended_operation(operation, "instance start")
+
+
+def stop_instance(
+        project_id: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None
+):
+    instance_client = instance_client or compute_v1.InstancesClient()
+    operation = instance_client.stop(project=project_id, zone=zone, instance=instance_name)
+    wait_for_extended_operation(operation, "instance stop")
+
+
 def delete_instance(
-        project_id: str, zone: str, instance_name: str
+        project_id: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None
 ):
-    instance_client = compute_v1.InstancesClient()
+    instance_client = instance_client or compute_v1.InstancesClient()
     instance_client.delete(project=project_id, zone=zone, instance=instance_name)
 
 
 def print_serial_output(
-        project_id: str, zone: str, instance_name: str
+        project_id: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None
 ) -> str:
-    instance_client = compute_v1.InstancesClient()
+    instance_client = instance_client or compute_v1.InstancesClient()
     return instance_client.get_serial_port_output(project=project_id, zone=zone, instance=instance_name).contents
+
+
+def instance_addresses(
+        project_id: str, zone: str, instance_name: str, instance_client: compute_v1.InstancesClient = None
+) -> List[str]:
+    # internal and external IPs, packets of the instance arrive from one of them depending on the route
+    instance_client = instance_client or compute_v1.InstancesClient()
+    instance = instance_client.get(project=project_id, zone=zone, instance=instance_name)
+    addresses = []
+    for interface in instance.network_interfaces:
+        if interface.network_i_p:
+            addresses.append(interface.network_i_p)
+        addresses += [config.nat_i_p for config in interface.access_configs if config.nat_i_p]
+    return addresses
@@ -1,6 +1,15 @@
+import argparse
 import time
 
 import ControlFunctions as cc
+import launcher
+from image_catalog import DEFAULT_IMAGE_CACHE_TTL_IN_SECONDS
+from async_launcher import DEFAULT_MAX_PARALLEL_OPERATIONS, AsyncLauncher
+from backends import GcpInstanceBackend
+from boot_listener import BootListener
+from pool import InstancePool, PoolPolicy
+from qemu import NETWORK_MODES, QemuBackend, QemuConfiguration
+from scheduler import DEFAULT_MAX_CONCURRENT_EXPERIMENTS, ExperimentScheduler
 
 import testbench.common.LoggingFunctions as log
 # create Logger
@@ -9,6 +18,53 @@ from testbench.common.messages import subscribe_control, AbortExperimentMessage,
 
 logger = log.create_logger("control")
 
+parser = argparse.ArgumentParser(description="Control service of the test bench")
+parser.add_argument("--max-concurrent-experiments", type=int, default=DEFAULT_MAX_CONCURRENT_EXPERIMENTS)
+# 'qemu' runs the unikernels as QEMU guests on this machine
+parser.add_argument("--instance-backend", choices=["gcp", "qemu"], default="gcp")
+parser.add_argument("--qemu-kernel", default="{image_name}",
+                    help="kernel path, {image_name} is replaced by the image name of the experiment")
+parser.add_argument("--qemu-network", choices=NETWORK_MODES, default="bridge")
+parser.add_argument("--qemu-bridge", default="kraft0")
+parser.add_argument("--qemu-cpus", type=int, default=1)
+parser.add_argument("--qemu-memory", type=int, default=64, help="guest memory in MB")
+parser.add_argument("--qemu-kernel-arguments", default="",
+                    help="{address} is replaced by one of --qemu-addresses per running guest")
+parser.add_argument("--qemu-addresses", default="", help="comma separated guest addresses")
+parser.add_argument("--qemu-binary", default="qemu-system-x86_64")
+parser.add_argument("--max-parallel-instance-operations", type=int, default=DEFAULT_MAX_PARALLEL_OPERATIONS)
+# reuse stopped instances between experiments
+parser.add_argument("--instance-pool", action="store_true")
+parser.add_argument("--pool-min-idle", type=int, default=1, help="stopped instances kept ready per image")
+parser.add_argument("--pool-max-idle", type=int, default=2, help="stopped instances kept at most per image")
+parser.add_argument("--pool-max-instances", type=int, default=8)
+parser.add_argument("--pool-idle-timeout", type=float, default=600.0,
+                    help="seconds until stopped instances are deleted")
+parser.add_argument("--pool-acquire-timeout", type=float, default=600.0,
+                    help="seconds an experiment waits for an instance once all pool instances are in use")
+parser.add_argument("--image-cache-ttl", type=float, default=DEFAULT_IMAGE_CACHE_TTL_IN_SECONDS,
+                    help="seconds image lookups by configuration are served from memory")
+args = parser.parse_args()
+
+launcher.image_catalog.ttl_in_seconds = args.image_cache_ttl
+
+if args.instance_backend == "qemu":
+    backend = QemuBackend(QemuConfiguration(args.qemu_kernel, args.qemu_network, args.qemu_bridge, args.qemu_cpus,
+                                            args.qemu_memory, args.qemu_kernel_arguments,
+                                            [a for a in args.qemu_addresses.split(",") if a], args.qemu_binary))
+else:
+    backend = GcpInstanceBackend()
+cc.instance_launcher = AsyncLauncher(backend, logger, args.max_parallel_instance_operations)
+cc.boot_listener = BootListener(logger)
+
+if args.instance_pool:
+    cc.instance_pool = InstancePool(cc.instance_launcher, PoolPolicy(args.pool_min_idle, args.pool_max_idle,
+                                                                     args.pool_max_instances, args.pool_idle_timeout,
+                                                                     args.pool_acquire_timeout), logger)
+
+scheduler = ExperimentScheduler(lambda message: cc.launch_experiment(message, logger), logger,
+                                args.max_concurrent_experiments)
+
 
 # use the subscriber client to create a subscription and a callback
 def callback(message):
@@ -17,21 +73,25 @@ def callback(message):
     if StartExperimentMessage.is_of_type(message):
         start_experiment_message = StartExperimentMessage(message)
         logger.info(f"Start Experiment Message: {start_experiment_message}")
-        cc.launch_experiment(start_experiment_message, logger)
+        scheduler.submit(start_experiment_message)
     elif ResponseMeasurementsMessage.is_of_type(message):
         measurements_message = ResponseMeasurementsMessage(message)
         logger.info(f"ResponseMeasurementsMessage: {measurements_message}")
         if measurements_message.source_or_sink == 'source':
-            cc.source_is_done(measurements_message.measurements)
+            cc.source_is_done(measurements_message.test_id, measurements_message.measurements)
         elif measurements_message.source_or_sink == 'sink':
-            cc.sink_is_done(measurements_message.measurements)
+            cc.sink_is_done(measurements_message.test_id, measurements_message.measurements)
         else:
             logger.error(f"Expected source or sink, got: {measurements_message.source_or_sink}")
     elif AbortExperimentMessage.is_of_type(message):
-        logger.warning(f"Abort Message")
-        cc.abort_current_experiment(logger)
+        abort_message = AbortExperimentMessage(message)
+        logger.warning(f"Abort Message: {abort_message.test_id}")
+        for test_id in scheduler.cancel(abort_message.test_id):
+            logger.warning(f"Experiment {test_id} was removed from the queue")
+        cc.abort_current_experiment(logger, abort_message.test_id)
     elif ReadyForRestartMessage.is_of_type(message):
-        cc.ready_for_restart(ReadyForRestartMessage(message).source_or_sink)
+        ready_for_restart_message = ReadyForRestartMessage(message)
+        cc.ready_for_restart(ready_for_restart_message.source_or_sink, ready_for_restart_message.test_id)
     else:
         service_type = message.attributes['serviceType']
         logger.error('Unknown serviceType: {}'.format(service_type))
@@ -44,3 +104,7 @@ try:
         time.sleep(60)
 except KeyboardInterrupt:
     future.cancel()
+    if cc.instance_pool is not None:
+        cc.instance_pool.close()
+    cc.instance_launcher.close()
+    cc.boot_listener.close()
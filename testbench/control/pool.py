@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Dict, List, Union
+
+from async_launcher import AsyncLauncher
+
+# Seconds between two runs of the idle eviction
+EVICTION_INTERVAL_IN_SECONDS = 30.0
+
+
+class PoolPolicy:
+
+    def __init__(self, min_idle_per_image: int = 1, max_idle_per_image: int = 2, max_instances: int = 8,
+                 idle_timeout_in_seconds: float = 600.0, acquire_timeout_in_seconds: float = 600.0) -> None:
+        super().__init__()
+        # stopped instances that are created in the background whenever an image is acquired
+        self.min_idle_per_image = min_idle_per_image
+        # released instances beyond this are deleted instead of stopped
+        self.max_idle_per_image = max_idle_per_image
+        # busy, idle and creating instances of all images together, warm ups are skipped once it is reached
+        self.max_instances = max_instances
+        # stopped instances are deleted after being unused for this long
+        self.idle_timeout_in_seconds = idle_timeout_in_seconds
+        # acquiring waits this long for an instance to be released once max_instances are in use
+        self.acquire_timeout_in_seconds = acquire_timeout_in_seconds
+
+
+class PooledInstance:
+
+    def __init__(self, name: str, image_name: str) -> None:
+        super().__init__()
+        self.name = name
+        self.image_name = image_name
+        self.idle_since: Union[float, None] = None
+
+
+class InstancePool:
+    """
+    Keeps stopped instances per image. Acquiring starts a stopped instance if there is one and only creates a new
+    instance otherwise, releasing stops the instance again. Stopping, deleting and warming up happen in the
+    background through the launcher, only acquiring waits for its operation. Once max_instances exist, acquiring
+    replaces the stopped instance of another image or waits until an instance is released.
+    """
+
+    def __init__(self, launcher: AsyncLauncher, policy: PoolPolicy, logger: logging.Logger) -> None:
+        super().__init__()
+        self.launcher = launcher
+        self.policy = policy
+        self.logger = logger
+        self.lock = threading.Lock()
+        # notified whenever an instance is deleted or becomes idle
+        self.instance_freed = threading.Condition(self.lock)
+        self.idle: Dict[str, List[PooledInstance]] = {}
+        # instances that are created for the idle pool right now
+        self.warming_up: Dict[str, int] = {}
+        # released instances that are being stopped, they already count towards max_idle_per_image
+        self.stopping: Dict[str, int] = {}
+        self.number_of_instances = 0
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+        self.closed = threading.Event()
+        self.eviction_thread = threading.Thread(target=self.evict_periodically, daemon=True)
+        self.eviction_thread.start()
+
+    @staticmethod
+    def instance_name() -> str:
+        # instance names have to start with a letter and may only contain lowercase letters, digits and dashes
+        return f"pool-{uuid.uuid4().hex[:12]}"
+
+    def acquire(self, image_name: str) -> PooledInstance:
+        replaced = None
+        deadline = time.monotonic() + self.policy.acquire_timeout_in_seconds
+        with self.lock:
+            while True:
+                idle = self.idle.get(image_name, [])
+                if idle:
+                    instance = idle.pop()
+                    self.number_of_hits += 1
+                    break
+
+                if self.number_of_instances >= self.policy.max_instances:
+                    # the new instance takes the place of the stopped instance that was unused the longest
+                    replaced = self.pop_least_recently_used()
+                    if replaced is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or self.closed.is_set():
+                            raise RuntimeError(f"All {self.policy.max_instances} instances of the pool are in use")
+                        self.instance_freed.wait(remaining)
+                        continue
+                else:
+                    self.number_of_instances += 1
+                instance = PooledInstance(self.instance_name(), image_name)
+                self.number_of_misses += 1
+                break
+
+        if replaced is not None:
+            self.logger.info(f"Deleting idle instance {replaced.name} of {replaced.image_name} to make room")
+            self.launcher.delete(replaced.name)
+
+        try:
+            if instance.idle_since is None:
+                self.logger.info(f"Creating instance {instance.name} for {image_name}")
+                self.launcher.create(image_name, instance.name).result()
+            else:
+                self.logger.info(f"Starting pooled instance {instance.name} for {image_name}")
+                self.launcher.start(instance.name).result()
+        except Exception:
+            self.discard(instance)
+            raise
+
+        instance.idle_since = None
+        self.warm_up(image_name)
+        return instance
+
+    def pop_least_recently_used(self) -> Union[PooledInstance, None]:
+        # has to be called with the lock held
+        idle = [instance for instances in self.idle.values() for instance in instances]
+        if not idle:
+            return None
+        instance = min(idle, key=lambda i: i.idle_since)
+        self.idle[instance.image_name].remove(instance)
+        return instance
+
+    def release(self, instance: PooledInstance, healthy: bool = True):
+        image_name = instance.image_name
+        with self.lock:
+            keep = healthy and not self.closed.is_set() and \
+                len(self.idle.get(image_name, [])) + self.stopping.get(image_name, 0) < self.policy.max_idle_per_image
+            if keep:
+                self.stopping[image_name] = self.stopping.get(image_name, 0) + 1
+        if not keep:
+            self.discard(instance)
+            return
+
+        self.launcher.stop(instance.name).add_done_callback(lambda stopped: self.stopped(instance, stopped))
+
+    def stopped(self, instance: PooledInstance, stopped: Future):
+        with self.lock:
+            self.stopping[instance.image_name] -= 1
+            keep = stopped.exception() is None and not self.closed.is_set()
+            if keep:
+                instance.idle_since = time.monotonic()
+                self.idle.setdefault(instance.image_name, []).append(instance)
+                self.instance_freed.notify_all()
+        if not keep:
+            self.discard(instance)
+
+    def discard(self, instance: PooledInstance):
+        with self.lock:
+            self.number_of_instances -= 1
+            self.instance_freed.notify_all()
+        # failures are logged by the launcher
+        self.launcher.delete(instance.name)
+
+    def warm_up(self, image_name: str):
+        # creates the missing stopped instances of an image in the background
+        with self.lock:
+            available = len(self.idle.get(image_name, [])) + self.stopping.get(image_name, 0) + \
+                self.warming_up.get(image_name, 0)
+            missing = max(min(self.policy.min_idle_per_image - available,
+                              self.policy.max_instances - self.number_of_instances), 0)
+            self.number_of_instances += missing
+            self.warming_up[image_name] = self.warming_up.get(image_name, 0) + missing
+
+        for _ in range(missing):
+            instance = PooledInstance(self.instance_name(), image_name)
+            self.launcher.create(image_name, instance.name).add_done_callback(
+                lambda created, instance=instance: self.warmed_up(instance, created))
+
+    def warmed_up(self, instance: PooledInstance, created: Future):
+        with self.lock:
+            self.warming_up[instance.image_name] -= 1
+        if created.exception() is not None:
+            # a partially created instance is deleted as well
+            self.discard(instance)
+            return
+        self.release(instance)
+
+    def evict_idle(self, max_idle_in_seconds: float):
+        now = time.monotonic()
+        evicted = []
+        with self.lock:
+            for image_name, instances in self.idle.items():
+                evicted += [i for i in instances if now - i.idle_since >= max_idle_in_seconds]
+                self.idle[image_name] = [i for i in instances if now - i.idle_since < max_idle_in_seconds]
+
+        for instance in evicted:
+            self.logger.info(f"Evicting idle instance {instance.name} of {instance.image_name}")
+            self.discard(instance)
+
+    def evict_periodically(self):
+        while not self.closed.wait(EVICTION_INTERVAL_IN_SECONDS):
+            self.evict_idle(self.policy.idle_timeout_in_seconds)
+
+    def close(self):
+        # deletes all stopped instances, busy instances are deleted when they are released
+        self.closed.set()
+        self.evict_idle(0.0)
+        with self.lock:
+            # waiting acquires fail
+            self.instance_freed.notify_all()
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "number_of_instances": self.number_of_instances,
+                "number_of_idle_instances": sum(len(instances) for instances in self.idle.values()),
+                "number_of_hits": self.number_of_hits,
+                "number_of_misses": self.number_of_misses,
+            }
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from typing import Dict, List, Union
+
+from backends import LocalProcessBackend
+
+NETWORK_MODES = ("user", "bridge", "none")
+# Seconds to wait for QEMU's monitor socket when resetting a guest
+QMP_TIMEOUT_IN_SECONDS = 5.0
+
+
+def kvm_is_available() -> bool:
+    return os.access("/dev/kvm", os.R_OK | os.W_OK)
+
+
+class QemuConfiguration:
+
+    def __init__(self, kernel: str, network: str = "user", bridge: str = "kraft0", number_of_cpus: int = 1,
+                 memory_in_mb: int = 64, kernel_arguments: str = "", addresses: List[str] = None,
+                 qemu: str = "qemu-system-x86_64", use_kvm: Union[bool, None] = None) -> None:
+        super().__init__()
+        if network not in NETWORK_MODES:
+            raise ValueError(f"Unknown network mode {network}, expected one of {NETWORK_MODES}")
+        # path of the kernel, "{image_name}" is replaced by the image of the experiment
+        self.kernel = kernel
+        # "user" lets QEMU forward the guest's connections from the host, "bridge" attaches it to `bridge`
+        self.network = network
+        self.bridge = bridge
+        self.number_of_cpus = number_of_cpus
+        self.memory_in_mb = memory_in_mb
+        # "{address}" is replaced by an address of `addresses` that no other running guest uses, e.g. for
+        # "netdev.ipv4_addr={address} netdev.ipv4_gw_addr=172.44.0.1 netdev.ipv4_subnet_mask=255.255.255.0 --"
+        self.kernel_arguments = kernel_arguments
+        self.addresses = list(addresses or [])
+        self.qemu = qemu
+        # software emulation is used if KVM is not available
+        self.use_kvm = kvm_is_available() if use_kvm is None else use_kvm
+
+
+class QemuBackend(LocalProcessBackend):
+    """
+    Runs every instance as a QEMU guest on this machine. The serial console is read from QEMU's stdio, resets are
+    sent through QMP, so the guest reboots without restarting QEMU like a reset of a cloud VM.
+    """
+
+    def __init__(self, configuration: QemuConfiguration) -> None:
+        super().__init__(self.qemu_command)
+        self.configuration = configuration
+        self.run_directory = tempfile.mkdtemp(prefix="qemu-guests-")
+        self.free_addresses = list(configuration.addresses)
+        self.instance_addresses: Dict[str, str] = {}
+        self.instance_numbers: Dict[str, int] = {}
+        self.number_of_created_instances = 0
+        self.address_lock = threading.Lock()
+
+    def create(self, image_name: str, instance_name: str):
+        with self.address_lock:
+            if "{address}" in self.configuration.kernel_arguments:
+                if not self.free_addresses:
+                    raise RuntimeError(f"No free guest address left for {instance_name}")
+                self.instance_addresses[instance_name] = self.free_addresses.pop(0)
+            self.number_of_created_instances += 1
+            self.instance_numbers[instance_name] = self.number_of_created_instances
+        super().create(image_name, instance_name)
+
+    def qmp_path(self, instance_name: str) -> str:
+        return os.path.join(self.run_directory, f"{instance_name}.qmp")
+
+    def mac_address(self, instance_name: str) -> str:
+        # guests on the same bridge need distinct addresses, 52:54:00 is QEMU's prefix
+        number = self.instance_numbers[instance_name]
+        return f"52:54:00:{(number >> 16) & 0xff:02x}:{(number >> 8) & 0xff:02x}:{number & 0xff:02x}"
+
+    def qemu_command(self, image_name: str, instance_name: str) -> List[str]:
+        configuration = self.configuration
+        command = [
+            configuration.qemu,
+            "-kernel", configuration.kernel.format(image_name=image_name),
+            "-smp", str(configuration.number_of_cpus),
+            "-m", str(configuration.memory_in_mb),
+            "-display", "none",
+            "-serial", "stdio",
+            "-monitor", "none",
+            "-qmp", f"unix:{self.qmp_path(instance_name)},server=on,wait=off",
+        ]
+        if configuration.use_kvm:
+            command += ["-accel", "kvm", "-cpu", "host"]
+        else:
+            command += ["-accel", "tcg", "-cpu", "max"]
+
+        if configuration.network == "none":
+            command += ["-nic", "none"]
+        else:
+            netdev = "user,id=net0" if configuration.network == "user" else f"bridge,id=net0,br={configuration.bridge}"
+            command += ["-netdev", netdev,
+                        "-device", f"virtio-net-pci,netdev=net0,mac={self.mac_address(instance_name)}"]
+
+        if configuration.kernel_arguments:
+            command += ["-append", configuration.kernel_arguments.format(
+                address=self.instance_addresses.get(instance_name, ""), instance_name=instance_name)]
+        return command
+
+    def reset(self, instance_name: str):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as qmp:
+            qmp.settimeout(QMP_TIMEOUT_IN_SECONDS)
+            qmp.connect(self.qmp_path(instance_name))
+            replies = qmp.makefile("r")
+            # greeting
+            replies.readline()
+            for command in ("qmp_capabilities", "system_reset"):
+                qmp.sendall(json.dumps({"execute": command}).encode("utf-8") + b"\n")
+                reply = json.loads(replies.readline())
+                # asynchronous events may arrive before the reply
+                while "event" in reply:
+                    reply = json.loads(replies.readline())
+                if "error" in reply:
+                    raise RuntimeError(f"QMP {command} failed for {instance_name}: {reply['error']}")
+
+    def addresses(self, instance_name: str) -> Union[List[str], None]:
+        # with user networking the packets of all guests come from the host
+        if self.configuration.network != "bridge":
+            return None
+        with self.address_lock:
+            address = self.instance_addresses.get(instance_name)
+        return None if address is None else [address]
+
+    def delete(self, instance_name: str):
+        super().delete(instance_name)
+        with self.address_lock:
+            address = self.instance_addresses.pop(instance_name, None)
+            if address is not None:
+                self.free_addresses.append(address)
+            self.instance_numbers.pop(instance_name, None)
+        if os.path.exists(self.qmp_path(instance_name)):
+            os.remove(self.qmp_path(instance_name))
+
+    def close(self):
+        # the guests have to exit before their QMP sockets are removed
+        super().close()
+        shutil.rmtree(self.run_directory, ignore_errors=True)
@@ -0,0 +1,82 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Set, Union
+
+from testbench.common.messages import StartExperimentMessage
+
+DEFAULT_MAX_CONCURRENT_EXPERIMENTS = 4
+
+
+def ports_of(message: StartExperimentMessage) -> Set[tuple]:
+    # boot packets arrive on the control port, the operator connects to the source and sink ports
+    return {
+        ('control', message.control_port),
+        ('source', message.source_address, message.source_port),
+        ('sink', message.sink_address, message.sink_port),
+    }
+
+
+class ExperimentScheduler:
+    """
+    Queues experiments and runs up to `max_concurrent_experiments` of them at once, each on its own thread. An
+    experiment is only started once no running experiment uses one of its ports, otherwise it keeps its place in the
+    queue and later experiments may overtake it.
+    """
+
+    def __init__(self, run_experiment: Callable[[StartExperimentMessage], None], logger: logging.Logger,
+                 max_concurrent_experiments: int = DEFAULT_MAX_CONCURRENT_EXPERIMENTS) -> None:
+        super().__init__()
+        self.run_experiment = run_experiment
+        self.logger = logger
+        self.max_concurrent_experiments = max_concurrent_experiments
+        self.condition = threading.Condition()
+        self.queue: List[StartExperimentMessage] = []
+        self.running: Dict[str, StartExperimentMessage] = {}
+
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(max_concurrent_experiments)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, message: StartExperimentMessage) -> bool:
+        with self.condition:
+            if message.test_id in self.running or any(m.test_id == message.test_id for m in self.queue):
+                self.logger.warning(f"Experiment {message.test_id} is already scheduled")
+                return False
+            self.queue.append(message)
+            self.logger.info(f"Queued experiment {message.test_id}, {len(self.queue)} waiting, "
+                             f"{len(self.running)} running")
+            self.condition.notify_all()
+            return True
+
+    def cancel(self, test_id: Union[str, None] = None) -> List[str]:
+        # removes queued experiments, all of them without a test id, and returns their test ids
+        with self.condition:
+            cancelled = [m.test_id for m in self.queue if test_id is None or m.test_id == test_id]
+            self.queue = [m for m in self.queue if m.test_id not in cancelled]
+            return cancelled
+
+    def next_experiment(self) -> Union[StartExperimentMessage, None]:
+        used_ports = set()
+        for message in self.running.values():
+            used_ports |= ports_of(message)
+        for message in self.queue:
+            if not ports_of(message) & used_ports:
+                return message
+        return None
+
+    def work(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.next_experiment() is not None)
+                message = self.next_experiment()
+                self.queue.remove(message)
+                self.running[message.test_id] = message
+
+            try:
+                self.run_experiment(message)
+            except Exception as e:
+                self.logger.error(f"Experiment {message.test_id} failed: {e}")
+            finally:
+                with self.condition:
+                    del self.running[message.test_id]
+                    self.condition.notify_all()
@@ -0,0 +1,68 @@
+import time
+
+from image_catalog import FakeImageService, ImageCatalog
+
+LABELS = {"framework": "unikraft", "operator": "filter", "control-port": "8081"}
+
+
+def test_lookups_are_served_from_the_cache():
+    service = FakeImageService()
+    service.add_image("unikraft-filter-1", LABELS)
+    catalog = ImageCatalog(service, ttl_in_seconds=60.0)
+
+    assert catalog.find(LABELS).name == "unikraft-filter-1"
+    assert catalog.find(dict(reversed(list(LABELS.items())))).name == "unikraft-filter-1"
+    assert service.number_of_list_calls == 1
+    assert catalog.number_of_hits == 1
+    assert catalog.number_of_misses == 1
+
+
+def test_entries_expire_after_the_ttl():
+    service = FakeImageService()
+    service.add_image("unikraft-filter-1", LABELS, "2023-02-04T15:00:00+00:00")
+    catalog = ImageCatalog(service, ttl_in_seconds=0.05)
+    assert catalog.find(LABELS).name == "unikraft-filter-1"
+
+    service.add_image("unikraft-filter-2", LABELS, "2023-02-04T16:00:00+00:00")
+    assert catalog.find(LABELS).name == "unikraft-filter-1"
+    assert service.number_of_list_calls == 1
+
+    time.sleep(0.1)
+    assert catalog.find(LABELS).name == "unikraft-filter-2"
+    assert service.number_of_list_calls == 2
+
+
+def test_misses_are_cached():
+    service = FakeImageService()
+    catalog = ImageCatalog(service, ttl_in_seconds=60.0)
+    assert catalog.find(LABELS) is None
+
+    service.add_image("unikraft-filter-1", LABELS)
+    assert catalog.find(LABELS) is None
+    assert service.number_of_list_calls == 1
+
+    catalog.invalidate(LABELS)
+    assert catalog.find(LABELS).name == "unikraft-filter-1"
+    assert service.number_of_list_calls == 2
+
+
+def test_label_replaces_the_cached_entry():
+    service = FakeImageService()
+    catalog = ImageCatalog(service, ttl_in_seconds=60.0)
+    assert catalog.find(LABELS) is None
+
+    service.add_image("unikraft-filter-1")
+    catalog.label("unikraft-filter-1", LABELS)
+    assert service.images["unikraft-filter-1"].labels == LABELS
+    assert catalog.find(LABELS).name == "unikraft-filter-1"
+    assert service.number_of_list_calls == 1
+
+
+def test_newest_image_that_is_not_deprecated_is_found():
+    service = FakeImageService()
+    service.add_image("unikraft-filter-1", LABELS, "2023-02-04T15:00:00+00:00")
+    service.add_image("unikraft-filter-2", LABELS, "2023-02-04T16:00:00+00:00")
+    service.add_image("unikraft-filter-3", LABELS, "2023-02-04T17:00:00+00:00", deprecated={"state": "DEPRECATED"})
+    service.add_image("unikraft-map-1", {**LABELS, "operator": "map"}, "2023-02-04T18:00:00+00:00")
+
+    assert ImageCatalog(service).find(LABELS).name == "unikraft-filter-2"
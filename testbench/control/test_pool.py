@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from async_launcher import AsyncLauncher
+from backends import LocalProcessBackend
+from pool import InstancePool, PoolPolicy
+
+IMAGE_NAME = "unikraft-filter"
+
+
+def wait_until(condition, timeout_in_seconds: float = 10.0):
+    deadline = time.monotonic() + timeout_in_seconds
+    while not condition():
+        assert time.monotonic() < deadline, "condition was not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def backend():
+    backend = LocalProcessBackend()
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def create_pool(backend):
+    pools = []
+
+    def create(policy: PoolPolicy) -> InstancePool:
+        pool = InstancePool(AsyncLauncher(backend, logging.getLogger("test")), policy, logging.getLogger("test"))
+        pools.append(pool)
+        return pool
+
+    yield create
+    for pool in pools:
+        pool.close()
+        pool.launcher.close()
+
+
+def number_of_idle_instances(pool: InstancePool) -> int:
+    return pool.summary()["number_of_idle_instances"]
+
+
+def test_released_instance_is_stopped_and_reused(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1))
+
+    instance = pool.acquire(IMAGE_NAME)
+    assert instance.name in backend.processes
+
+    pool.release(instance)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+    assert instance.name not in backend.processes
+    assert instance.name in backend.images
+
+    reused = pool.acquire(IMAGE_NAME)
+    assert reused.name == instance.name
+    assert reused.name in backend.processes
+    assert pool.summary()["number_of_hits"] == 1
+    assert pool.summary()["number_of_misses"] == 1
+
+
+def test_acquire_warms_up_stopped_instances(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=2, max_idle_per_image=2))
+
+    instance = pool.acquire(IMAGE_NAME)
+    wait_until(lambda: number_of_idle_instances(pool) == 2)
+    assert pool.summary()["number_of_instances"] == 3
+    assert list(backend.processes) == [instance.name]
+
+
+def test_warm_up_respects_max_instances(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=2, max_idle_per_image=2, max_instances=2))
+
+    pool.acquire(IMAGE_NAME)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+    assert pool.summary()["number_of_instances"] == 2
+    assert len(backend.images) == 2
+
+
+def test_instances_beyond_max_idle_are_deleted(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1))
+    first = pool.acquire(IMAGE_NAME)
+    second = pool.acquire(IMAGE_NAME)
+
+    pool.release(first)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+    pool.release(second)
+    wait_until(lambda: second.name not in backend.images)
+    assert first.name in backend.images
+    assert pool.summary()["number_of_instances"] == 1
+
+
+def test_unhealthy_instances_are_deleted(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1))
+    instance = pool.acquire(IMAGE_NAME)
+
+    pool.release(instance, healthy=False)
+    wait_until(lambda: instance.name not in backend.images)
+    assert number_of_idle_instances(pool) == 0
+    assert pool.summary()["number_of_instances"] == 0
+
+
+def test_idle_instances_are_evicted(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1))
+    instance = pool.acquire(IMAGE_NAME)
+    pool.release(instance)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+
+    pool.evict_idle(60.0)
+    assert number_of_idle_instances(pool) == 1
+
+    pool.evict_idle(0.0)
+    wait_until(lambda: instance.name not in backend.images)
+    assert number_of_idle_instances(pool) == 0
+    assert pool.summary()["number_of_instances"] == 0
+
+
+def test_close_deletes_idle_and_released_instances(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=2))
+    idle = pool.acquire(IMAGE_NAME)
+    busy = pool.acquire(IMAGE_NAME)
+    pool.release(idle)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+
+    pool.close()
+    wait_until(lambda: idle.name not in backend.images)
+
+    pool.release(busy)
+    wait_until(lambda: busy.name not in backend.images)
+    assert not backend.processes
+
+
+def test_releases_reserve_idle_slots_before_the_instances_are_stopped(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1))
+    instances = [pool.acquire(IMAGE_NAME) for _ in range(3)]
+
+    for instance in instances:
+        pool.release(instance)
+    wait_until(lambda: number_of_idle_instances(pool) == 1 and len(backend.images) == 1)
+    assert pool.summary()["number_of_instances"] == 1
+
+
+def test_acquire_waits_for_a_released_instance(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1, max_instances=1))
+    instance = pool.acquire(IMAGE_NAME)
+
+    releaser = threading.Timer(0.2, pool.release, args=(instance,))
+    releaser.start()
+    started = time.monotonic()
+    reused = pool.acquire(IMAGE_NAME)
+    releaser.join()
+
+    assert time.monotonic() - started >= 0.2
+    assert reused.name == instance.name
+    assert pool.summary()["number_of_instances"] == 1
+
+
+def test_acquire_fails_once_all_instances_are_in_use(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_instances=1, acquire_timeout_in_seconds=0.1))
+    pool.acquire(IMAGE_NAME)
+
+    with pytest.raises(RuntimeError):
+        pool.acquire(IMAGE_NAME)
+    assert pool.summary()["number_of_instances"] == 1
+    assert len(backend.images) == 1
+
+
+def test_idle_instance_of_another_image_makes_room(backend, create_pool):
+    pool = create_pool(PoolPolicy(min_idle_per_image=0, max_idle_per_image=1, max_instances=1))
+    instance = pool.acquire(IMAGE_NAME)
+    pool.release(instance)
+    wait_until(lambda: number_of_idle_instances(pool) == 1)
+
+    other = pool.acquire("unikraft-map")
+    wait_until(lambda: instance.name not in backend.images)
+    assert backend.images == {other.name: "unikraft-map"}
+    assert pool.summary()["number_of_instances"] == 1
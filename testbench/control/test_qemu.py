@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+from qemu import QemuBackend, QemuConfiguration
+
+# Stand-in for QEMU that ignores its arguments and runs until it is terminated
+FAKE_QEMU = "import time; print('QEMU started', flush=True); time.sleep(1 << 30)"
+
+
+@pytest.fixture
+def fake_qemu(tmp_path):
+    path = tmp_path / "qemu-system-x86_64"
+    path.write_text(f"#!{sys.executable}\n{FAKE_QEMU}\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+def create_backend(fake_qemu: str, addresses) -> QemuBackend:
+    return QemuBackend(QemuConfiguration("{image_name}.kernel", network="bridge", addresses=addresses,
+                                         kernel_arguments="netdev.ipv4_addr={address} --", qemu=fake_qemu,
+                                         use_kvm=False))
+
+
+def test_guests_get_distinct_addresses_and_macs(fake_qemu):
+    backend = create_backend(fake_qemu, ["172.44.0.2", "172.44.0.3"])
+    try:
+        backend.create("unikraft-filter", "first")
+        backend.create("unikraft-filter", "second")
+        with pytest.raises(RuntimeError):
+            backend.create("unikraft-filter", "third")
+
+        assert backend.addresses("first") == ["172.44.0.2"]
+        assert backend.addresses("second") == ["172.44.0.3"]
+        assert backend.mac_address("first") != backend.mac_address("second")
+        assert "netdev.ipv4_addr=172.44.0.3 --" in backend.qemu_command("unikraft-filter", "second")
+
+        backend.delete("first")
+        backend.create("unikraft-filter", "fourth")
+        assert backend.addresses("fourth") == ["172.44.0.2"]
+    finally:
+        backend.close()
+
+
+def test_close_terminates_all_guests(fake_qemu):
+    backend = create_backend(fake_qemu, ["172.44.0.2", "172.44.0.3"])
+    backend.create("unikraft-filter", "first")
+    backend.create("unikraft-filter", "second")
+    processes = list(backend.processes.values())
+
+    backend.close()
+    assert all(process.poll() is not None for process in processes)
+    assert not backend.processes
+    assert not os.path.exists(backend.run_directory)
@@ -2,12 +2,28 @@ from flask import Flask, request, jsonify
 
 import testbench.common.LoggingFunctions as log
 import testbench.common.UniqueIdGenerator as uid
-from testbench.common.messages import abort_experiment, start_experiment
+from testbench.common.messages import DEFAULT_IDLE_TIMEOUT_IN_SECONDS, abort_experiment, start_experiment
 
 app = Flask(__name__)
 
 logger = log.create_logger('flask-api')
 
+# Query arguments accepted for each rate profile, mapped to the parameter names used by the source
+RATE_PROFILE_PARAMETERS = {
+    'constant': {'rate': 'rate'},
+    'linear': {'startRate': 'start_rate', 'endRate': 'end_rate', 'rampDuration': 'duration'},
+    'step': {'startRate': 'start_rate', 'stepRate': 'step_rate', 'stepDuration': 'step_duration',
+             'maxRate': 'max_rate'},
+    'geometric': {'startRate': 'start_rate', 'rampFactor': 'factor', 'maxRate': 'max_rate'},
+}
+# Arguments the source has no default for, the geometric profile falls back to delay and the ramp factor
+REQUIRED_RATE_PROFILE_ARGUMENTS = {
+    'constant': ['rate'],
+    'linear': ['startRate', 'endRate', 'rampDuration'],
+    'step': ['startRate', 'stepRate', 'stepDuration'],
+    'geometric': [],
+}
+
 
 @app.route('/')
 def root():
@@ -101,7 +117,8 @@ def evaluateDatasetEndpoint():
 
 @app.route('/abort')
 def abortExperiment():
-    abort_experiment()
+    # without an experimentId every running and queued experiment is aborted
+    abort_experiment(request.args.get('experimentId', None))
 
 
 @app.route('/newExperiment')
@@ -124,15 +141,49 @@ def new_experiment_endpoint():
     force_rebuild = request.args.get('forceRebuild').lower() == 'true'
     tuple_format = request.args.get('tupleFormat', "binary").lower()
     ramp_factor = 1.02
+    rate_profile = request.args.get('rateProfile', 'geometric').lower()
+    batch_size = int(request.args.get('batchSize', 1))
+    batch_size_in_bytes = int(request.args.get('batchSizeInBytes', 0))
+    # number of parallel connections the operator opens to the source
+    source_workers = int(request.args.get('sourceWorkers', 1))
+    # separator written after every JSON tuple, e.g. "|" for NES
+    tuple_delimiter = request.args.get('tupleDelimiter', '')
+    adaptive_backpressure = request.args.get('adaptiveBackpressure', 'false').lower() == 'true'
+    # seconds without data after which the sink records an idle period
+    idle_timeout = float(request.args.get('idleTimeout', DEFAULT_IDLE_TIMEOUT_IN_SECONDS))
+    # number of parallel connections the operator opens to the sink
+    sink_connections = int(request.args.get('sinkConnections', 1))
+    # every sink worker listens on its own socket and the kernel distributes the connections
+    sink_reuse_port = request.args.get('sinkReusePort', 'false').lower() == 'true'
+    # size of the file the sink captures the raw stream of every connection into, 0 disables the capture
+    capture_size_in_bytes = int(request.args.get('captureSizeInBytes', 0))
+    # the sink additionally records when the kernel received the tuples
+    kernel_timestamps = request.args.get('kernelTimestamps', 'false').lower() == 'true'
 
     if tuple_format not in ("json", "binary"):
         tuple_format = "binary"
 
+    if rate_profile not in RATE_PROFILE_PARAMETERS:
+        rate_profile = "geometric"
+
+    missing_arguments = [a for a in REQUIRED_RATE_PROFILE_ARGUMENTS[rate_profile] if request.args.get(a) is None]
+    if missing_arguments:
+        return jsonify({'message': f'Rate profile {rate_profile} requires the arguments {missing_arguments}'}), 400
+
+    # rate profile parameters are given in tuples per second and seconds, e.g. rateProfile=linear&startRate=1000
+    rate_profile_parameters = {
+        parameter: float(request.args.get(argument))
+        for argument, parameter in RATE_PROFILE_PARAMETERS[rate_profile].items()
+        if request.args.get(argument) is not None
+    }
+
     experiment_id = uid.generateUniqueExperimentId()
 
     start_experiment(control_port, control_address, sink_port, sink_address, source_port, source_address, operator,
                      github_token, image_name, iterations, delay, ramp_factor, experiment_id, dataset_id, evaluation_id,
-                     force_rebuild, sample_rate, restarts, tuple_format)
+                     force_rebuild, sample_rate, restarts, tuple_format, rate_profile, rate_profile_parameters,
+                     batch_size, batch_size_in_bytes, source_workers, tuple_delimiter, adaptive_backpressure,
+                     idle_timeout, sink_connections, sink_reuse_port, capture_size_in_bytes, kernel_timestamps)
 
     # return datasetId, evaluationId, parameters
     response = {
@@ -1,26 +1,38 @@
+import asyncio
+import contextlib
 import gc
-import json
 import logging
-import select
 import socket
-import struct
 import threading
 import time
 from datetime import datetime
-from typing import Union
+from typing import Dict, List, Union
+
+import numpy as np
 
 import testbench.common.CustomGoogleCloudStorage as gcs
+from testbench.common.arrays import GrowableArray
+from testbench.common.datasets import load_dataset
+from testbench.common.eventloop import StopSignal, wait_readable
 from testbench.common.experiment import ExperimentAbortedException, ExperimentAlreadyRunningException, \
     ExperimentFailedException
-from testbench.common.messages import ThroughputStartMessage, response_measurements, ready_for_restart, abort_experiment
+from testbench.common.kernel_timestamps import enable_kernel_timestamps, receive_with_kernel_timestamp, to_perf_counter
+from testbench.common.messages import ThroughputStartMessage, response_measurements, ready_for_restart, \
+    abort_experiment, DEFAULT_IDLE_TIMEOUT_IN_SECONDS, DEFAULT_DATA_PORT
+from testbench.common.selectivity import ExpectedTuples, Selectivity, number_of_samples
 from testbench.common.stats import PacketStats, diff
-
-PORT = 8081
+from testbench.common.timestamps import latencies_in_us, timestamp_in_us
+from testbench.common.workers import STOP_POLL_INTERVAL_IN_SECONDS, mp_context, run_in_worker, run_workers
+from capture import StreamCapture, capture_path
+from decoding import decode_binary, decode_json
+from delivery import DeliveryVerifier
+from framing import FRAMES, BinaryFramer, JsonFramer, StreamReassembler
+from latency import LatencyRecorder
 
 
 class Measurements:
 
-    def __init__(self) -> None:
+    def __init__(self, expected_tuples: Union[ExpectedTuples, None] = None) -> None:
         super().__init__()
         self.start_timestamp: float | None = None
         self.start_datetime: datetime | None = None
@@ -31,42 +43,141 @@ class Measurements:
         self.final_packet_stats: PacketStats | None = None
         self.diff_packet_stats: PacketStats | None = None
 
-        self.tuples_source_timestamps = []
-        self.tuples_processing_timestamps = []
-        self.tuples_received_timestamps = []
+        self.tuples_source_timestamps = GrowableArray(np.float64)
+        self.tuples_processing_timestamps = GrowableArray(np.float64)
+        self.tuples_received_timestamps = GrowableArray(np.float64)
+        # Kernel receive time of the chunk that completed a sampled tuple, on the perf_counter clock
+        self.tuples_kernel_received_timestamps = GrowableArray(np.float64)
         self.number_of_tuples_recv = 0
 
+        # Tuple ids that are not larger than the id of the preceding tuple
+        self.number_of_out_of_order_tuples = 0
+        self.last_tuple_id: int | None = None
+        # JSON frames that do not match the tuple schema
+        self.number_of_invalid_tuples = 0
+
+        # Periods without data that lasted longer than the idle timeout
+        self.idle_periods = []
+
+        # Lost, duplicated and unexpected tuples, only if the dataset of the experiment is known
+        self.delivery = DeliveryVerifier(expected_tuples) if expected_tuples is not None else None
+
+        # End-to-end latency of every tuple, derived from its source timestamp (c)
+        self.latency = LatencyRecorder()
+
+        # Per connection summary if the sink accepts multiple connections
+        self.connections = []
+        # Files the raw streams were captured into
+        self.captures = []
+
     def get_measurements(self) -> dict:
         return {
             "start_timestamp": self.start_timestamp,
             "start_unix_timestamp": time.mktime(self.start_datetime.timetuple()),
             "done_timestamp": self.done_timestamp,
-            "tuples_received_timestamps": self.tuples_received_timestamps,
-            "tuples_source_timestamps": self.tuples_source_timestamps,
-            "tuples_processing_timestamps": self.tuples_processing_timestamps,
+            "tuples_received_timestamps": self.tuples_received_timestamps.encode(),
+            "tuples_kernel_received_timestamps": self.tuples_kernel_received_timestamps.encode(),
+            "tuples_source_timestamps": self.tuples_source_timestamps.encode(),
+            "tuples_processing_timestamps": self.tuples_processing_timestamps.encode(),
             "number_of_tuples_recv": self.number_of_tuples_recv,
+            "number_of_out_of_order_tuples": self.number_of_out_of_order_tuples,
+            "number_of_invalid_tuples": self.number_of_invalid_tuples,
+            "idle_periods": self.idle_periods,
+            "latency": self.latency.summary(),
+            "delivery": self.delivery.summary() if self.delivery is not None else None,
             "packets": vars(self.diff_packet_stats),
+            "connections": self.connections,
+            "captures": self.captures,
         }
 
+    def merge(self, connection: 'Measurements'):
+        """
+        Adds the measurements of a single connection. Sampled timestamps stay sorted by their receive time, counters
+        are summed up.
+        """
+        received = np.concatenate((self.tuples_received_timestamps.to_numpy(),
+                                   connection.tuples_received_timestamps.to_numpy()))
+        order = np.argsort(received, kind='stable')
+        self.tuples_received_timestamps = GrowableArray.from_numpy(received[order])
+        # JSON samples have a source and processing timestamp for every receive timestamp, kernel timestamps are
+        # taken for every sample if enabled
+        for name in ("tuples_source_timestamps", "tuples_processing_timestamps", "tuples_kernel_received_timestamps"):
+            values = np.concatenate((getattr(self, name).to_numpy(), getattr(connection, name).to_numpy()))
+            setattr(self, name, GrowableArray.from_numpy(values[order] if len(values) == len(order) else values))
+
+        self.number_of_tuples_recv += connection.number_of_tuples_recv
+        self.number_of_out_of_order_tuples += connection.number_of_out_of_order_tuples
+        self.number_of_invalid_tuples += connection.number_of_invalid_tuples
+        self.idle_periods = sorted(self.idle_periods + connection.idle_periods, key=lambda period: period["start"])
+        self.captures += connection.captures
+        self.latency.merge(connection.latency)
+        if self.delivery is not None and connection.delivery is not None:
+            self.delivery.merge(connection.delivery)
+
+        if connection.start_timestamp is not None and (self.start_timestamp is None or
+                                                       connection.start_timestamp < self.start_timestamp):
+            self.start_timestamp = connection.start_timestamp
+            self.start_datetime = connection.start_datetime
+        if connection.done_timestamp is not None:
+            self.done_timestamp = max(self.done_timestamp or 0.0, connection.done_timestamp)
+
+        duration = None
+        if connection.start_timestamp is not None and connection.done_timestamp is not None:
+            duration = connection.done_timestamp - connection.start_timestamp
+        self.connections.append({
+            "number_of_tuples_recv": connection.number_of_tuples_recv,
+            "start_timestamp": connection.start_timestamp,
+            "done_timestamp": connection.done_timestamp,
+            "throughput": connection.number_of_tuples_recv / duration if duration else None,
+            "number_of_out_of_order_tuples": connection.number_of_out_of_order_tuples,
+        })
+
 
 class TestContext:
 
-    def __init__(self, logger: logging.Logger, sample_rate: int, restarts: int) -> None:
+    def __init__(self, logger: logging.Logger, sample_rate: int, restarts: int,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT_IN_SECONDS,
+                 expected_tuples: Union[ExpectedTuples, None] = None, number_of_connections: int = 1,
+                 reuse_port: bool = False, capture_size_in_bytes: int = 0, capture_prefix: str = '',
+                 kernel_timestamps: bool = False, test_id: str = None, port: int = DEFAULT_DATA_PORT) -> None:
         super().__init__()
         self.sink_socket: socket.socket | None = None
+        self.test_id = test_id
+        # concurrent experiments listen on different ports
+        self.port = port
+        self.idle_timeout = idle_timeout
+        # Connections that are served by one worker process each
+        self.number_of_connections = number_of_connections
+        # Every worker listens on its own socket, instead of the coordinator accepting all connections
+        self.reuse_port = reuse_port
+        # Size of the file the raw stream of every connection is captured into, 0 disables the capture
+        self.capture_size_in_bytes = capture_size_in_bytes
+        self.capture_prefix = capture_prefix
+        self.capture: StreamCapture | None = None
+        # Read the kernel receive time of every chunk with recvmsg
+        self.kernel_timestamps = kernel_timestamps
+        self.kernel_received_time_ns: int | None = None
+        # every restart sends the same tuple ids again
+        self.expected_tuples = expected_tuples
 
         self.logger = logger
         self.error_or_aborted = True
         self.was_aborted = False
         self.sample_rate = sample_rate
-        self.stop_event = threading.Event()
+        # shared with the worker processes, which poll it
+        self.stop_signal = StopSignal(mp_context.Event())
+        self.stop_event = self.stop_signal.stop_event
         self.restarts = restarts
         self.measurements: [Measurements] = []
-        self.current_measurement = Measurements()
+        self.current_measurement = Measurements(expected_tuples)
+
+    def expect(self, expected_tuples: ExpectedTuples):
+        self.expected_tuples = expected_tuples
+        self.current_measurement = Measurements(expected_tuples)
 
     def restart(self):
         self.measurements.append(self.current_measurement)
-        self.current_measurement = Measurements()
+        self.current_measurement = Measurements(self.expected_tuples)
 
     def get_measurements(self):
         return {
@@ -80,246 +191,495 @@ class TestContext:
 
 
 MAX_RECV_BUFFER_SIZE_IN_BYTES = 4096
-TUPLE_SIZE_IN_BYTES = 20
-
-
-def receive_non_blocking(context: TestContext, client_socket: socket.socket):
-    repeat_if_blocking_delay = 0.000001
-    counter = 0
-
+TUPLE_DELIMITERS = "|\n "
+# Throughput is logged at most once per LOG_INTERVAL_IN_SECONDS
+LOG_INTERVAL_IN_SECONDS = 5
+# A binary DONE is only handled if no more bytes follow within this time, otherwise it was the start of a tuple
+TOKEN_CONFIRMATION_TIMEOUT_IN_SECONDS = 0.01
+
+
+def log_throughput(context: TestContext):
+    current = time.perf_counter()
+    time_delta = current - context.last_time_stamp
+    if time_delta <= LOG_INTERVAL_IN_SECONDS:
+        return
+
+    context.last_time_stamp = current
+    tuples_send_in_delta = context.current_measurement.number_of_tuples_recv - context.number_of_tuples_sent_before_last_delta
+    context.number_of_tuples_sent_before_last_delta = context.current_measurement.number_of_tuples_recv
+    context.logger.info(f"TPS: {tuples_send_in_delta / time_delta} over the last {time_delta}s\n")
+
+    measurement = context.current_measurement
+    if measurement.delivery is not None:
+        context.logger.info(f"Missing: {measurement.delivery.number_of_missing_tuples()}, "
+                            f"duplicated: {measurement.delivery.number_of_duplicated_tuples}, "
+                            f"unexpected: {measurement.delivery.number_of_unexpected_tuples}, "
+                            f"out of order: {measurement.number_of_out_of_order_tuples}")
+
+
+async def receive_into(context: TestContext, client_socket: socket.socket, buffer: memoryview) -> int:
+    """
+    Receives into `buffer`, the event loop wakes up as soon as data arrives. A wait longer than the idle timeout of
+    the experiment is recorded as an idle period, only a closed connection ends the stream.
+    """
+    waiting_since = None
+    idle = False
     while True:
         try:
-            data = client_socket.recv(TUPLE_SIZE_IN_BYTES * 100)
+            if context.kernel_timestamps:
+                number_of_bytes, context.kernel_received_time_ns = receive_with_kernel_timestamp(client_socket,
+                                                                                                 buffer)
+            else:
+                number_of_bytes = client_socket.recv_into(buffer)
             break
-        except socket.timeout as e:
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
+        except BlockingIOError:
+            pass
 
-            time_delta = context.last_time_stamp
-            current = time.perf_counter()
-            time_delta = current - time_delta
+        if waiting_since is None:
+            waiting_since = time.perf_counter()
+            log_throughput(context)
 
-            if counter == 0 and time_delta > 5:
-                context.last_time_stamp = current
+        if not await wait_readable(client_socket, context.idle_timeout) and not idle:
+            idle = True
+            context.logger.info(f"No data received for {context.idle_timeout}s")
 
-                tuples_send_in_delta = context.current_measurement.number_of_tuples_recv - context.number_of_tuples_sent_before_last_delta
-                context.number_of_tuples_sent_before_last_delta = context.current_measurement.number_of_tuples_recv
-                context.logger.info(f"TPS: {tuples_send_in_delta / time_delta} over the last {time_delta}s\n")
+    if idle:
+        context.current_measurement.idle_periods.append({"start": waiting_since, "end": time.perf_counter()})
+    return number_of_bytes
 
-            if counter > 30:
-                context.logger.info("Receive timeout")
-                data = []
-                break
 
-            counter += 1
-            time.sleep(repeat_if_blocking_delay)
-            repeat_if_blocking_delay *= 2
-    return data
-
-
-def handle_client_receiver_json(client_socket: socket.socket, context: TestContext, scale: int):
-    client_socket.settimeout(0.1)
+async def handle_client_receiver_json(client_socket: socket.socket, context: TestContext, scale: int):
+    client_socket.setblocking(False)
     time_stamp = time.perf_counter()
 
     context.last_time_stamp = time_stamp
     context.number_of_tuples_sent_before_last_delta = 0
 
-    is_done = False
-    overflow = ''
+    # tuples may be separated by a delimiter, e.g. "|" for NES
+    reassembler = StreamReassembler(JsonFramer(TUPLE_DELIMITERS.encode('utf-8')))
 
-    while not is_done:
+    while True:
         if context.stop_event.is_set():
             raise ExperimentAbortedException()
 
-        data = receive_non_blocking(context, client_socket)
+        buffer = reassembler.free()
+        number_of_bytes = await receive_into(context, client_socket, buffer)
 
-        if len(data) == 0:
+        if number_of_bytes == 0:
             break
+        if context.capture is not None:
+            context.capture.append(buffer[:number_of_bytes])
 
-        if len(overflow) > 0:
-            data = overflow + data.decode('utf-8')
-        else:
-            data = data.decode('utf-8')
+        if await handle_stream(context, client_socket, reassembler, number_of_bytes,
+                               lambda frames: record_json_tuples(context, frames)):
+            break
 
-        dec = json.JSONDecoder()
-        pos = 0
-        while not pos == len(data):
-            if data[pos:].startswith("DONE"):
-                context.current_measurement.done_timestamp = time.perf_counter()
-                client_socket.send(b"ACK")
-                is_done = True
-                break
+    context.logger.info("Receiving Done!")
 
-            try:
-                received_tuple, json_len = dec.raw_decode(data[pos:])
-                pos += json_len
-                valid = all(k in received_tuple for k in ("a", "b", "c", "d", "e", "f"))
-                if not valid:
-                    context.logger.error(f"Invalid tuple: {received_tuple}")
 
-                if context.current_measurement.number_of_tuples_recv % context.sample_rate == 0:
-                    context.current_measurement.tuples_received_timestamps.append(time.perf_counter())
-                    context.current_measurement.tuples_source_timestamps.append(received_tuple['c'])
-                    context.current_measurement.tuples_processing_timestamps.append(received_tuple['f'])
+def record_json_tuples(context: TestContext, frames: memoryview):
+    measurement = context.current_measurement
+    received_before = measurement.number_of_tuples_recv
+    tuples = decode_json(frames, -received_before % context.sample_rate, context.sample_rate)
+    if tuples.number_of_invalid_tuples > 0:
+        measurement.number_of_invalid_tuples += tuples.number_of_invalid_tuples
+        context.logger.error(f"{tuples.number_of_invalid_tuples} invalid tuples in {bytes(frames[:200])}")
 
-                context.current_measurement.number_of_tuples_recv += 1
-            except json.decoder.JSONDecodeError as e:
-                overflow = data[pos:]
-                break
+    measurement.number_of_tuples_recv += tuples.number_of_frames
+    if len(tuples.samples) > 0:
+        record_received_timestamps(context, len(tuples.samples))
+        measurement.tuples_source_timestamps.extend([c for c, _ in tuples.samples])
+        measurement.tuples_processing_timestamps.extend([f for _, f in tuples.samples])
 
-            if pos == len(data):
-                overflow = ''
+    if len(tuples.ids) > 0:
+        record_tuple_ids(measurement, tuples.ids)
+        measurement.latency.record(latencies_in_us(received_timestamp_in_us(context), tuples.source_timestamps))
 
-    context.logger.info("Receiving Done!")
 
+def record_received_timestamps(context: TestContext, number_of_samples: int):
+    measurement = context.current_measurement
+    measurement.tuples_received_timestamps.extend(np.full(number_of_samples, time.perf_counter()))
+    if context.kernel_timestamps:
+        # NaN if the kernel did not report a receive time for the chunk
+        kernel_received_timestamp = np.nan
+        if context.kernel_received_time_ns is not None:
+            kernel_received_timestamp = to_perf_counter(context.kernel_received_time_ns)
+        measurement.tuples_kernel_received_timestamps.extend(np.full(number_of_samples, kernel_received_timestamp))
 
-def handle_client_receiver_binary(client_socket: socket.socket, context: TestContext, scale: int):
-    client_socket.settimeout(0.1)
+
+def received_timestamp_in_us(context: TestContext) -> int:
+    # latencies exclude the time spent in userspace if the kernel receive time is known
+    if context.kernel_received_time_ns is not None:
+        return context.kernel_received_time_ns // 1000
+    return timestamp_in_us()
+
+
+async def handle_client_receiver_binary(client_socket: socket.socket, context: TestContext, scale: int):
+    client_socket.setblocking(False)
     time_stamp = time.perf_counter()
     context.last_time_stamp = time_stamp
     context.number_of_tuples_sent_before_last_delta = 0
-    is_done = False
-    while not is_done:
+    reassembler = StreamReassembler(BinaryFramer())
+    while True:
         if context.stop_event.is_set():
             raise ExperimentAbortedException()
 
-        data = receive_non_blocking(context, client_socket)
-
-        if len(data) == 0:
+        if reassembler.pending_token is not None and await confirm_token(context, client_socket, reassembler):
             break
 
-        if len(data) % TUPLE_SIZE_IN_BYTES != 0:
-            if len(data) % TUPLE_SIZE_IN_BYTES == 4:
-                context.done_timestamp = time.perf_counter()
-                assert data[-4:] == b"DONE"
-                client_socket.send(b"ACK")
-                is_done = True
+        buffer = reassembler.free()
+        number_of_bytes = await receive_into(context, client_socket, buffer)
 
-        for i in range(len(data) // TUPLE_SIZE_IN_BYTES):
-            received_tuple = struct.unpack(f'!5i', data[i * TUPLE_SIZE_IN_BYTES:(i + 1) * TUPLE_SIZE_IN_BYTES])
-            if context.current_measurement.number_of_tuples_recv % context.sample_rate == 0:
-                context.current_measurement.tuples_received_timestamps.append(time.perf_counter())
+        if number_of_bytes == 0:
+            break
+        if context.capture is not None:
+            context.capture.append(buffer[:number_of_bytes])
 
-            context.current_measurement.number_of_tuples_recv += 1
+        if await handle_stream(context, client_socket, reassembler, number_of_bytes,
+                               lambda frames: record_binary_tuples(context, decode_binary(frames))):
+            break
 
     context.logger.info("Receiving Done!")
 
 
-def test_tuple_throughput_receiver(context: TestContext, scale, tuple_format: str):
+async def handle_stream(context: TestContext, client_socket: socket.socket, reassembler: StreamReassembler,
+                        number_of_bytes: int, record_frames) -> bool:
+    """
+    Passes the complete frames of the received bytes to `record_frames` and answers DONE with ACK. Returns whether
+    the stream is done.
+    """
+    for kind, value in reassembler.received(number_of_bytes):
+        if kind == FRAMES:
+            record_frames(value)
+        elif await handle_token(context, client_socket, value, time.perf_counter()):
+            return True
+    return False
+
+
+async def confirm_token(context: TestContext, client_socket: socket.socket, reassembler: StreamReassembler) -> bool:
+    """
+    Handles the pending token of a binary stream once no more data followed it. Returns whether the stream is done.
+    """
+    received_timestamp = time.perf_counter()
+    if await wait_readable(client_socket, TOKEN_CONFIRMATION_TIMEOUT_IN_SECONDS):
+        return False
+    return await handle_token(context, client_socket, reassembler.confirm_token(), received_timestamp)
+
+
+async def handle_token(context: TestContext, client_socket: socket.socket, token: bytes,
+                       received_timestamp: float) -> bool:
+    if token != b"DONE":
+        context.logger.warning(f"Unexpected control token: {bytes(token)}")
+        return False
+    context.current_measurement.done_timestamp = received_timestamp
+    await asyncio.get_running_loop().sock_sendall(client_socket, b"ACK")
+    return True
+
+
+def record_binary_tuples(context: TestContext, tuples: np.ndarray):
+    # counters, samples and id checks are updated once per received chunk
+    measurement = context.current_measurement
+    received_before = measurement.number_of_tuples_recv
+    measurement.number_of_tuples_recv += len(tuples)
+
+    samples = number_of_samples(received_before, measurement.number_of_tuples_recv, context.sample_rate)
+    if samples > 0:
+        record_received_timestamps(context, samples)
+
+    record_tuple_ids(measurement, tuples['b'])
+    measurement.latency.record(latencies_in_us(received_timestamp_in_us(context), tuples['c']))
+
+
+def record_tuple_ids(measurement: Measurements, ids: np.ndarray):
+    out_of_order = int(np.count_nonzero(ids[1:] <= ids[:-1]))
+    if measurement.last_tuple_id is not None and ids[0] <= measurement.last_tuple_id:
+        out_of_order += 1
+    measurement.number_of_out_of_order_tuples += out_of_order
+    measurement.last_tuple_id = int(ids[-1])
+
+    if measurement.delivery is not None:
+        measurement.delivery.record(ids)
+
+
+def create_server_socket(port: int = DEFAULT_DATA_PORT, reuse_port: bool = False,
+                         kernel_timestamps: bool = False) -> socket.socket:
     # Create a TCP socket
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.settimeout(0.1)
-    context.sink_socket = server_socket
+    if reuse_port:
+        # the kernel distributes incoming connections among all sockets bound to the port
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if kernel_timestamps:
+        # accepted sockets inherit the option, so data that arrives before the connection is served is stamped too
+        enable_kernel_timestamps(server_socket)
+    server_socket.setblocking(False)
 
     # Bind the socket to a local address and port
-    server_socket.bind(('0.0.0.0', PORT))
+    server_socket.bind(('0.0.0.0', port))
+    return server_socket
+
+
+async def serve_connection(context: TestContext, client_socket: socket.socket, client_address, scale,
+                           tuple_format: str):
+    context.current_measurement.start_datetime = datetime.now()
+    context.current_measurement.start_timestamp = time.perf_counter()
+    context.logger.info(f"Receiver: Accepted a connection from {client_address}")
+
+    if context.capture_size_in_bytes > 0:
+        context.capture = StreamCapture(capture_path(context.capture_prefix, client_address),
+                                        context.capture_size_in_bytes, tuple_format)
+    try:
+        if tuple_format == 'json':
+            # Handle the client's request
+            await handle_client_receiver_json(client_socket, context, scale)
+        else:
+            await handle_client_receiver_binary(client_socket, context, scale)
+    finally:
+        client_socket.close()
+        if context.capture is not None:
+            context.capture.close()
+            context.current_measurement.captures.append(context.capture.summary())
+            context.capture = None
+
+
+async def test_tuple_throughput_receiver(context: TestContext, scale, tuple_format: str):
+    if context.number_of_connections > 1:
+        await handle_connections_in_parallel(context, scale, tuple_format)
+        return
+
+    server_socket = create_server_socket(context.port, kernel_timestamps=context.kernel_timestamps)
+    context.sink_socket = server_socket
 
     context.logger.info("Waiting for Connection")
     # Start listening for incoming connections
     server_socket.listen(1)
 
-    inputs = [server_socket]
-
-    while inputs:
-        readable, writable, exceptional = select.select(inputs, [], [], 0.5)
-        if not (readable or writable or exceptional):
-            # select timeout
-            if context.stop_event.is_set():
+    try:
+        # Accept a single incoming connection, abort requests cancel the wait
+        client_socket, client_address = await asyncio.get_running_loop().sock_accept(server_socket)
+        context.current_measurement.initial_packet_stats = PacketStats()
+        await serve_connection(context, client_socket, client_address, scale, tuple_format)
+    finally:
+        server_socket.close()
+
+
+def create_worker_context(logger: logging.Logger, sample_rate: int, idle_timeout: float,
+                          expected_tuples: Union[ExpectedTuples, None], capture_size_in_bytes: int,
+                          capture_prefix: str, kernel_timestamps: bool, stop_event) -> TestContext:
+    context = TestContext(logger, sample_rate, 0, idle_timeout, expected_tuples,
+                          capture_size_in_bytes=capture_size_in_bytes, capture_prefix=capture_prefix,
+                          kernel_timestamps=kernel_timestamps)
+    context.stop_signal = StopSignal(stop_event)
+    context.stop_event = stop_event
+    return context
+
+
+def handle_client_in_worker(client_socket: socket.socket, client_address, logger: logging.Logger, sample_rate: int,
+                            idle_timeout: float, expected_tuples: Union[ExpectedTuples, None],
+                            capture_size_in_bytes: int, capture_prefix: str, kernel_timestamps: bool, scale,
+                            tuple_format: str, stop_event) -> [Measurements]:
+    context = create_worker_context(logger, sample_rate, idle_timeout, expected_tuples, capture_size_in_bytes,
+                                    capture_prefix, kernel_timestamps, stop_event)
+    asyncio.run(run_in_worker(context.stop_signal, context.stop_signal.run_until_stopped(
+        serve_connection(context, client_socket, client_address, scale, tuple_format))))
+    return [context.current_measurement]
+
+
+def accept_clients_in_worker(logger: logging.Logger, sample_rate: int, idle_timeout: float,
+                             expected_tuples: Union[ExpectedTuples, None], capture_size_in_bytes: int,
+                             capture_prefix: str, kernel_timestamps: bool, scale, tuple_format: str,
+                             number_of_connections: int, accepted_connections, port: int,
+                             stop_event) -> [Measurements]:
+    stop_signal = StopSignal(stop_event)
+    return asyncio.run(run_in_worker(stop_signal, accept_clients(
+        lambda: create_worker_context(logger, sample_rate, idle_timeout, expected_tuples, capture_size_in_bytes,
+                                      capture_prefix, kernel_timestamps, stop_event),
+        stop_signal, scale, tuple_format, number_of_connections, accepted_connections, port, kernel_timestamps)))
+
+
+async def accept_clients(create_context, stop_signal: StopSignal, scale, tuple_format: str,
+                         number_of_connections: int, accepted_connections, port: int = DEFAULT_DATA_PORT,
+                         kernel_timestamps: bool = False) -> [Measurements]:
+    """
+    Serves every connection the kernel assigns to the socket of this worker, until all workers together have
+    accepted `number_of_connections`.
+    """
+    server_socket = create_server_socket(port, reuse_port=True, kernel_timestamps=kernel_timestamps)
+    server_socket.listen(number_of_connections)
+    contexts = []
+    tasks = []
+    try:
+        while accepted_connections.value < number_of_connections:
+            if stop_signal.is_set():
                 raise ExperimentAbortedException()
-            else:
-                # repeat
+            if not await wait_readable(server_socket, STOP_POLL_INTERVAL_IN_SECONDS):
                 continue
-        else:
-            # we got a connection
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
-
-            # Accept a single incoming connection
-            client_socket, client_address = server_socket.accept()
-            context.current_measurement.start_datetime = datetime.now()
-            context.current_measurement.start_timestamp = time.perf_counter()
-            context.logger.info(f"Receiver: Accepted a connection from {client_address}")
-
-            context.current_measurement.initial_packet_stats = PacketStats()
             try:
-                if tuple_format == 'json':
-                    # Handle the client's request
-                    handle_client_receiver_json(client_socket, context, scale)
-                else:
-                    handle_client_receiver_binary(client_socket, context, scale)
-                break
-            finally:
+                client_socket, client_address = server_socket.accept()
+            except BlockingIOError:
+                continue
+            with accepted_connections.get_lock():
+                accepted_connections.value += 1
+
+            context = create_context()
+            context.stop_signal = stop_signal
+            contexts.append(context)
+            tasks.append(asyncio.ensure_future(stop_signal.run_until_stopped(
+                serve_connection(context, client_socket, client_address, scale, tuple_format))))
+    except BaseException:
+        # the stop signal cancels the connections that are already served as well
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        server_socket.close()
+
+    await asyncio.gather(*tasks)
+    return [context.current_measurement for context in contexts]
+
+
+async def handle_connections_in_parallel(context: TestContext, scale, tuple_format: str):
+    context.logger.info(f"Receiving with {context.number_of_connections} worker processes")
+    context.current_measurement.initial_packet_stats = PacketStats()
+    worker_args = (context.logger, context.sample_rate, context.idle_timeout, context.expected_tuples,
+                   context.capture_size_in_bytes, context.capture_prefix, context.kernel_timestamps, scale,
+                   tuple_format)
+
+    client_sockets = []
+    if context.reuse_port:
+        accepted_connections = mp_context.Value('i', 0)
+        workers = asyncio.get_running_loop().run_in_executor(None, run_workers, accept_clients_in_worker, [
+            worker_args + (context.number_of_connections, accepted_connections, context.port)
+            for _ in range(context.number_of_connections)
+        ], context.stop_event)
+    else:
+        server_socket = create_server_socket(context.port, kernel_timestamps=context.kernel_timestamps)
+        context.sink_socket = server_socket
+        context.logger.info("Waiting for Connections")
+        server_socket.listen(context.number_of_connections)
+        try:
+            while len(client_sockets) < context.number_of_connections:
+                client_sockets.append(await asyncio.get_running_loop().sock_accept(server_socket))
+        except BaseException:
+            for client_socket, _ in client_sockets:
                 client_socket.close()
-    server_socket.close()
+            raise
+        finally:
+            server_socket.close()
 
+        workers = asyncio.get_running_loop().run_in_executor(None, run_workers, handle_client_in_worker, [
+            (client_socket, client_address) + worker_args for client_socket, client_address in client_sockets
+        ], context.stop_event)
+
+    try:
+        worker_measurements = await asyncio.shield(workers)
+    except asyncio.CancelledError:
+        # the workers observe the stop event themselves
+        with contextlib.suppress(Exception):
+            await workers
+        raise
+    finally:
+        for client_socket, _ in client_sockets:
+            client_socket.close()
+
+    for measurements in worker_measurements:
+        for measurement in measurements:
+            context.current_measurement.merge(measurement)
+
+
+# running experiments by test id
+active_test_contexts: Dict[str, TestContext] = {}
+active_test_contexts_lock = threading.Lock()
 
-active_test_context: Union[TestContext, None] = None
 
+def find_test_contexts(test_id: Union[str, None]) -> List[TestContext]:
+    # messages without a test id address every running experiment
+    with active_test_contexts_lock:
+        if test_id is None:
+            return list(active_test_contexts.values())
+        return [active_test_contexts[test_id]] if test_id in active_test_contexts else []
 
-def wait_for_restart(context: TestContext):
-    ready_for_restart('sink')
-    context.stop_event.wait()
+
+async def wait_for_restart(context: TestContext):
+    ready_for_restart('sink', context.test_id)
+    await context.stop_signal.wait()
 
     if context.was_aborted:
         raise ExperimentAbortedException()
 
-    context.stop_event.clear()
+    context.stop_signal.clear()
     context.restart()
 
 
-def receive_data(message: ThroughputStartMessage, logger):
-    global active_test_context
-
-    if active_test_context is not None:
-        raise ExperimentAlreadyRunningException()
-
+async def run_experiment(context: TestContext, message: ThroughputStartMessage):
+    context.stop_signal.attach()
     try:
-        active_test_context = TestContext(logger, message.sample_rate, message.restarts)
         number_of_restarts = 0
-        while number_of_restarts <= active_test_context.restarts:
+        while number_of_restarts <= context.restarts:
             if number_of_restarts > 0:
-                wait_for_restart(active_test_context)
+                await wait_for_restart(context)
+
+            context.capture_prefix = f"{message.test_id}-{number_of_restarts}"
 
-            test_tuple_throughput_receiver(active_test_context, message.iterations, message.tuple_format)
-            active_test_context.current_measurement.final_packet_stats = PacketStats()
+            await context.stop_signal.run_until_stopped(
+                test_tuple_throughput_receiver(context, message.iterations, message.tuple_format))
+            context.current_measurement.final_packet_stats = PacketStats()
 
-            active_test_context.current_measurement.diff_packet_stats = \
-                diff(active_test_context.current_measurement.initial_packet_stats,
-                     active_test_context.current_measurement.final_packet_stats)
+            context.current_measurement.diff_packet_stats = \
+                diff(context.current_measurement.initial_packet_stats, context.current_measurement.final_packet_stats)
 
             number_of_restarts += 1
+    finally:
+        context.stop_signal.detach()
+
+
+def receive_data(message: ThroughputStartMessage, logger):
+    test_id = message.test_id
+    with active_test_contexts_lock:
+        if test_id in active_test_contexts:
+            raise ExperimentAlreadyRunningException()
+        context = TestContext(logger, message.sample_rate, message.restarts, message.idle_timeout, None,
+                              message.sink_connections, message.sink_reuse_port, message.capture_size_in_bytes,
+                              kernel_timestamps=message.kernel_timestamps, test_id=test_id, port=message.sink_port)
+        active_test_contexts[test_id] = context
+
+    try:
+        # the dataset is loaded once the experiment is registered, so a failed download aborts the experiment
+        try:
+            context.expect(ExpectedTuples(Selectivity(load_dataset(message.dataset_id)), message.source_workers,
+                                          message.iterations))
+        except Exception as e:
+            raise ExperimentFailedException(f"Cannot load dataset {message.dataset_id}: {e}")
+
+        asyncio.run(run_experiment(context, message))
 
-        active_test_context.restart()
-        active_test_context.error_or_aborted = False
-        gcs.store_evaluation_in_bucket(logger, active_test_context.get_measurements(), 'sink', message.test_id)
+        context.restart()
+        context.error_or_aborted = False
+        gcs.store_evaluation_in_bucket(logger, context.get_measurements(), 'sink', test_id)
 
-        response_measurements('sink', {})
+        response_measurements('sink', {}, test_id)
 
-    except ExperimentFailedException:
-        active_test_context.error_or_aborted = True
-        abort_experiment()
+    except ExperimentFailedException as e:
+        context.error_or_aborted = True
+        context.logger.error(e)
+        abort_experiment(test_id)
     except ExperimentAbortedException as _:
-        active_test_context.logger.info("Experiment was aborted")
+        context.logger.info("Experiment was aborted")
     finally:
-        active_test_context.clean_up()
-        active_test_context = None
+        context.clean_up()
+        with active_test_contexts_lock:
+            del active_test_contexts[test_id]
         gc.collect()
 
 
-def abort_current_experiment(logger: logging.Logger):
-    global active_test_context
-
-    if active_test_context is not None:
-        active_test_context.error_or_aborted = True
-        active_test_context.was_aborted = True
-        logger.warning(f"Request aborting the experiment")
-        active_test_context.stop_event.set()
-
+def abort_current_experiment(logger: logging.Logger, test_id: str = None):
+    for context in find_test_contexts(test_id):
+        context.error_or_aborted = True
+        context.was_aborted = True
+        logger.warning(f"Request aborting the experiment {context.test_id}")
+        context.stop_signal.set()
 
-def restart_current_experiment(logger: logging.Logger):
-    global active_test_context
 
-    if active_test_context is not None:
-        logger.info(f"Restart")
-        active_test_context.stop_event.set()
+def restart_current_experiment(logger: logging.Logger, test_id: str = None):
+    for context in find_test_contexts(test_id):
+        logger.info(f"Restart {context.test_id}")
+        context.stop_signal.set()
@@ -0,0 +1,104 @@
+####
+####### Compares the JSON tuple decoders of the sink on a recorded stream
+####
+# python benchmark_json.py [stream_file] [--chunk-size N] [--sample-rate N]
+# Without a stream file, a stream in the format of the source is generated.
+
+import argparse
+import json
+import time
+
+from decoding import decode_json
+from framing import FRAMES, JsonFramer, StreamReassembler
+
+TUPLE_DELIMITERS = "|\n "
+
+
+def generate_stream(number_of_tuples: int) -> bytes:
+    return b''.join(b'{"a": %d,"b": %d,"c": %d,"d": %d,"e": %d, "f": %d}' % (i % 7, i, 1000 + i, i, i, 2000 + i)
+                    for i in range(number_of_tuples)) + b"DONE"
+
+
+def chunks_of(stream: bytes, chunk_size: int):
+    return [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+
+def legacy_decode(chunks, sample_rate: int):
+    # decoder of the sink before the streaming parser: raw_decode on the remaining string for every tuple
+    number_of_tuples = 0
+    source_timestamps = []
+    overflow = ''
+    for chunk in chunks:
+        data = overflow + chunk.decode('utf-8')
+        overflow = ''
+        dec = json.JSONDecoder()
+        pos = 0
+        while not pos == len(data):
+            if data[pos] in TUPLE_DELIMITERS:
+                pos += 1
+                continue
+            if data[pos:].startswith("DONE"):
+                return number_of_tuples, source_timestamps
+            try:
+                received_tuple, json_len = dec.raw_decode(data[pos:])
+                pos += json_len
+                all(k in received_tuple for k in ("a", "b", "c", "d", "e", "f"))
+                if number_of_tuples % sample_rate == 0:
+                    source_timestamps.append(received_tuple['c'])
+                number_of_tuples += 1
+            except json.decoder.JSONDecodeError:
+                overflow = data[pos:]
+                break
+    return number_of_tuples, source_timestamps
+
+
+def streaming_decode(chunks, sample_rate: int):
+    number_of_tuples = 0
+    source_timestamps = []
+    reassembler = StreamReassembler(JsonFramer(TUPLE_DELIMITERS.encode('utf-8')))
+    for chunk in chunks:
+        while len(chunk) > 0:
+            free = reassembler.free()
+            number_of_bytes = min(len(free), len(chunk))
+            free[:number_of_bytes] = chunk[:number_of_bytes]
+            chunk = chunk[number_of_bytes:]
+            for kind, value in reassembler.received(number_of_bytes):
+                if kind != FRAMES:
+                    return number_of_tuples, source_timestamps
+                tuples = decode_json(value, -number_of_tuples % sample_rate, sample_rate)
+                source_timestamps.extend(c for c, _ in tuples.samples)
+                number_of_tuples += tuples.number_of_frames
+    return number_of_tuples, source_timestamps
+
+
+def benchmark(name: str, decode, chunks, sample_rate: int):
+    start = time.perf_counter()
+    number_of_tuples, source_timestamps = decode(chunks, sample_rate)
+    duration = time.perf_counter() - start
+    print(f"{name}: {number_of_tuples} tuples in {duration:.3f}s ({number_of_tuples / duration:.0f} tuples/s)")
+    return number_of_tuples, source_timestamps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JSON decoders of the sink")
+    parser.add_argument("stream", nargs="?", help="file containing the raw bytes received by the sink")
+    parser.add_argument("--tuples", type=int, default=200000, help="number of tuples of a generated stream")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="bytes per receive call")
+    parser.add_argument("--sample-rate", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.stream is not None:
+        with open(args.stream, "rb") as file:
+            stream = file.read()
+    else:
+        stream = generate_stream(args.tuples)
+
+    chunks = chunks_of(stream, args.chunk_size)
+    legacy = benchmark("legacy", legacy_decode, chunks, args.sample_rate)
+    streaming = benchmark("streaming", streaming_decode, chunks, args.sample_rate)
+    if legacy != streaming:
+        print("Decoders disagree")
+
+
+if __name__ == '__main__':
+    main()
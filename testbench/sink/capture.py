@@ -0,0 +1,88 @@
+import mmap
+import os
+import struct
+import time
+
+CAPTURE_DIRECTORY = "/tmp/sink-captures"
+CAPTURE_MAGIC = b"SINKCAP1"
+
+# magic, tuple format, number of used bytes including the header
+HEADER = struct.Struct("<8s8sQ")
+USED_BYTES = struct.Struct("<Q")
+USED_BYTES_OFFSET = 16
+# arrival timestamp (perf_counter) and length of a received chunk, followed by its bytes
+RECORD_HEADER = struct.Struct("<dI")
+
+
+def capture_path(prefix: str, client_address) -> str:
+    host, port = client_address[0], client_address[1]
+    return os.path.join(CAPTURE_DIRECTORY, f"{prefix}-{host}-{port}.cap")
+
+
+class StreamCapture:
+    """
+    Appends the raw received chunks of a connection to a preallocated memory mapped file. Appending is a single copy
+    into the mapping, the file is never grown while receiving. Chunks that do not fit anymore are only counted. The
+    header always covers the appended chunks, so a capture stays readable if the sink crashes.
+    """
+
+    def __init__(self, path: str, size_in_bytes: int, tuple_format: str) -> None:
+        super().__init__()
+        self.path = path
+        self.tuple_format = tuple_format
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "w+b")
+        size_in_bytes = max(size_in_bytes, HEADER.size)
+        # reserve the blocks up front, so page faults while receiving never have to allocate
+        os.posix_fallocate(self.file.fileno(), 0, size_in_bytes)
+        self.mapping = mmap.mmap(self.file.fileno(), size_in_bytes)
+        self.position = HEADER.size
+        self.number_of_dropped_bytes = 0
+        HEADER.pack_into(self.mapping, 0, CAPTURE_MAGIC, tuple_format.encode('ascii'), self.position)
+
+    def append(self, data: memoryview):
+        end = self.position + RECORD_HEADER.size + len(data)
+        if end > len(self.mapping):
+            self.number_of_dropped_bytes += len(data)
+            return
+        RECORD_HEADER.pack_into(self.mapping, self.position, time.perf_counter(), len(data))
+        self.mapping[self.position + RECORD_HEADER.size:end] = data
+        self.position = end
+        USED_BYTES.pack_into(self.mapping, USED_BYTES_OFFSET, end)
+
+    def close(self):
+        self.mapping.flush()
+        self.mapping.close()
+        # the unused preallocated space is released again
+        self.file.truncate(self.position)
+        self.file.close()
+
+    def summary(self) -> dict:
+        return {
+            "path": self.path,
+            "number_of_bytes": self.position,
+            "number_of_dropped_bytes": self.number_of_dropped_bytes,
+        }
+
+
+def read_capture(path: str):
+    """
+    Returns the tuple format of a capture and a generator of its (arrival timestamp, chunk) records. Chunks are
+    memoryviews into the mapped file.
+    """
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, tuple_format, used_bytes = HEADER.unpack_from(mapping, 0)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError(f"{path} is not a sink capture")
+
+    def records():
+        view = memoryview(mapping)
+        position = HEADER.size
+        while position < used_bytes:
+            timestamp, length = RECORD_HEADER.unpack_from(mapping, position)
+            position += RECORD_HEADER.size
+            yield timestamp, view[position:position + length]
+            position += length
+
+    return tuple_format.rstrip(b"\0").decode('ascii'), records()
@@ -0,0 +1,69 @@
+import io
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+# Wire format of a single tuple: five big-endian int32 (struct format "!5i")
+TUPLE_DTYPE = np.dtype([('a', '>i4'), ('b', '>i4'), ('c', '>i4'), ('d', '>i4'), ('e', '>i4')])
+TUPLE_SIZE_IN_BYTES = TUPLE_DTYPE.itemsize
+RECV_BUFFER_SIZE_IN_BYTES = 256 * 1024
+
+# JSON tuples have the fixed schema {"a": .., "b": .., "c": .., "d": .., "e": .., "f": ..} with arbitrary whitespace
+_NUMBER = rb'-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?'
+JSON_TUPLE_PATTERN = re.compile(
+    rb'\{\s*"a"\s*:\s*' + _NUMBER +
+    rb'\s*,\s*"b"\s*:\s*(-?\d+)' +
+    rb'\s*,\s*"c"\s*:\s*(' + _NUMBER + rb')' +
+    rb'\s*,\s*"d"\s*:\s*' + _NUMBER +
+    rb'\s*,\s*"e"\s*:\s*' + _NUMBER +
+    rb'\s*,\s*"f"\s*:\s*(' + _NUMBER + rb')\s*\}')
+# id (b) and integer part of the source timestamp (c) of a tuple, captured as a single group. Parsing the joined
+# groups at once is considerably faster than converting a pair of groups per tuple.
+JSON_ID_PATTERN = re.compile(rb'"b"\s*:\s*(-?\d+\s*,\s*"c"\s*:\s*-?\d+)')
+# replaces everything but the numbers of the captured groups by whitespace
+_NUMBERS_ONLY = bytes(c if c in b'-0123456789' else ord(' ') for c in range(256))
+
+
+class JsonTuples:
+
+    def __init__(self, number_of_frames: int, ids: np.ndarray, source_timestamps: np.ndarray,
+                 samples: List[Tuple[float, float]], number_of_invalid_tuples: int) -> None:
+        super().__init__()
+        self.number_of_frames = number_of_frames
+        self.ids = ids
+        self.source_timestamps = source_timestamps
+        # source (c) and processing (f) timestamp of every sampled tuple
+        self.samples = samples
+        self.number_of_invalid_tuples = number_of_invalid_tuples
+
+
+def decode_binary(frames: memoryview) -> np.ndarray:
+    # interprets a run of complete frames in place
+    return np.frombuffer(frames, dtype=TUPLE_DTYPE)
+
+
+def decode_json(frames: memoryview, first_sample: int, sample_rate: int) -> JsonTuples:
+    """
+    Decodes a run of complete JSON frames without building dicts or re-slicing the input. The ids and source
+    timestamps of all tuples are extracted in a single pass, only every `sample_rate`-th tuple starting at
+    `first_sample` is matched against the full schema to extract its timestamps.
+    """
+    frame_starts = np.flatnonzero(np.frombuffer(frames, dtype=np.uint8) == ord('{'))
+    groups = JSON_ID_PATTERN.findall(frames)
+    if groups:
+        ids_and_timestamps = np.loadtxt(io.BytesIO(b' '.join(groups).translate(_NUMBERS_ONLY)), dtype=np.int64,
+                                        ndmin=1).reshape(-1, 2)
+    else:
+        ids_and_timestamps = np.empty((0, 2), dtype=np.int64)
+    # frames without an id and timestamp, sampled frames that do not match the full schema are only skipped
+    number_of_invalid_tuples = max(0, len(frame_starts) - len(ids_and_timestamps))
+
+    samples = []
+    for frame_start in frame_starts[first_sample::sample_rate].tolist():
+        match = JSON_TUPLE_PATTERN.match(frames, frame_start)
+        if match is not None:
+            samples.append((float(match.group(2)), float(match.group(3))))
+
+    return JsonTuples(len(frame_starts), ids_and_timestamps[:, 0], ids_and_timestamps[:, 1], samples,
+                      number_of_invalid_tuples)
@@ -0,0 +1,80 @@
+import numpy as np
+
+from testbench.common.arrays import IdSet
+from testbench.common.selectivity import ExpectedTuples
+
+
+class DeliveryVerifier:
+    """
+    Checks the received tuple ids against the ids the source sends through the filter. Received ids are kept in one
+    bitmap per source shard, so the bitmaps stay dense even if the shards are interleaved.
+    """
+
+    def __init__(self, expected: ExpectedTuples) -> None:
+        super().__init__()
+        self.expected = expected
+        self.received_ids = [IdSet() for _ in range(expected.number_of_shards)]
+        self.number_of_received_ids = np.zeros(expected.number_of_shards, dtype=np.int64)
+        # highest received id of every shard, -1 before the first one
+        self.last_ids = np.full(expected.number_of_shards, -1, dtype=np.int64)
+
+        self.number_of_duplicated_tuples = 0
+        # ids outside of the dataset or of tuples that do not pass the filter
+        self.number_of_unexpected_tuples = 0
+
+    def __getstate__(self):
+        # every process knows the expected tuples, workers do not send them back to the coordinator
+        return {**self.__dict__, "expected": None}
+
+    def record(self, ids: np.ndarray):
+        if len(ids) == 0:
+            return
+        ids = ids.astype(np.int64)
+        # a single shard needs no lookup
+        shards = self.expected.shard_of(ids) if self.expected.number_of_shards > 1 else np.zeros(len(ids), np.int64)
+        expected = self.expected.is_expected(ids, shards)
+        if not expected.all():
+            self.number_of_unexpected_tuples += len(ids) - int(np.count_nonzero(expected))
+            ids = ids[expected]
+            shards = shards[expected]
+
+        if self.expected.number_of_shards == 1:
+            self.record_shard(0, ids)
+            return
+        for shard in np.unique(shards).tolist():
+            self.record_shard(shard, ids[shards == shard])
+
+    def record_shard(self, shard: int, ids: np.ndarray):
+        if len(ids) == 0:
+            return
+        duplicated = self.received_ids[shard].add_ids(ids)
+        self.number_of_duplicated_tuples += duplicated
+        self.number_of_received_ids[shard] += len(ids) - duplicated
+        self.last_ids[shard] = max(int(self.last_ids[shard]), int(ids.max()))
+
+    def merge(self, other: 'DeliveryVerifier'):
+        # ids received on several connections count as duplicates
+        for shard, received_ids in enumerate(other.received_ids):
+            duplicated = self.received_ids[shard].update(received_ids)
+            self.number_of_duplicated_tuples += duplicated
+            self.number_of_received_ids[shard] += int(other.number_of_received_ids[shard]) - duplicated
+        self.last_ids = np.maximum(self.last_ids, other.last_ids)
+        self.number_of_duplicated_tuples += other.number_of_duplicated_tuples
+        self.number_of_unexpected_tuples += other.number_of_unexpected_tuples
+
+    def number_of_missing_tuples(self) -> int:
+        # expected tuples behind the highest received id of their shard that have not arrived (yet)
+        return sum(self.expected.number_of_expected_tuples_before(shard, int(last_id) + 1)
+                   for shard, last_id in enumerate(self.last_ids.tolist())) - int(self.number_of_received_ids.sum())
+
+    def number_of_lost_tuples(self) -> int:
+        return self.expected.number_of_expected_tuples - int(self.number_of_received_ids.sum())
+
+    def summary(self) -> dict:
+        return {
+            "number_of_expected_tuples": self.expected.number_of_expected_tuples,
+            "number_of_delivered_tuples": int(self.number_of_received_ids.sum()),
+            "number_of_lost_tuples": self.number_of_lost_tuples(),
+            "number_of_duplicated_tuples": self.number_of_duplicated_tuples,
+            "number_of_unexpected_tuples": self.number_of_unexpected_tuples,
+        }
@@ -0,0 +1,136 @@
+from typing import Union
+
+from testbench.common.experiment import ExperimentFailedException
+from decoding import RECV_BUFFER_SIZE_IN_BYTES, TUPLE_SIZE_IN_BYTES
+
+# The operator ends the stream with DONE, its ACKs only go to the source
+CONTROL_TOKENS = (b"DONE",)
+
+# Kinds of the items yielded by StreamReassembler.received
+FRAMES = 0
+TOKEN = 1
+
+
+class BinaryFramer:
+    """
+    Fixed size frames of TUPLE_SIZE_IN_BYTES. The first bytes of a tuple may coincide with a token, so a token is only
+    recognized if it is exactly the remainder behind the last complete frame, and only once no more data follows it.
+    """
+
+    confirms_tokens = True
+
+    def skip(self, buffer: bytearray, start: int, end: int) -> int:
+        return start
+
+    def may_contain_token(self, buffer: bytearray, start: int, end: int) -> bool:
+        return end - start < TUPLE_SIZE_IN_BYTES
+
+    def frames_end(self, buffer: bytearray, start: int, end: int, tokens) -> int:
+        return start + (end - start) // TUPLE_SIZE_IN_BYTES * TUPLE_SIZE_IN_BYTES
+
+
+class JsonFramer:
+    """
+    Flat JSON objects, optionally separated by delimiter characters. Tuples never contain a control token, so tokens
+    are recognized at any offset.
+    """
+
+    confirms_tokens = False
+
+    def __init__(self, delimiters: bytes = b'') -> None:
+        super().__init__()
+        self.delimiters = frozenset(delimiters)
+
+    def skip(self, buffer: bytearray, start: int, end: int) -> int:
+        while start < end and buffer[start] in self.delimiters:
+            start += 1
+        return start
+
+    def may_contain_token(self, buffer: bytearray, start: int, end: int) -> bool:
+        return True
+
+    def frames_end(self, buffer: bytearray, start: int, end: int, tokens) -> int:
+        # complete frames end with the last closing brace in front of the first token
+        for token in tokens:
+            position = buffer.find(token, start, end)
+            if position >= 0:
+                end = position
+        return buffer.rfind(b'}', start, end) + 1 or start
+
+
+class StreamReassembler:
+    """
+    Reassembles frames from a byte stream independent of how it was segmented by TCP. Data is received directly into
+    the free space of a preallocated buffer, `received` yields runs of complete frames as memoryviews into that
+    buffer and control tokens at frame boundaries. The bytes of an incomplete frame or token stay in place and are
+    only moved to the front once the space behind them runs low, so every byte is copied at most once per wrap around.
+    Yielded memoryviews are only valid until the next call to `free`.
+    If the framer confirms tokens, a token that ends the received bytes is kept as `pending_token` instead of being
+    yielded. The caller consumes it with `confirm_token` once no more data followed it, otherwise the next received
+    bytes turn it into the start of a frame.
+    """
+
+    def __init__(self, framer, size_in_bytes: int = RECV_BUFFER_SIZE_IN_BYTES, tokens=CONTROL_TOKENS) -> None:
+        super().__init__()
+        self.framer = framer
+        self.tokens = tokens
+        self.buffer = bytearray(size_in_bytes)
+        self.view = memoryview(self.buffer)
+        # [start, end) holds the bytes that have not been consumed yet
+        self.start = 0
+        self.end = 0
+        # less free space than this at the end of the buffer triggers moving the remainder to the front
+        self.min_free_space = size_in_bytes // 4
+        self.pending_token: Union[bytes, None] = None
+
+    def free(self) -> memoryview:
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buffer) - self.end < self.min_free_space:
+            remainder = self.end - self.start
+            self.buffer[:remainder] = self.buffer[self.start:self.end]
+            self.start = 0
+            self.end = remainder
+            if remainder == len(self.buffer):
+                raise ExperimentFailedException("Frame exceeds the receive buffer")
+        return self.view[self.end:]
+
+    def received(self, number_of_bytes: int):
+        self.end += number_of_bytes
+        self.pending_token = None
+        while True:
+            self.start = self.framer.skip(self.buffer, self.start, self.end)
+            if self.start == self.end:
+                return
+
+            if self.framer.may_contain_token(self.buffer, self.start, self.end):
+                token = self.token_at(self.start)
+                if token is not None and self.framer.confirms_tokens:
+                    if self.start + len(token) == self.end:
+                        self.pending_token = token
+                        return
+                elif token is not None:
+                    self.start += len(token)
+                    yield TOKEN, token
+                    continue
+
+            frames_end = self.framer.frames_end(self.buffer, self.start, self.end, self.tokens)
+            if frames_end == self.start:
+                # incomplete frame or token, wait for more data
+                return
+
+            frames = self.view[self.start:frames_end]
+            self.start = frames_end
+            yield FRAMES, frames
+
+    def confirm_token(self) -> bytes:
+        token = self.pending_token
+        self.start += len(token)
+        self.pending_token = None
+        return token
+
+    def token_at(self, position: int) -> Union[bytes, None]:
+        for token in self.tokens:
+            if self.buffer.startswith(token, position, self.end):
+                return token
+        return None
@@ -0,0 +1,184 @@
+import time
+from typing import List, Union
+
+import numpy as np
+
+from testbench.common.timestamps import TIMESTAMP_MODULUS
+
+# Values below SUB_BUCKET_COUNT us are counted exactly. Every larger power of two is split into SUB_BUCKET_COUNT / 2
+# linear sub-buckets, which bounds the relative error to 1 / (SUB_BUCKET_COUNT / 2), i.e. below 1%.
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+# Latencies are computed modulo TIMESTAMP_MODULUS, so larger values cannot occur
+MAX_LATENCY_IN_US = TIMESTAMP_MODULUS - 1
+NUMBER_OF_BUCKETS = SUB_BUCKET_COUNT + (MAX_LATENCY_IN_US.bit_length() - SUB_BUCKET_BITS) * SUB_BUCKET_HALF_COUNT
+
+PERCENTILES = {"p50": 50.0, "p99": 99.0, "p99_9": 99.9}
+
+# Latencies are additionally aggregated per window. Once there are more than MAX_NUMBER_OF_WINDOWS, neighbouring
+# windows are merged and the window length doubles, which bounds the memory independent of the length of the run.
+INITIAL_WINDOW_IN_SECONDS = 1.0
+MAX_NUMBER_OF_WINDOWS = 64
+
+
+def bucket_indices(latencies: np.ndarray) -> np.ndarray:
+    latencies = np.minimum(latencies, MAX_LATENCY_IN_US)
+    # frexp returns the bit length as exponent, which is exact for integers below 2^53
+    _, bit_lengths = np.frexp(latencies.astype(np.float64))
+    shifts = np.maximum(bit_lengths.astype(np.int64) - SUB_BUCKET_BITS, 0)
+    return np.where(shifts == 0, latencies,
+                    SUB_BUCKET_COUNT + (shifts - 1) * SUB_BUCKET_HALF_COUNT +
+                    (latencies >> shifts) - SUB_BUCKET_HALF_COUNT)
+
+
+def highest_value_of_bucket(index: int) -> int:
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF_COUNT + 1
+    sub_bucket = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF_COUNT + SUB_BUCKET_HALF_COUNT
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR style histogram of latencies in microseconds with a fixed number of log bucketed counters.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.counts = np.zeros(NUMBER_OF_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.max = 0
+
+    def record(self, latencies: np.ndarray):
+        # tuples of a batch share their source timestamp, so buckets are only computed once per run of equal values
+        run_starts = np.flatnonzero(np.concatenate(([True], latencies[1:] != latencies[:-1])))
+        run_lengths = np.diff(np.append(run_starts, len(latencies)))
+        np.add.at(self.counts, bucket_indices(latencies[run_starts]), run_lengths)
+        self.count += len(latencies)
+        self.max = max(self.max, int(latencies.max()))
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts += other.counts
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        # highest value that is equivalent to the value at the percentile, like HdrHistogram
+        rank = max(1, int(np.ceil(percentile / 100 * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(highest_value_of_bucket(index), self.max)
+
+    def summary(self) -> dict:
+        summary = {"count": self.count, "max": self.max if self.count > 0 else None}
+        for name, percentile in PERCENTILES.items():
+            summary[name] = self.percentile(percentile) if self.count > 0 else None
+        return summary
+
+
+class LatencyRecorder:
+    """
+    Records the latency of every received tuple into a histogram per window, the histogram of the whole run is the
+    sum of all windows. Windows are aligned to multiples of their length on the perf_counter clock, so recorders of
+    different connections can be merged.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.window_in_seconds = INITIAL_WINDOW_IN_SECONDS
+        # windows[i] covers the window with the absolute index first_window + i
+        self.first_window: int | None = None
+        self.windows: List[Union[LatencyHistogram, None]] = []
+        # latencies of tuples whose source timestamp lies in the future of the sink clock
+        self.number_of_negative_latencies = 0
+
+    def record(self, latencies: np.ndarray):
+        if len(latencies) == 0:
+            return
+
+        negative = latencies >= TIMESTAMP_MODULUS >> 1
+        number_of_negative_latencies = int(np.count_nonzero(negative))
+        if number_of_negative_latencies > 0:
+            self.number_of_negative_latencies += number_of_negative_latencies
+            latencies = np.where(negative, 0, latencies)
+
+        self.window().record(latencies)
+
+    def window(self) -> LatencyHistogram:
+        now = time.perf_counter()
+        if self.first_window is None:
+            self.first_window = int(now // self.window_in_seconds)
+
+        index = int(now // self.window_in_seconds) - self.first_window
+        while index >= MAX_NUMBER_OF_WINDOWS:
+            self.merge_windows()
+            index = int(now // self.window_in_seconds) - self.first_window
+
+        if index >= len(self.windows):
+            self.windows.extend([None] * (index + 1 - len(self.windows)))
+        if self.windows[index] is None:
+            self.windows[index] = LatencyHistogram()
+        return self.windows[index]
+
+    def merge_windows(self):
+        # doubles the window length, pairs of windows with an even absolute index first are merged
+        self.window_in_seconds *= 2
+        if self.first_window is None:
+            return
+
+        windows = self.windows
+        if self.first_window % 2 == 1:
+            windows = [None] + windows
+        merged = []
+        for first, second in zip(windows[::2], windows[1::2] + [None]):
+            if first is None:
+                first = second
+            elif second is not None:
+                first.merge(second)
+            merged.append(first)
+        self.windows = merged
+        self.first_window //= 2
+
+    def merge(self, other: 'LatencyRecorder'):
+        while self.window_in_seconds < other.window_in_seconds:
+            self.merge_windows()
+        while other.window_in_seconds < self.window_in_seconds:
+            other.merge_windows()
+        self.number_of_negative_latencies += other.number_of_negative_latencies
+        if other.first_window is None:
+            return
+        if self.first_window is None:
+            self.first_window = other.first_window
+
+        if other.first_window < self.first_window:
+            self.windows = [None] * (self.first_window - other.first_window) + self.windows
+            self.first_window = other.first_window
+        for index, window in enumerate(other.windows, other.first_window - self.first_window):
+            if window is None:
+                continue
+            if index >= len(self.windows):
+                self.windows.extend([None] * (index + 1 - len(self.windows)))
+            if self.windows[index] is None:
+                self.windows[index] = window
+            else:
+                self.windows[index].merge(window)
+
+        while len(self.windows) > MAX_NUMBER_OF_WINDOWS:
+            self.merge_windows()
+
+    def summary(self) -> dict:
+        total = LatencyHistogram()
+        windows = []
+        for index, window in enumerate(self.windows):
+            if window is None:
+                continue
+            total.merge(window)
+            windows.append({"start": (self.first_window + index) * self.window_in_seconds,
+                            "duration": self.window_in_seconds, **window.summary()})
+        return {
+            "unit": "us",
+            **total.summary(),
+            "number_of_negative_latencies": self.number_of_negative_latencies,
+            "windows": windows,
+        }
@@ -16,9 +16,9 @@ def callback(message):
         logger.info(f"Start Throughput Message: {start_throughput_message}")
         rd.receive_data(start_throughput_message, logger)
     elif AbortExperimentMessage.is_of_type(message):
-        rd.abort_current_experiment(logger)
+        rd.abort_current_experiment(logger, AbortExperimentMessage(message).test_id)
     elif RestartMessage.is_of_type(message):
-        rd.restart_current_experiment(logger)
+        rd.restart_current_experiment(logger, RestartMessage(message).test_id)
     else:
         service_type = message.attributes['serviceType']
         logger.error('Unknown serviceType: {}'.format(service_type))
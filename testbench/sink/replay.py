@@ -0,0 +1,81 @@
+####
+####### Replays captured sink streams through the decoders of the sink
+####
+# python replay.py capture_file [--repeat N] [--sample-rate N] [--dataset columns.npy --iterations N --shards N]
+# The chunks are fed in the segmentation they were received in, but as fast as possible. With a dataset (columns as
+# stored by the dataset cache), delivered tuple ids are verified as well.
+
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from testbench.common.selectivity import ExpectedTuples, Selectivity
+from capture import read_capture
+from decoding import decode_binary
+from framing import FRAMES, BinaryFramer, JsonFramer, StreamReassembler
+from ReceiveData import TUPLE_DELIMITERS, TestContext, record_binary_tuples, record_json_tuples
+
+
+def replay(path: str, context: TestContext) -> int:
+    """
+    Feeds all chunks of a capture into the sink's reassembler and decoders, returns the number of replayed bytes.
+    """
+    tuple_format, records = read_capture(path)
+    if tuple_format == 'json':
+        reassembler = StreamReassembler(JsonFramer(TUPLE_DELIMITERS.encode('utf-8')))
+        record_frames = lambda frames: record_json_tuples(context, frames)
+    else:
+        reassembler = StreamReassembler(BinaryFramer())
+        record_frames = lambda frames: record_binary_tuples(context, decode_binary(frames))
+
+    number_of_bytes = 0
+    for _, chunk in records:
+        number_of_bytes += len(chunk)
+        while len(chunk) > 0:
+            free = reassembler.free()
+            length = min(len(free), len(chunk))
+            free[:length] = chunk[:length]
+            chunk = chunk[length:]
+            for kind, value in reassembler.received(length):
+                if kind == FRAMES:
+                    record_frames(value)
+                elif value == b"DONE":
+                    return number_of_bytes
+    return number_of_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured stream through the sink decoders")
+    parser.add_argument("capture", help="capture file written by the sink")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--sample-rate", type=int, default=100)
+    parser.add_argument("--dataset", help="columns of the dataset the source sent, enables delivery verification")
+    parser.add_argument("--iterations", type=int, default=1, help="iterations the source sent the dataset")
+    parser.add_argument("--shards", type=int, default=1, help="number of source workers")
+    args = parser.parse_args()
+
+    expected_tuples = None
+    if args.dataset is not None:
+        expected_tuples = ExpectedTuples(Selectivity(np.load(args.dataset, mmap_mode='r')), args.shards,
+                                         args.iterations)
+
+    logger = logging.getLogger("replay")
+    for _ in range(args.repeat):
+        context = TestContext(logger, args.sample_rate, 0, expected_tuples=expected_tuples)
+        start = time.perf_counter()
+        number_of_bytes = replay(args.capture, context)
+        duration = time.perf_counter() - start
+
+        measurement = context.current_measurement
+        print(f"{measurement.number_of_tuples_recv} tuples, {number_of_bytes} bytes in {duration:.3f}s "
+              f"({measurement.number_of_tuples_recv / duration:.0f} tuples/s, {number_of_bytes / duration / 1e6:.1f} MB/s)")
+        print(f"invalid: {measurement.number_of_invalid_tuples}, "
+              f"out of order: {measurement.number_of_out_of_order_tuples}")
+        if measurement.delivery is not None:
+            print(f"delivery: {measurement.delivery.summary()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import struct
+
+import numpy as np
+
+from decoding import decode_binary, decode_json
+
+
+def json_tuple(tuple_id: int, timestamp: int, processing_timestamp: int = 0) -> bytes:
+    return b'{"a": 1,"b": %d,"c": %d,"d": 2,"e": 3, "f": %d}' % (tuple_id, timestamp, processing_timestamp)
+
+
+def test_binary_frames_are_decoded_in_place():
+    frames = memoryview(bytearray(struct.pack('!10i', 1, 0, -5, 3, 4, 1, 1, 2 ** 31 - 1, 3, 4)))
+    tuples = decode_binary(frames)
+    assert tuples['b'].tolist() == [0, 1]
+    assert tuples['c'].tolist() == [-5, 2 ** 31 - 1]
+    assert np.shares_memory(tuples, np.frombuffer(frames, dtype=np.uint8))
+
+
+def test_ids_and_source_timestamps_of_all_tuples_are_decoded():
+    frames = b'|'.join(json_tuple(i, 1000 + i) for i in range(10)) + b'|'
+    tuples = decode_json(memoryview(frames), 0, 100)
+    assert tuples.number_of_frames == 10
+    assert tuples.ids.tolist() == list(range(10))
+    assert tuples.source_timestamps.tolist() == [1000 + i for i in range(10)]
+    assert tuples.number_of_invalid_tuples == 0
+
+
+def test_whitespace_and_negative_timestamps_are_accepted():
+    frames = b'{ "a" : 1 , "b" : 7 ,\n"c" : -12 , "d": 2, "e": 3, "f": 4 }'
+    tuples = decode_json(memoryview(frames), 0, 1)
+    assert tuples.ids.tolist() == [7]
+    assert tuples.source_timestamps.tolist() == [-12]
+    assert tuples.samples == [(-12.0, 4.0)]
+
+
+def test_every_sample_rate_th_tuple_is_sampled():
+    frames = b''.join(json_tuple(i, i, 100 + i) for i in range(10))
+    tuples = decode_json(memoryview(frames), 2, 3)
+    assert tuples.samples == [(2.0, 102.0), (5.0, 105.0), (8.0, 108.0)]
+
+
+def test_invalid_tuples_are_counted_once():
+    frames = json_tuple(0, 5) + b'{"a": 1,"x": 2}' + json_tuple(1, 6) + b'{"a": 1,"b": 2,"c": "late"}'
+    tuples = decode_json(memoryview(frames), 0, 1)
+    assert tuples.number_of_frames == 4
+    assert tuples.ids.tolist() == [0, 1]
+    assert tuples.number_of_invalid_tuples == 2
+    assert tuples.samples == [(5.0, 0.0), (6.0, 0.0)]
+
+
+def test_frames_without_tuples_are_empty():
+    tuples = decode_json(memoryview(b'{}'), 0, 1)
+    assert tuples.ids.tolist() == []
+    assert tuples.source_timestamps.tolist() == []
+    assert tuples.number_of_invalid_tuples == 1
@@ -0,0 +1,91 @@
+import pickle
+
+import numpy as np
+
+from delivery import DeliveryVerifier
+from testbench.common.selectivity import ExpectedTuples, Selectivity
+
+
+def create_columns(filter_values) -> np.ndarray:
+    columns = np.zeros((5, len(filter_values)), dtype=np.int32)
+    columns[0] = filter_values
+    return columns
+
+
+def sent_ids(filter_values, number_of_shards: int, scale: int):
+    # ids and filter decisions of all tuples, in the order the source shards send them
+    tuples = []
+    for shard in np.array_split(np.arange(len(filter_values)), number_of_shards):
+        if len(shard) == 0:
+            continue
+        first_id = int(shard[0]) * scale
+        for iteration in range(scale):
+            for position, index in enumerate(shard.tolist()):
+                tuples.append((first_id + iteration * len(shard) + position, filter_values[index] > 0))
+    return tuples
+
+
+def create_verifier(filter_values, number_of_shards: int = 1, scale: int = 1) -> DeliveryVerifier:
+    return DeliveryVerifier(ExpectedTuples(Selectivity(create_columns(filter_values)), number_of_shards, scale))
+
+
+FILTER_VALUES = [1, 0, 5, -1, 2, 2, 0, 7, 1, -3, 4]
+
+
+def test_complete_delivery_of_all_shards():
+    for number_of_shards in [1, 3, 20]:
+        verifier = create_verifier(FILTER_VALUES, number_of_shards, scale=3)
+        passing = np.array([i for i, passes in sent_ids(FILTER_VALUES, number_of_shards, 3) if passes])
+        # shards are interleaved on the wire
+        verifier.record(passing[::2])
+        verifier.record(passing[1::2])
+
+        summary = verifier.summary()
+        assert summary["number_of_expected_tuples"] == len(passing)
+        assert summary["number_of_delivered_tuples"] == len(passing)
+        assert summary["number_of_lost_tuples"] == 0
+        assert summary["number_of_duplicated_tuples"] == 0
+        assert summary["number_of_unexpected_tuples"] == 0
+        assert verifier.number_of_missing_tuples() == 0
+
+
+def test_filtered_and_unknown_ids_are_unexpected():
+    verifier = create_verifier(FILTER_VALUES, 2, scale=2)
+    filtered = [i for i, passes in sent_ids(FILTER_VALUES, 2, 2) if not passes]
+    verifier.record(np.array(filtered + [-1, 2 * len(FILTER_VALUES), 10 ** 6]))
+
+    assert verifier.number_of_unexpected_tuples == len(filtered) + 3
+    assert verifier.summary()["number_of_delivered_tuples"] == 0
+
+
+def test_duplicates_are_counted_within_and_across_chunks():
+    verifier = create_verifier(FILTER_VALUES)
+    verifier.record(np.array([0, 2, 2]))
+    verifier.record(np.array([0, 4]))
+
+    assert verifier.number_of_duplicated_tuples == 2
+    assert verifier.summary()["number_of_delivered_tuples"] == 3
+
+
+def test_missing_tuples_are_counted_behind_the_last_received_id():
+    verifier = create_verifier(FILTER_VALUES, scale=2)
+    # the first iteration without tuple 4, nothing of the second one
+    verifier.record(np.array([0, 2, 5, 7, 8, 10]))
+
+    assert verifier.number_of_missing_tuples() == 1
+    assert verifier.number_of_lost_tuples() == 7 * 2 - 6
+
+
+def test_connections_are_merged():
+    first = create_verifier(FILTER_VALUES, 2)
+    second = create_verifier(FILTER_VALUES, 2)
+    first.record(np.array([0, 2, 4]))
+    second.record(np.array([4, 5, 7]))
+
+    # workers send their verifier back without the expected tuples
+    second = pickle.loads(pickle.dumps(second))
+    assert second.expected is None
+
+    first.merge(second)
+    assert first.number_of_duplicated_tuples == 1
+    assert first.summary()["number_of_delivered_tuples"] == 5
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+import ReceiveData
+from decoding import TUPLE_SIZE_IN_BYTES
+from framing import FRAMES, TOKEN, BinaryFramer, JsonFramer, StreamReassembler
+from testbench.common.experiment import ExperimentFailedException
+
+
+def binary_tuples(ids, a: int = 1) -> bytes:
+    return b''.join(struct.pack('!5i', a, tuple_id, 0, 0, 0) for tuple_id in ids)
+
+
+def feed(reassembler: StreamReassembler, segments) -> list:
+    items = []
+    for segment in segments:
+        while len(segment) > 0:
+            free = reassembler.free()
+            length = min(len(free), len(segment))
+            free[:length] = segment[:length]
+            segment = segment[length:]
+            for kind, value in reassembler.received(length):
+                items.append((kind, bytes(value)))
+    return items
+
+
+def received_frames(items) -> bytes:
+    return b''.join(value for kind, value in items if kind == FRAMES)
+
+
+def test_binary_frames_are_independent_of_segmentation():
+    data = binary_tuples(range(100))
+    segments = [data[i:i + 7] for i in range(0, len(data), 7)]
+    items = feed(StreamReassembler(BinaryFramer(), size_in_bytes=256), segments)
+    assert received_frames(items) == data
+    assert all(len(value) % TUPLE_SIZE_IN_BYTES == 0 for _, value in items)
+
+
+def test_binary_done_behind_the_last_frame_is_pending_until_confirmed():
+    reassembler = StreamReassembler(BinaryFramer())
+    items = feed(reassembler, [binary_tuples(range(3)) + b"DONE"])
+    assert items == [(FRAMES, binary_tuples(range(3)))]
+    assert reassembler.pending_token == b"DONE"
+
+    assert reassembler.confirm_token() == b"DONE"
+    assert reassembler.pending_token is None
+    assert reassembler.start == reassembler.end
+
+
+def test_binary_tuple_starting_with_done_is_not_a_token():
+    # the first field of the tuple has the same bytes as DONE
+    data = binary_tuples([7], a=struct.unpack('!i', b"DONE")[0])
+    reassembler = StreamReassembler(BinaryFramer())
+
+    assert feed(reassembler, [data[:4]]) == []
+    assert reassembler.pending_token == b"DONE"
+    assert feed(reassembler, [data[4:10]]) == []
+    assert reassembler.pending_token is None
+    assert feed(reassembler, [data[10:]]) == [(FRAMES, data)]
+
+
+def test_binary_tuple_starting_with_ack_is_not_a_token():
+    data = binary_tuples([7], a=struct.unpack('!i', b"ACK\x00")[0])
+    reassembler = StreamReassembler(BinaryFramer())
+
+    assert feed(reassembler, [data[:3], data[3:]]) == [(FRAMES, data)]
+    assert reassembler.pending_token is None
+
+
+def test_json_tokens_are_recognized_at_any_offset():
+    tuples = b'{"a": 1,"b": 0,"c": 5,"d": 0,"e": 0, "f": 0}|\n{"a": 1,"b": 1,"c": 5,"d": 0,"e": 0, "f": 0}|'
+    data = tuples + b"DONE"
+    reassembler = StreamReassembler(JsonFramer(b"|\n "), size_in_bytes=128)
+
+    items = feed(reassembler, [data[i:i + 5] for i in range(0, len(data), 5)])
+    assert items[-1] == (TOKEN, b"DONE")
+    frames = received_frames(items)
+    assert frames.count(b'{') == 2 and frames.endswith(b'}')
+    assert reassembler.pending_token is None
+
+
+def test_frame_exceeding_the_buffer_fails():
+    reassembler = StreamReassembler(JsonFramer(), size_in_bytes=16)
+    with pytest.raises(ExperimentFailedException):
+        feed(reassembler, [b'{"a": 1,', b'"b": 0,', b'"c": 5,'])
+
+
+def test_receiver_waits_for_the_rest_of_a_tuple_that_looks_like_done():
+    source, sink = socket.socketpair()
+    context = ReceiveData.TestContext(logging.getLogger("test"), 1, 0)
+    done_lookalike = binary_tuples([1], a=struct.unpack('!i', b"DONE")[0])
+
+    def send():
+        source.sendall(binary_tuples([0]) + done_lookalike[:4])
+        time.sleep(ReceiveData.TOKEN_CONFIRMATION_TIMEOUT_IN_SECONDS / 5)
+        source.sendall(done_lookalike[4:] + b"DONE")
+        assert source.recv(3) == b"ACK"
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    try:
+        asyncio.run(ReceiveData.handle_client_receiver_binary(sink, context, 1))
+    finally:
+        sender.join()
+        source.close()
+        sink.close()
+
+    measurement = context.current_measurement
+    assert measurement.number_of_tuples_recv == 2
+    assert measurement.last_tuple_id == 1
+    assert measurement.done_timestamp is not None
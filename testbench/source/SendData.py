@@ -1,19 +1,31 @@
+import asyncio
+import contextlib
 import datetime
 import gc
 import logging
-import select
 import socket
-import struct
 import threading
 import time
-from typing import Union
+from typing import Dict, List, Union
+
+import numpy as np
 
 import testbench.common.CustomGoogleCloudStorage as gcs
-from testbench.common.experiment import ExperimentAbortedException, ExperimentAlreadyRunningException
-from testbench.common.messages import ThroughputStartMessage, response_measurements, ready_for_restart
+from testbench.common.arrays import GrowableArray, IdSet
+from testbench.common.datasets import load_dataset
+from testbench.common.eventloop import StopSignal
+from testbench.common.experiment import ExperimentAbortedException, ExperimentAlreadyRunningException, \
+    ExperimentFailedException
+from testbench.common.messages import ThroughputStartMessage, response_measurements, ready_for_restart, \
+    abort_experiment, DEFAULT_DATA_PORT
+from testbench.common.selectivity import Selectivity, number_of_samples
 from testbench.common.stats import *
-
-PORT = 8081
+from testbench.common.workers import mp_context, run_in_worker, run_workers
+from backpressure import BackpressureController
+from batching import BatchWriter
+from encoding import create_encoder
+from pacing import Pacer, RateProfile, ShardedProfile, create_rate_profile, legacy_geometric_parameters
+from workers import Shard, shard_dataset
 
 
 class Measurements:
@@ -22,9 +34,9 @@ class Measurements:
         self.final_packet_stats: PacketStats | None = None
         self.diff_packet_stats: PacketStats | None = None
 
-        self.tuple_timestamps = []
+        self.tuple_timestamps = GrowableArray(np.float64)
         self.number_of_tuples_sent = 0
-        self.qualifying_tuple_ids = []
+        self.qualifying_tuple_ids = IdSet()
         self.number_of_tuples_passing_the_filter = 0
 
         # Perf Counter @ Real Timestamp
@@ -40,30 +52,115 @@ class Measurements:
         # after ACK
         self.ack_timestamp: float | None = None
 
-        self.back_pressure: [(float, float)] = []
+        # BACK/ACK round trips and rate decisions of the backpressure controller
+        self.back_pressure: [dict] = []
+
+        self.batch_size = 1
+        self.batch_size_in_bytes = 0
+        self.number_of_batches = 0
+        self.number_of_send_syscalls = 0
+
+        self.rate_profile: str | None = None
+        self.rate_profile_parameters: dict = {}
+        # Sampled once per pacing report interval
+        self.pacing_timestamps = []
+        self.target_rates = []
+        self.achieved_rates = []
+        self.pacing_errors = []
+
+        # Per worker summary if the source runs with multiple connections
+        self.workers = []
 
     def get_measurements(self) -> dict:
         return {
-            "tuples_sent_timestamps": self.tuple_timestamps,
+            "tuples_sent_timestamps": self.tuple_timestamps.encode(),
+            "rate_profile": self.rate_profile,
+            "rate_profile_parameters": self.rate_profile_parameters,
+            "pacing_timestamps": self.pacing_timestamps,
+            "target_rates": self.target_rates,
+            "achieved_rates": self.achieved_rates,
+            "pacing_errors": self.pacing_errors,
             "number_of_tuples_sent": self.number_of_tuples_sent,
             "number_of_tuples_passing_the_filter": self.number_of_tuples_passing_the_filter,
             "start_timestamp": self.start_timestamp,
             "start_unix_timestamp": time.mktime(self.start_datetime.timetuple()),
             "first_tuple_timestamp": self.first_tuple_timestamp,
             "last_tuple_timestamp": self.last_tuple_timestamp,
-            "qualifying_tuple_ids": self.qualifying_tuple_ids,
+            "qualifying_tuple_ids": self.qualifying_tuple_ids.encode(),
             "ack_timestamp": self.ack_timestamp,
-            "back_pressure": [{"back": x, "ack": y} for x, y in self.back_pressure],
+            "back_pressure": self.back_pressure,
+            "batch_size": self.batch_size,
+            "batch_size_in_bytes": self.batch_size_in_bytes,
+            "number_of_batches": self.number_of_batches,
+            "number_of_send_syscalls": self.number_of_send_syscalls,
             "packets": vars(self.diff_packet_stats),
+            "workers": self.workers,
         }
 
+    def merge(self, worker: 'Measurements'):
+        """
+        Adds the measurements of a source worker. Sampled timestamps stay sorted, counters are summed up.
+        """
+        self.tuple_timestamps = GrowableArray.from_numpy(
+            np.sort(np.concatenate((self.tuple_timestamps.to_numpy(), worker.tuple_timestamps.to_numpy()))))
+        self.qualifying_tuple_ids.update(worker.qualifying_tuple_ids)
+        self.number_of_tuples_sent += worker.number_of_tuples_sent
+        self.number_of_tuples_passing_the_filter += worker.number_of_tuples_passing_the_filter
+        self.back_pressure = sorted(self.back_pressure + worker.back_pressure,
+                                    key=lambda event: event.get("back", event.get("timestamp")))
+
+        self.batch_size = worker.batch_size
+        self.batch_size_in_bytes = worker.batch_size_in_bytes
+        self.number_of_batches += worker.number_of_batches
+        self.number_of_send_syscalls += worker.number_of_send_syscalls
+
+        pacing = sorted(zip(self.pacing_timestamps + worker.pacing_timestamps,
+                            self.target_rates + worker.target_rates,
+                            self.achieved_rates + worker.achieved_rates,
+                            self.pacing_errors + worker.pacing_errors), key=lambda report: report[0])
+        self.pacing_timestamps = [report[0] for report in pacing]
+        self.target_rates = [report[1] for report in pacing]
+        self.achieved_rates = [report[2] for report in pacing]
+        self.pacing_errors = [report[3] for report in pacing]
+
+        if worker.start_timestamp is not None:
+            self.first_tuple_timestamp = worker.start_timestamp if self.first_tuple_timestamp is None else min(
+                self.first_tuple_timestamp, worker.start_timestamp)
+        if worker.last_tuple_timestamp is not None:
+            self.last_tuple_timestamp = max(self.last_tuple_timestamp or 0.0, worker.last_tuple_timestamp)
+        if worker.ack_timestamp is not None:
+            self.ack_timestamp = max(self.ack_timestamp or 0.0, worker.ack_timestamp)
+
+        self.workers.append({
+            "number_of_tuples_sent": worker.number_of_tuples_sent,
+            "number_of_tuples_passing_the_filter": worker.number_of_tuples_passing_the_filter,
+            "start_timestamp": worker.start_timestamp,
+            "ack_timestamp": worker.ack_timestamp,
+            "number_of_back_pressure_events": len([e for e in worker.back_pressure if e["type"] == "back"]),
+        })
+
 
 class TestContext:
 
-    def __init__(self, logger: logging.Logger, sample_rate: int, restarts: int) -> None:
+    def __init__(self, logger: logging.Logger, sample_rate: int, restarts: int, batch_size: int = 1,
+                 batch_size_in_bytes: int = 0, number_of_workers: int = 1, tuple_delimiter: str = '',
+                 adaptive_backpressure: bool = False, test_id: str = None, port: int = DEFAULT_DATA_PORT) -> None:
         super().__init__()
 
         self.source_socket: socket.socket | None = None
+        self.test_id = test_id
+        # concurrent experiments listen on different ports
+        self.port = port
+
+        self.batch_size = batch_size
+        self.batch_size_in_bytes = batch_size_in_bytes
+        self.number_of_workers = number_of_workers
+        # Appended to every JSON tuple, e.g. "|" for NES
+        self.tuple_delimiter = tuple_delimiter
+        # Adjust the send rate based on the occupancy of the send queue before the operator has to be throttled
+        self.adaptive_backpressure = adaptive_backpressure
+        # Id of the first tuple, workers send disjoint id ranges
+        self.tuple_id_offset = 0
 
         self.error_or_aborted = True
 
@@ -72,7 +169,9 @@ class TestContext:
         self.logger = logger
 
         self.was_aborted = False
-        self.stop_event = threading.Event()
+        # shared with the worker processes, so they observe abort requests without the coordinator forwarding them
+        self.stop_signal = StopSignal(mp_context.Event())
+        self.stop_event = self.stop_signal.stop_event
         self.restarts = restarts
         self.measurements: [Measurements] = []
         self.current_measurement = Measurements()
@@ -92,13 +191,16 @@ class TestContext:
             self.source_socket.close()
 
 
-def close_connection(context: TestContext, client_socket: socket.socket):
+async def close_connection(context: TestContext, client_socket: socket.socket, writer: BatchWriter):
+    loop = asyncio.get_running_loop()
     context.logger.info("Closing Connection")
-    client_socket.setblocking(True)
-    context.last_tuple_timestamp = time.perf_counter()
-    client_socket.send(b"DONE")
-    ack_message = client_socket.recv(4)
-    context.ack_timestamp = time.perf_counter()
+    await writer.flush()
+    context.current_measurement.number_of_send_syscalls = writer.number_of_syscalls
+    context.current_measurement.number_of_batches = writer.number_of_batches
+    context.current_measurement.last_tuple_timestamp = time.perf_counter()
+    await loop.sock_sendall(client_socket, b"DONE")
+    ack_message = await loop.sock_recv(client_socket, 4)
+    context.current_measurement.ack_timestamp = time.perf_counter()
     context.logger.info("Waiting for ACK")
     context.logger.info(f"{ack_message}")
     assert ack_message == b"ACK"
@@ -106,151 +208,113 @@ def close_connection(context: TestContext, client_socket: socket.socket):
     context.logger.info("Connection closed")
 
 
-def backpressure_adjustment(context: TestContext, client_socket: socket.socket):
+async def backpressure_adjustment(context: TestContext, client_socket: socket.socket):
+    loop = asyncio.get_running_loop()
     context.logger.info("Backpressure Adjustment")
     back_timestamp = time.perf_counter()
-    client_socket.settimeout(None)
-    client_socket.send(b"BACK")
+    await loop.sock_sendall(client_socket, b"BACK")
     context.logger.info("Waiting for ACK")
-    ack_message = client_socket.recv(4)
-    client_socket.settimeout(0.1)
+    ack_message = await loop.sock_recv(client_socket, 4)
     assert ack_message == b"ACK"
     ack_timestamp = time.perf_counter()
     context.logger.info("Backpressure Adjusted")
-    context.current_measurement.back_pressure.append((back_timestamp, ack_timestamp))
+    context.current_measurement.back_pressure.append({"type": "back", "back": back_timestamp, "ack": ack_timestamp})
 
 
-def wait_for_start_message(context: TestContext, client_socket: socket.socket):
-    client_socket.settimeout(None)
-    start_message = client_socket.recv(len("SEND TUPLES!"))
+async def wait_for_start_message(context: TestContext, client_socket: socket.socket):
+    start_message = await asyncio.get_running_loop().sock_recv(client_socket, len("SEND TUPLES!"))
     assert start_message == b"SEND TUPLES!"
-    client_socket.settimeout(0.1)
     context.current_measurement.start_timestamp = time.perf_counter()
     context.last_time_stamp = context.current_measurement.start_timestamp
 
 
-def write_non_blocking(context: TestContext, client_socket: socket.socket, data: bytes):
-    while True:
-        try:
-            client_socket.send(data)
-            break
-        except socket.timeout as e:
-            time_delta = context.last_time_stamp
-            context.last_time_stamp = time.perf_counter()
-            time_delta = context.last_time_stamp - time_delta
-
-            tuples_send_in_delta = context.current_measurement.number_of_tuples_sent - context.number_of_tuples_sent_before_last_delta
-            context.number_of_tuples_sent_before_last_delta = context.current_measurement.number_of_tuples_sent
+async def send_timeout(context: TestContext, client_socket: socket.socket):
+    time_delta = context.last_time_stamp
+    context.last_time_stamp = time.perf_counter()
+    time_delta = context.last_time_stamp - time_delta
 
-            context.logger.info(f"TPS: {tuples_send_in_delta / time_delta} over the last {time_delta}s")
-            context.logger.info(
-                f"{100 * context.current_measurement.number_of_tuples_sent / context.total_number_of_tuples}% done")
-
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
-
-            backpressure_adjustment(context, client_socket)
-
-
-def handle_client_json(client_socket: socket.socket, context: TestContext, data, delay: float, scale: int,
-                       ramp_factor: float, packet_length=1):
-    client_socket.settimeout(0.1)
-    context.total_number_of_tuples = len(data) * scale
-    context.number_of_tuples_sent_before_last_delta = 0
-    context.number_of_tuples_sent = 0
+    tuples_send_in_delta = context.current_measurement.number_of_tuples_sent - context.number_of_tuples_sent_before_last_delta
+    context.number_of_tuples_sent_before_last_delta = context.current_measurement.number_of_tuples_sent
 
-    wait_for_start_message(context, client_socket)
-    date_set_len = len(data)
+    context.logger.info(f"TPS: {tuples_send_in_delta / time_delta} over the last {time_delta}s")
+    context.logger.info(
+        f"{100 * context.current_measurement.number_of_tuples_sent / context.total_number_of_tuples}% done")
 
-    for iteration in range(scale):
-        context.logger.info(f"Iteration: {iteration}")
-        for i in range(0, date_set_len):
-            tuple_data = b'{"a": %d,"b": %d,"c": %d,"d": %d,"e": %d, "f": %d}' % (
-                data[i][0], context.current_measurement.number_of_tuples_sent, time.perf_counter(), data[i][2], data[i][3],
-                data[i][4])
-
-            write_non_blocking(context, client_socket, tuple_data)
-
-            context.current_measurement.number_of_tuples_sent += packet_length
-
-            if data[i][0] > 0:
-                if context.current_measurement.number_of_tuples_passing_the_filter % context.sample_rate == 0:
-                    context.current_measurement.tuple_timestamps.append(time.perf_counter())
-                context.current_measurement.number_of_tuples_passing_the_filter += 1
-
-            # Decrease the delay time - comment out to send data at a constant rate
-            delay *= 1 / ramp_factor
+    if context.stop_event.is_set():
+        raise ExperimentAbortedException()
 
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
+    await backpressure_adjustment(context, client_socket)
 
-            if delay < 0.0001:
-                continue
 
-            time.sleep(delay)
+def create_batch_writer(context: TestContext, client_socket: socket.socket) -> BatchWriter:
+    context.current_measurement.batch_size = context.batch_size
+    context.current_measurement.batch_size_in_bytes = context.batch_size_in_bytes
+    return BatchWriter(client_socket, context.batch_size, context.batch_size_in_bytes,
+                       lambda: send_timeout(context, client_socket))
 
-    close_connection(context, client_socket)
 
+def take_samples(context: TestContext, passed_before: int, passed_after: int):
+    # a timestamp is taken for every sample_rate-th passing tuple
+    for _ in range(number_of_samples(passed_before, passed_after, context.sample_rate)):
+        context.current_measurement.tuple_timestamps.append(time.perf_counter())
 
-def handle_client_binary(client_socket: socket.socket, context: TestContext, data, delay: float, scale: int,
-                         ramp_factor: float, packet_length=1):
-    if len(data) % packet_length != 0:
-        context.logger.warning("Size of dataset is not divisible by packet length, dataset will be truncated")
-        data = data[:(len(data) // packet_length) * packet_length]
 
-    struct_string = f"!{5 * packet_length}i"
+async def handle_client(client_socket: socket.socket, context: TestContext, columns, pacer: Pacer, scale: int,
+                        tuple_format: str):
+    client_socket.setblocking(False)
+    encoder = create_encoder(columns, tuple_format, context.tuple_delimiter)
+    selectivity = Selectivity(columns)
+    prefix_counts = selectivity.prefix_counts.tolist()
+    measurement = context.current_measurement
 
-    context.total_number_of_tuples = len(data) * scale
+    context.total_number_of_tuples = encoder.number_of_tuples * scale
     context.number_of_tuples_sent_before_last_delta = 0
-    context.number_of_tuples_sent = 0
-
-    wait_for_start_message(context, client_socket)
-    date_set_len = len(data)
-
-    for _ in range(scale):
-        for i in range(0, date_set_len, packet_length):
-
-            passing = [(data[i + pi][0] > 0, context.number_of_tuples_sent + pi) for pi in range(packet_length)]
 
-            data_tuple = [
-                [data[i + pi][0], context.number_of_tuples_sent + pi, data[i + pi][2], data[i + pi][3], data[i + pi][4]]
-                for pi in range(packet_length)]
+    writer = create_batch_writer(context, client_socket)
+    batch_size = max(1, min(writer.batch_size, writer.batch_size_in_bytes // encoder.tuple_size_in_bytes))
 
-            packet = [item for sub_list in data_tuple for item in sub_list]
+    if context.adaptive_backpressure:
+        pacer.controller = BackpressureController(client_socket, measurement)
+        writer.on_blocked = pacer.blocked
 
-            # pack the values into a byte string
-            packed_data = struct.pack(struct_string, *packet)
+    await wait_for_start_message(context, client_socket)
+    date_set_len = encoder.number_of_tuples
+    pacer.start()
 
-            write_non_blocking(context, client_socket, packed_data)
-
-            context.number_of_tuples_sent += packet_length
+    for iteration in range(scale):
+        context.logger.debug(f"Iteration: {iteration}")
+        first_tuple_id = context.tuple_id_offset + measurement.number_of_tuples_sent
+        encoder.start_iteration(first_tuple_id)
+        passed_before_iteration = measurement.number_of_tuples_passing_the_filter
 
-            for p in passing:
-                if p[0]:
-                    if context.current_measurement.number_of_tuples_passing_the_filter % context.sample_rate == 0:
-                        context.current_measurement.tuple_timestamps.append(time.perf_counter())
-                    context.current_measurement.qualifying_tuple_ids.append(p[1])
-                    context.current_measurement.number_of_tuples_passing_the_filter += 1
+        for i in range(0, date_set_len, batch_size):
+            number_of_tuples = min(batch_size, date_set_len - i)
+            await writer.write(encoder.encode(i, number_of_tuples), number_of_tuples)
 
-            # Decrease the delay time - comment out to send data at a constant rate
-            delay *= 1 / ramp_factor
+            measurement.number_of_tuples_sent += number_of_tuples
+            take_samples(context, passed_before_iteration + prefix_counts[i],
+                         passed_before_iteration + prefix_counts[i + number_of_tuples])
 
             if context.stop_event.is_set():
                 raise ExperimentAbortedException()
 
-            if delay < 0.0001:
-                continue
+            await pacer.pace(number_of_tuples)
 
-            time.sleep(delay)
+        # binary batches are views of the wire buffer, whose ids are patched by the next iteration
+        await writer.flush()
+        # qualifying ids and the passing counter are derived from the mask once per iteration
+        measurement.qualifying_tuple_ids.add_mask(first_tuple_id, selectivity.mask)
+        measurement.number_of_tuples_passing_the_filter += selectivity.number_of_passing_tuples
 
-    close_connection(context, client_socket)
+    await close_connection(context, client_socket, writer)
 
 
-def test_tuple_throughput(context: TestContext, data, delay, scale, ramp_factor, tuple_format: str, socket_opts=False):
+async def test_tuple_throughput(context: TestContext, columns, rate_profile: RateProfile, scale, tuple_format: str,
+                                socket_opts=False):
     # Create a TCP socket
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.settimeout(0.1)
+    server_socket.setblocking(False)
     context.source_socket = server_socket
 
     if socket_opts:
@@ -262,121 +326,192 @@ def test_tuple_throughput(context: TestContext, data, delay, scale, ramp_factor,
         assert server_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == 1
 
     # Bind the socket to a local address and port
-    server_socket.bind(('0.0.0.0', PORT))
+    server_socket.bind(('0.0.0.0', context.port))
 
     context.logger.info("Waiting for Connection")
     # Start listening for incoming connections
     server_socket.listen()
 
-    inputs = [server_socket]
+    client_socket = await accept_connection(context, server_socket, socket_opts)
+    context.current_measurement.start_datetime = datetime.datetime.now()
+    context.current_measurement.start_timestamp = time.perf_counter()
+    context.current_measurement.initial_packet_stats = PacketStats()
+
+    if context.number_of_workers > 1:
+        client_sockets = [client_socket]
+        while len(client_sockets) < context.number_of_workers:
+            client_sockets.append(await accept_connection(context, server_socket, socket_opts))
+        await handle_clients_in_parallel(client_sockets, context, columns, rate_profile, scale, tuple_format)
+    else:
+        pacer = Pacer(rate_profile, context.current_measurement)
+        # Handle the client's request
+        await handle_client(client_socket, context, columns, pacer, scale, tuple_format)
+
+    server_socket.close()
 
-    while inputs:
-        readable, writable, exceptional = select.select(inputs, [], [], 0.5)
-        if not (readable or writable or exceptional):
-            # select timeout
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
-            else:
-                # repeat
-                continue
-        else:
-            # we got a connection
-            if context.stop_event.is_set():
-                raise ExperimentAbortedException()
 
-            # Accept a single incoming connection
-            client_socket, client_address = server_socket.accept()
-            context.current_measurement.start_datetime = datetime.datetime.now()
-            context.current_measurement.start_timestamp = time.perf_counter()
+async def accept_connection(context: TestContext, server_socket: socket.socket, socket_opts=False) -> socket.socket:
+    # Accept a single incoming connection, abort requests cancel the wait
+    client_socket, client_address = await asyncio.get_running_loop().sock_accept(server_socket)
 
-            if socket_opts:
-                assert client_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK) == 1
-                assert client_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == 1
+    if socket_opts:
+        assert client_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK) == 1
+        assert client_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == 1
 
-            context.logger.info(f"Producer: Accepted a connection from {client_address}")
+    context.logger.info(f"Producer: Accepted a connection from {client_address}")
+    return client_socket
 
-            context.current_measurement.initial_packet_stats = PacketStats()
-            # Handle the client's request
-            if tuple_format == 'json':
-                handle_client_json(client_socket, context, data, delay, scale, ramp_factor)
-            else:
-                handle_client_binary(client_socket, context, data, delay, scale, ramp_factor)
-            break
 
-    server_socket.close()
+def handle_client_in_worker(client_socket: socket.socket, logger: logging.Logger, sample_rate: int, batch_size: int,
+                            batch_size_in_bytes: int, tuple_delimiter: str, adaptive_backpressure: bool, shard: Shard,
+                            rate_profile: RateProfile, scale: int, tuple_format: str, stop_event) -> Measurements:
+    context = TestContext(logger, sample_rate, 0, batch_size, batch_size_in_bytes, tuple_delimiter=tuple_delimiter,
+                          adaptive_backpressure=adaptive_backpressure)
+    context.stop_signal = StopSignal(stop_event)
+    context.stop_event = stop_event
+    context.tuple_id_offset = shard.first_tuple_id
+
+    pacer = Pacer(rate_profile, context.current_measurement)
+    asyncio.run(run_in_worker(context.stop_signal, context.stop_signal.run_until_stopped(
+        handle_client(client_socket, context, shard.columns, pacer, scale, tuple_format))))
+
+    return context.current_measurement
+
+
+async def handle_clients_in_parallel(client_sockets: [socket.socket], context: TestContext, columns,
+                                     rate_profile: RateProfile, scale: int, tuple_format: str):
+    context.logger.info(f"Sending with {len(client_sockets)} worker processes")
+    worker_rate_profile = ShardedProfile(rate_profile, len(client_sockets))
+    shards = shard_dataset(columns, len(client_sockets), scale)
+
+    workers = asyncio.get_running_loop().run_in_executor(None, run_workers, handle_client_in_worker, [
+        (client_socket, context.logger, context.sample_rate, context.batch_size, context.batch_size_in_bytes,
+         context.tuple_delimiter, context.adaptive_backpressure, shard, worker_rate_profile, scale, tuple_format)
+        for client_socket, shard in zip(client_sockets, shards)
+    ], context.stop_event)
+    try:
+        worker_measurements = await asyncio.shield(workers)
+    except asyncio.CancelledError:
+        # the workers observe the stop event themselves, the sockets are closed once all of them have exited
+        with contextlib.suppress(Exception):
+            await workers
+        raise
+    finally:
+        for client_socket in client_sockets:
+            client_socket.close()
 
+    for measurement in worker_measurements:
+        context.current_measurement.merge(measurement)
 
-active_test_context: Union[TestContext, None] = None
 
+# running experiments by test id
+active_test_contexts: Dict[str, TestContext] = {}
+active_test_contexts_lock = threading.Lock()
 
-def wait_for_restart(context: TestContext):
-    ready_for_restart('source')
-    context.stop_event.wait()
+
+def find_test_contexts(test_id: Union[str, None]) -> List[TestContext]:
+    # messages without a test id address every running experiment
+    with active_test_contexts_lock:
+        if test_id is None:
+            return list(active_test_contexts.values())
+        return [active_test_contexts[test_id]] if test_id in active_test_contexts else []
+
+
+async def wait_for_restart(context: TestContext):
+    ready_for_restart('source', context.test_id)
+    await context.stop_signal.wait()
 
     if context.was_aborted:
         raise ExperimentAbortedException()
 
-    context.stop_event.clear()
+    context.stop_signal.clear()
     context.restart()
 
 
-def test_gcp(test_id: str, restarts, sample_rate, data, delay, iterations, logger, tuple_format: str, ramp_factor=1.05):
-    global active_test_context
-
-    if active_test_context is not None:
-        raise ExperimentAlreadyRunningException()
-
+async def run_experiment(context: TestContext, columns, rate_profile_name: str, rate_profile_parameters: dict,
+                         iterations: int, tuple_format: str):
+    context.stop_signal.attach()
     try:
-        active_test_context = TestContext(logger, sample_rate, restarts)
+        try:
+            rate_profile = create_rate_profile(rate_profile_name, rate_profile_parameters)
+        except (TypeError, ValueError) as e:
+            raise ExperimentFailedException(f"Invalid rate profile {rate_profile_name}: {e}")
         number_of_restarts = 0
-        while number_of_restarts <= active_test_context.restarts:
+        while number_of_restarts <= context.restarts:
             if number_of_restarts > 0:
-                wait_for_restart(active_test_context)
+                await wait_for_restart(context)
 
-            test_tuple_throughput(active_test_context, data, delay, iterations, ramp_factor, tuple_format)
+            context.current_measurement.rate_profile = rate_profile_name
+            context.current_measurement.rate_profile_parameters = rate_profile_parameters
+            await context.stop_signal.run_until_stopped(
+                test_tuple_throughput(context, columns, rate_profile, iterations, tuple_format))
 
-            active_test_context.current_measurement.final_packet_stats = PacketStats()
+            context.current_measurement.final_packet_stats = PacketStats()
 
-            active_test_context.current_measurement.diff_packet_stats = \
-                diff(active_test_context.current_measurement.initial_packet_stats,
-                     active_test_context.current_measurement.final_packet_stats)
+            context.current_measurement.diff_packet_stats = \
+                diff(context.current_measurement.initial_packet_stats, context.current_measurement.final_packet_stats)
 
             number_of_restarts += 1
+    finally:
+        context.stop_signal.detach()
 
-        active_test_context.restart()
-        active_test_context.error_or_aborted = False
-        gcs.store_evaluation_in_bucket(logger, active_test_context.get_measurements(), 'source', test_id)
 
-        response_measurements('source', {})
+def test_gcp(test_id: str, restarts, sample_rate, columns, iterations, logger, tuple_format: str, rate_profile_name: str,
+             rate_profile_parameters: dict, batch_size: int = 1, batch_size_in_bytes: int = 0, number_of_workers: int = 1,
+             tuple_delimiter: str = '', adaptive_backpressure: bool = False, port: int = DEFAULT_DATA_PORT):
+    with active_test_contexts_lock:
+        if test_id in active_test_contexts:
+            raise ExperimentAlreadyRunningException()
+        context = TestContext(logger, sample_rate, restarts, batch_size, batch_size_in_bytes, number_of_workers,
+                              tuple_delimiter, adaptive_backpressure, test_id, port)
+        active_test_contexts[test_id] = context
 
+    try:
+        asyncio.run(run_experiment(context, columns, rate_profile_name, rate_profile_parameters, iterations,
+                                   tuple_format))
+
+        context.restart()
+        context.error_or_aborted = False
+        gcs.store_evaluation_in_bucket(logger, context.get_measurements(), 'source', test_id)
+
+        response_measurements('source', {}, test_id)
+
+    except ExperimentFailedException as e:
+        context.error_or_aborted = True
+        context.logger.error(e)
+        abort_experiment(test_id)
     except ExperimentAbortedException as _:
-        active_test_context.logger.info("Experiment was aborted")
+        context.logger.info("Experiment was aborted")
     finally:
-        active_test_context.clean_up()
-        active_test_context = None
+        context.clean_up()
+        with active_test_contexts_lock:
+            del active_test_contexts[test_id]
         gc.collect()
 
 
-def abort_current_experiment(logger: logging.Logger):
-    global active_test_context
+def abort_current_experiment(logger: logging.Logger, test_id: str = None):
+    for context in find_test_contexts(test_id):
+        context.error_or_aborted = True
+        context.was_aborted = True
+        logger.warning(f"Request aborting the experiment {context.test_id}")
+        context.stop_signal.set()
 
-    if active_test_context is not None:
-        active_test_context.error_or_aborted = True
-        active_test_context.was_aborted = True
-        logger.warning(f"Request aborting the experiment")
-        active_test_context.stop_event.set()
 
-
-def restart_current_experiment(logger: logging.Logger):
-    global active_test_context
-
-    if active_test_context is not None:
-        logger.info(f"Restart")
-        active_test_context.stop_event.set()
+def restart_current_experiment(logger: logging.Logger, test_id: str = None):
+    for context in find_test_contexts(test_id):
+        logger.info(f"Restart {context.test_id}")
+        context.stop_signal.set()
 
 
 def send_data(message: ThroughputStartMessage, logger):
-    data = gcs.downloadDataset(message.dataset_id)
+    columns = load_dataset(message.dataset_id)
+
+    rate_profile_parameters = dict(message.rate_profile_parameters)
+    if message.rate_profile == 'geometric':
+        rate_profile_parameters = {**legacy_geometric_parameters(message.delay, message.ramp_factor),
+                                   **rate_profile_parameters}
 
-    test_gcp(message.test_id, message.restarts, message.sample_rate, data, message.delay, message.iterations, logger,
-             message.tuple_format)
+    test_gcp(message.test_id, message.restarts, message.sample_rate, columns, message.iterations, logger,
+             message.tuple_format, message.rate_profile, rate_profile_parameters, message.batch_size,
+             message.batch_size_in_bytes, message.source_workers, message.tuple_delimiter,
+             message.adaptive_backpressure, message.source_port)
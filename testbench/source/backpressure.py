@@ -0,0 +1,84 @@
+import fcntl
+import math
+import socket
+import struct
+import termios
+
+# SIOCOUTQ: bytes in the socket send queue that are not yet acknowledged by the receiver (same value as TIOCOUTQ)
+SIOCOUTQ = termios.TIOCOUTQ
+
+# The send queue is sampled once per CONTROL_INTERVAL_IN_SECONDS
+CONTROL_INTERVAL_IN_SECONDS = 0.01
+# Fraction of the send buffer above which the rate is decreased
+HIGH_WATERMARK = 0.5
+# Multiplicative decrease of the achieved rate once the high watermark is exceeded
+DECREASE_FACTOR = 0.5
+# Additive increase of the rate limit per control interval, in tuples per second
+ADDITIVE_INCREASE = 10000.0
+# Lower bound of the rate limit, keeps the pacer from sleeping through several control intervals
+MIN_RATE_LIMIT = 1000.0
+# Increases are recorded at most once per INCREASE_REPORT_INTERVAL_IN_SECONDS, decreases are always recorded
+INCREASE_REPORT_INTERVAL_IN_SECONDS = 0.1
+
+
+def send_queue_size(client_socket: socket.socket) -> int:
+    buffer = fcntl.ioctl(client_socket.fileno(), SIOCOUTQ, struct.pack('i', 0))
+    return struct.unpack('i', buffer)[0]
+
+
+class BackpressureController:
+    """
+    AIMD rate limit driven by the occupancy of the kernel send queue. Whenever more than HIGH_WATERMARK of the send
+    buffer is queued the limit drops to DECREASE_FACTOR times the rate achieved in the last interval, otherwise it
+    grows by ADDITIVE_INCREASE per interval until it no longer restricts the rate profile.
+    """
+
+    def __init__(self, client_socket: socket.socket, measurement) -> None:
+        super().__init__()
+        self.client_socket = client_socket
+        self.measurement = measurement
+        self.send_buffer_size = client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+
+        self.limit = math.inf
+        self.last_sample_timestamp = None
+        self.last_sample_tuples_sent = 0
+        self.last_increase_report = 0.0
+
+    def due(self, now: float) -> bool:
+        return self.last_sample_timestamp is None or now - self.last_sample_timestamp >= CONTROL_INTERVAL_IN_SECONDS
+
+    def update(self, now: float, tuples_sent: int, profile_rate: float, blocked: bool = False):
+        if self.last_sample_timestamp is None:
+            self.last_sample_timestamp = now
+            self.last_sample_tuples_sent = tuples_sent
+            return
+
+        time_delta = now - self.last_sample_timestamp
+        # a full send buffer is sampled right away instead of at the end of the control interval
+        if time_delta <= 0 or (time_delta < CONTROL_INTERVAL_IN_SECONDS and not blocked):
+            return
+
+        achieved_rate = (tuples_sent - self.last_sample_tuples_sent) / time_delta
+        self.last_sample_timestamp = now
+        self.last_sample_tuples_sent = tuples_sent
+
+        queued_bytes = send_queue_size(self.client_socket)
+        if queued_bytes > HIGH_WATERMARK * self.send_buffer_size:
+            self.limit = max(MIN_RATE_LIMIT, DECREASE_FACTOR * min(achieved_rate, self.limit))
+            self.record(now, "decrease", queued_bytes)
+        elif not math.isinf(self.limit):
+            self.limit += ADDITIVE_INCREASE
+            if self.limit >= profile_rate:
+                self.limit = math.inf
+                self.record(now, "release", queued_bytes)
+            elif now - self.last_increase_report >= INCREASE_REPORT_INTERVAL_IN_SECONDS:
+                self.last_increase_report = now
+                self.record(now, "increase", queued_bytes)
+
+    def record(self, now: float, decision: str, queued_bytes: int):
+        self.measurement.back_pressure.append({
+            "type": decision,
+            "timestamp": now,
+            "queued_bytes": queued_bytes,
+            "rate_limit": None if math.isinf(self.limit) else self.limit,
+        })
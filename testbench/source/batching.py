@@ -0,0 +1,83 @@
+import socket
+from typing import Awaitable, Callable
+
+from testbench.common.eventloop import wait_writable
+
+# Upper bound of buffers passed to a single sendmsg call (IOV_MAX on linux)
+MAX_BUFFERS_PER_SYSCALL = 1024
+DEFAULT_BATCH_SIZE_IN_BYTES = 64 * 1024
+# A send buffer that does not drain within this time is reported as backpressure
+SEND_TIMEOUT_IN_SECONDS = 0.1
+
+
+class BatchWriter:
+    """
+    Gathers encoded tuples until either `batch_size` tuples or `batch_size_in_bytes` bytes are pending and writes them
+    with a single scatter-gather sendmsg call on the non-blocking socket. Partial writes are resumed at the first
+    unsent byte once the event loop reports the socket as writable. If it does not become writable within
+    SEND_TIMEOUT_IN_SECONDS, `on_timeout` is awaited before the remaining bytes are retried. The optional
+    `on_blocked` callback is invoked whenever the send buffer is full.
+    """
+
+    def __init__(self, client_socket: socket.socket, batch_size: int, batch_size_in_bytes: int,
+                 on_timeout: Callable[[], Awaitable]) -> None:
+        super().__init__()
+        self.client_socket = client_socket
+        self.batch_size = max(1, batch_size)
+        self.batch_size_in_bytes = batch_size_in_bytes if batch_size_in_bytes > 0 else DEFAULT_BATCH_SIZE_IN_BYTES
+        self.on_timeout = on_timeout
+        self.on_blocked: Callable[[], None] | None = None
+
+        self.buffers = []
+        self.pending_tuples = 0
+        self.pending_bytes = 0
+
+        self.number_of_syscalls = 0
+        self.number_of_batches = 0
+
+    async def write(self, buffer, number_of_tuples: int = 1):
+        self.buffers.append(buffer)
+        self.pending_tuples += number_of_tuples
+        self.pending_bytes += len(buffer)
+
+        if self.pending_tuples >= self.batch_size or self.pending_bytes >= self.batch_size_in_bytes:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffers:
+            return
+
+        buffers = self.buffers
+        while buffers:
+            try:
+                if len(buffers) == 1:
+                    sent = self.client_socket.send(buffers[0])
+                else:
+                    sent = self.client_socket.sendmsg(buffers[:MAX_BUFFERS_PER_SYSCALL])
+            except BlockingIOError:
+                if self.on_blocked is not None:
+                    self.on_blocked()
+                if not await wait_writable(self.client_socket, SEND_TIMEOUT_IN_SECONDS):
+                    await self.on_timeout()
+                continue
+
+            self.number_of_syscalls += 1
+            advance(buffers, sent)
+
+        self.number_of_batches += 1
+        self.pending_tuples = 0
+        self.pending_bytes = 0
+
+
+def advance(buffers: list, sent: int):
+    # drop everything that was fully written and keep the unsent tail of a partially written buffer
+    fully_sent = 0
+    while sent > 0:
+        length = len(buffers[fully_sent])
+        if sent >= length:
+            sent -= length
+            fully_sent += 1
+        else:
+            buffers[fully_sent] = memoryview(buffers[fully_sent])[sent:]
+            sent = 0
+    del buffers[:fully_sent]
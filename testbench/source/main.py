@@ -19,9 +19,9 @@ def callback(message):
         logger.info(f"Start Throughput Message: {start_throughput_message}")
         sd.send_data(start_throughput_message, logger)
     elif RestartMessage.is_of_type(message):
-        sd.restart_current_experiment(logger)
+        sd.restart_current_experiment(logger, RestartMessage(message).test_id)
     elif AbortExperimentMessage.is_of_type(message):
-        sd.abort_current_experiment(logger)
+        sd.abort_current_experiment(logger, AbortExperimentMessage(message).test_id)
     else:
         service_type = message.attributes['serviceType']
         logger.error('Unknown serviceType: {}'.format(service_type))
@@ -0,0 +1,245 @@
+import asyncio
+import math
+import time
+
+# The event loop wakes up with millisecond resolution, longer waits sleep in the loop until this close to the deadline,
+# the remaining time is spent spinning while yielding to the loop
+EVENT_LOOP_RESOLUTION_IN_SECONDS = 0.001
+# Number of tuples per batch is chosen so that a batch is due at most every BATCH_INTERVAL_IN_SECONDS
+BATCH_INTERVAL_IN_SECONDS = 0.001
+# If the source falls behind by more than MAX_LAG_IN_SECONDS the deadline is reset instead of bursting to catch up
+MAX_LAG_IN_SECONDS = 0.1
+# Batch size used while pacing is disabled, the profile is re-evaluated once per batch
+UNPACED_BATCH_SIZE = 1000
+# Lower bound for target rates, profiles starting at 0 tuples/s would otherwise never send the first batch
+MIN_RATE = 1.0
+# Achieved rate and pacing error are reported once per REPORT_INTERVAL_IN_SECONDS
+REPORT_INTERVAL_IN_SECONDS = 0.1
+
+
+class RateProfile:
+    """
+    Target send rate in tuples per second as a function of the elapsed time since the first tuple and the number of
+    tuples that have been sent so far. A rate of math.inf disables pacing.
+    """
+
+    name = None
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        raise NotImplementedError()
+
+
+class ConstantProfile(RateProfile):
+    name = 'constant'
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.target_rate = float(rate)
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        return self.target_rate
+
+
+class LinearRampProfile(RateProfile):
+    name = 'linear'
+
+    def __init__(self, start_rate: float, end_rate: float, duration: float) -> None:
+        super().__init__()
+        self.start_rate = float(start_rate)
+        self.end_rate = float(end_rate)
+        self.duration = float(duration)
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        if elapsed >= self.duration:
+            return self.end_rate
+        return self.start_rate + (self.end_rate - self.start_rate) * elapsed / self.duration
+
+
+class StepProfile(RateProfile):
+    name = 'step'
+
+    def __init__(self, start_rate: float, step_rate: float, step_duration: float, max_rate: float = math.inf) -> None:
+        super().__init__()
+        self.start_rate = float(start_rate)
+        self.step_rate = float(step_rate)
+        self.step_duration = float(step_duration)
+        self.max_rate = float(max_rate)
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        return min(self.start_rate + self.step_rate * math.floor(elapsed / self.step_duration), self.max_rate)
+
+
+class GeometricProfile(RateProfile):
+    """
+    The rate grows by `factor` with every sent tuple. This is the behaviour of the former
+    `delay *= 1 / ramp_factor` loop with start_rate = 1 / delay.
+    """
+
+    name = 'geometric'
+
+    def __init__(self, start_rate: float, factor: float, max_rate: float = math.inf) -> None:
+        super().__init__()
+        self.start_rate = float(start_rate)
+        self.factor = float(factor)
+        self.max_rate = float(max_rate)
+        self._log_factor = math.log(self.factor) if self.factor > 0 else 0.0
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        if math.isinf(self.start_rate):
+            return math.inf
+        # evaluated in log space, factor ** tuples_sent overflows for large runs
+        log_rate = math.log(self.start_rate) + tuples_sent * self._log_factor
+        if log_rate >= math.log(self.max_rate):
+            return self.max_rate
+        return math.exp(log_rate)
+
+
+RATE_PROFILES = {
+    ConstantProfile.name: ConstantProfile,
+    LinearRampProfile.name: LinearRampProfile,
+    StepProfile.name: StepProfile,
+    GeometricProfile.name: GeometricProfile,
+}
+
+
+def create_rate_profile(name: str, parameters: dict) -> RateProfile:
+    if name not in RATE_PROFILES:
+        raise ValueError(f"Unknown rate profile: {name}. Expected one of {list(RATE_PROFILES.keys())}")
+    return RATE_PROFILES[name](**parameters)
+
+
+def legacy_geometric_parameters(delay: float, ramp_factor: float) -> dict:
+    # parameters equivalent to the former delay / ramp_factor configuration
+    return {'start_rate': 1 / delay if delay > 0 else math.inf, 'factor': ramp_factor}
+
+
+class Pacer:
+    """
+    Paces the source against absolute deadlines. Every call to `pace` accounts for the tuples that have just been
+    sent, once a full batch has been sent the pacer waits until the deadline of that batch. Most of the wait is spent
+    in the event loop, only the last millisecond is spun. The spin yields to the event loop, so other connections and
+    abort requests are served meanwhile. Deadlines are advanced by batch size / target rate, so sleep inaccuracies do
+    not accumulate over time.
+    """
+
+    def __init__(self, profile: RateProfile, measurement) -> None:
+        super().__init__()
+        self.profile = profile
+        self.measurement = measurement
+        # optional rate limit that reacts to the occupancy of the send queue
+        self.controller = None
+        self.profile_rate = math.inf
+
+        self.start_time = 0.0
+        self.deadline = 0.0
+        self.tuples_sent = 0
+        self.pending = 0
+        self.batch_size = 1
+
+        self.report_timestamp = 0.0
+        self.report_tuples_sent = 0
+        self.report_target_rate = 0.0
+        self.report_error_sum = 0.0
+        self.report_error_count = 0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time
+        self.report_timestamp = self.start_time
+        self.tuples_sent = 0
+        self.pending = 0
+        self.batch_size = self.compute_batch_size(self.profile.rate(0.0, 0))
+
+    @staticmethod
+    def compute_batch_size(rate: float) -> int:
+        if math.isinf(rate):
+            return UNPACED_BATCH_SIZE
+        return max(1, int(rate * BATCH_INTERVAL_IN_SECONDS))
+
+    async def pace(self, number_of_tuples: int):
+        self.tuples_sent += number_of_tuples
+        self.pending += number_of_tuples
+        if self.pending < self.batch_size and not self.control_due():
+            return
+
+        profile_rate = max(self.profile.rate(self.deadline - self.start_time, self.tuples_sent), MIN_RATE)
+        self.profile_rate = profile_rate
+        rate = profile_rate if self.controller is None else min(profile_rate, self.controller.limit)
+        self.batch_size = self.compute_batch_size(rate)
+        self.report_target_rate = rate
+
+        if math.isinf(rate):
+            self.pending = 0
+            self.deadline = time.perf_counter()
+            self.control(self.deadline, profile_rate)
+            self.report(self.deadline)
+            return
+
+        self.deadline += self.pending / rate
+        self.pending = 0
+
+        now = time.perf_counter()
+        remaining = self.deadline - now
+        if remaining > EVENT_LOOP_RESOLUTION_IN_SECONDS:
+            await asyncio.sleep(remaining - EVENT_LOOP_RESOLUTION_IN_SECONDS)
+            now = time.perf_counter()
+        while now < self.deadline:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+
+        error = now - self.deadline
+        if error > MAX_LAG_IN_SECONDS:
+            # the source cannot keep up with the profile, continue from now
+            self.deadline = now
+
+        self.report_error_sum += error
+        self.report_error_count += 1
+        self.control(now, profile_rate)
+        self.report(now)
+
+    def control_due(self) -> bool:
+        # the send queue is sampled within a batch as well, a single batch can fill the whole send buffer
+        return self.controller is not None and self.controller.due(time.perf_counter())
+
+    def blocked(self):
+        if self.controller is not None:
+            self.controller.update(time.perf_counter(), self.tuples_sent, self.profile_rate, blocked=True)
+
+    def control(self, now: float, profile_rate: float):
+        if self.controller is not None:
+            self.controller.update(now, self.tuples_sent, profile_rate)
+
+    def report(self, now: float):
+        time_delta = now - self.report_timestamp
+        if time_delta < REPORT_INTERVAL_IN_SECONDS:
+            return
+
+        achieved_rate = (self.tuples_sent - self.report_tuples_sent) / time_delta
+        pacing_error = self.report_error_sum / self.report_error_count if self.report_error_count > 0 else 0.0
+
+        self.measurement.pacing_timestamps.append(now)
+        self.measurement.target_rates.append(
+            None if math.isinf(self.report_target_rate) else self.report_target_rate)
+        self.measurement.achieved_rates.append(achieved_rate)
+        self.measurement.pacing_errors.append(pacing_error)
+
+        self.report_timestamp = now
+        self.report_tuples_sent = self.tuples_sent
+        self.report_error_sum = 0.0
+        self.report_error_count = 0
+
+
+class ShardedProfile(RateProfile):
+    """
+    Share of a profile for one of `number_of_shards` workers that send in parallel. The workers together follow the
+    wrapped profile, assuming they progress at the same speed.
+    """
+
+    def __init__(self, profile: RateProfile, number_of_shards: int) -> None:
+        super().__init__()
+        self.profile = profile
+        self.number_of_shards = number_of_shards
+        self.name = profile.name
+
+    def rate(self, elapsed: float, tuples_sent: int) -> float:
+        return self.profile.rate(elapsed, tuples_sent * self.number_of_shards) / self.number_of_shards
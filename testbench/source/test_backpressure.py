@@ -0,0 +1,82 @@
+import math
+import socket
+import types
+
+import pytest
+
+import backpressure
+from backpressure import ADDITIVE_INCREASE, CONTROL_INTERVAL_IN_SECONDS, MIN_RATE_LIMIT, BackpressureController, \
+    send_queue_size
+
+# perf_counter time of the first sample
+START = 1.0
+
+
+@pytest.fixture
+def client_socket():
+    client_socket, peer = socket.socketpair()
+    yield client_socket
+    client_socket.close()
+    peer.close()
+
+
+@pytest.fixture
+def queued_bytes(monkeypatch):
+    queue = {"bytes": 0}
+    monkeypatch.setattr(backpressure, "send_queue_size", lambda _: queue["bytes"])
+    return queue
+
+
+def create_controller(client_socket: socket.socket) -> BackpressureController:
+    controller = BackpressureController(client_socket, types.SimpleNamespace(back_pressure=[]))
+    controller.update(START, 0, math.inf)
+    return controller
+
+
+def test_send_queue_size_counts_unread_bytes(client_socket):
+    assert send_queue_size(client_socket) == 0
+    client_socket.sendall(b'x' * 1000)
+    assert send_queue_size(client_socket) > 0
+
+
+def test_full_send_queue_decreases_the_limit(client_socket, queued_bytes):
+    controller = create_controller(client_socket)
+    queued_bytes["bytes"] = controller.send_buffer_size
+
+    # 10000 tuples in 10ms
+    controller.update(START + CONTROL_INTERVAL_IN_SECONDS, 10_000, math.inf)
+    assert controller.limit == pytest.approx(500_000)
+    assert controller.measurement.back_pressure[-1]["type"] == "decrease"
+
+    controller.update(START + 2 * CONTROL_INTERVAL_IN_SECONDS, 10_001, math.inf)
+    assert controller.limit == MIN_RATE_LIMIT
+
+
+def test_limit_increases_until_it_is_released(client_socket, queued_bytes):
+    controller = create_controller(client_socket)
+    queued_bytes["bytes"] = controller.send_buffer_size
+    controller.update(START + CONTROL_INTERVAL_IN_SECONDS, 10, math.inf)
+    assert controller.limit == MIN_RATE_LIMIT
+
+    queued_bytes["bytes"] = 0
+    controller.update(START + 2 * CONTROL_INTERVAL_IN_SECONDS, 20, 50_000)
+    assert controller.limit == MIN_RATE_LIMIT + ADDITIVE_INCREASE
+
+    for interval in range(3, 10):
+        controller.update(START + interval * CONTROL_INTERVAL_IN_SECONDS, 10 * interval, 50_000)
+    assert math.isinf(controller.limit)
+    assert [event["type"] for event in controller.measurement.back_pressure] == ["decrease", "increase", "release"]
+
+
+def test_updates_within_the_control_interval_are_ignored_unless_blocked(client_socket, queued_bytes):
+    controller = create_controller(client_socket)
+    queued_bytes["bytes"] = controller.send_buffer_size
+
+    assert not controller.due(START + CONTROL_INTERVAL_IN_SECONDS / 2)
+    controller.update(START + CONTROL_INTERVAL_IN_SECONDS / 2, 1000, math.inf)
+    assert math.isinf(controller.limit)
+
+    controller.update(START + CONTROL_INTERVAL_IN_SECONDS / 2, 1000, math.inf, blocked=True)
+    # 1000 tuples in 5ms
+    assert controller.limit == pytest.approx(100_000)
+    assert controller.due(START + 2 * CONTROL_INTERVAL_IN_SECONDS)
@@ -0,0 +1,117 @@
+import asyncio
+import socket
+
+import pytest
+
+from batching import BatchWriter, advance
+
+
+@pytest.fixture
+def sockets():
+    sender, receiver = socket.socketpair()
+    sender.setblocking(False)
+    receiver.setblocking(False)
+    yield sender, receiver
+    sender.close()
+    receiver.close()
+
+
+async def no_timeout():
+    raise AssertionError("the send buffer did not drain")
+
+
+def receive_available(sock: socket.socket) -> bytes:
+    data = b''
+    while True:
+        try:
+            chunk = sock.recv(1 << 16)
+        except BlockingIOError:
+            return data
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_tuples_are_written_once_a_batch_is_full(sockets):
+    sender, receiver = sockets
+    writer = BatchWriter(sender, batch_size=3, batch_size_in_bytes=1 << 20, on_timeout=no_timeout)
+
+    async def write():
+        await writer.write(b'a')
+        await writer.write(b'bc', 2)
+        assert receive_available(receiver) == b'a' + b'bc'
+        await writer.write(b'd')
+        assert receive_available(receiver) == b''
+        await writer.flush()
+
+    asyncio.run(write())
+    assert receive_available(receiver) == b'd'
+    assert writer.number_of_batches == 2
+    assert writer.number_of_syscalls == 2
+
+
+def test_tuples_are_written_once_the_batch_size_in_bytes_is_reached(sockets):
+    sender, receiver = sockets
+    writer = BatchWriter(sender, batch_size=100, batch_size_in_bytes=8, on_timeout=no_timeout)
+
+    async def write():
+        await writer.write(b'1234')
+        assert receive_available(receiver) == b''
+        await writer.write(b'5678')
+        assert receive_available(receiver) == b'12345678'
+
+    asyncio.run(write())
+    assert writer.number_of_batches == 1
+
+
+def test_partial_writes_resume_at_the_first_unsent_byte(sockets):
+    sender, receiver = sockets
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    buffers = [bytes([i]) * 1000 for i in range(256)]
+    writer = BatchWriter(sender, batch_size=len(buffers), batch_size_in_bytes=1 << 30, on_timeout=no_timeout)
+    received = bytearray()
+
+    async def read():
+        loop = asyncio.get_running_loop()
+        while len(received) < 256 * 1000:
+            received.extend(await loop.sock_recv(receiver, 1 << 16))
+
+    async def write_and_read():
+        reader = asyncio.ensure_future(read())
+        for buffer in buffers:
+            await writer.write(buffer)
+        await reader
+
+    asyncio.run(write_and_read())
+    assert bytes(received) == b''.join(buffers)
+    assert writer.number_of_batches == 1
+    assert writer.number_of_syscalls > 1
+
+
+def test_timeout_is_awaited_while_the_send_buffer_is_full(sockets):
+    sender, receiver = sockets
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    data = b'x' * (1 << 16)
+    received = bytearray()
+    blocked = []
+
+    async def drain():
+        # the peer only reads after the writer reported the full buffer
+        received.extend(receive_available(receiver))
+
+    writer = BatchWriter(sender, batch_size=1, batch_size_in_bytes=0, on_timeout=drain)
+    writer.on_blocked = lambda: blocked.append(True)
+
+    asyncio.run(writer.write(data))
+    received.extend(receive_available(receiver))
+    assert bytes(received) == data
+    assert blocked
+
+
+def test_advance_keeps_the_unsent_tail():
+    buffers = [b'abc', b'de', b'f']
+    advance(buffers, 4)
+    assert [bytes(buffer) for buffer in buffers] == [b'e', b'f']
+
+    advance(buffers, 2)
+    assert buffers == []
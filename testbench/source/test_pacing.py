@@ -0,0 +1,99 @@
+import asyncio
+import math
+import time
+import types
+
+import pytest
+
+from pacing import MAX_LAG_IN_SECONDS, UNPACED_BATCH_SIZE, ConstantProfile, LinearRampProfile, Pacer, \
+    ShardedProfile
+
+
+def create_measurement():
+    return types.SimpleNamespace(pacing_timestamps=[], target_rates=[], achieved_rates=[], pacing_errors=[])
+
+
+def send(pacer: Pacer, number_of_batches: int, batch_size: int) -> float:
+    async def run():
+        pacer.start()
+        for _ in range(number_of_batches):
+            await pacer.pace(batch_size)
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - started
+
+
+def test_batches_are_sent_at_their_deadlines():
+    pacer = Pacer(ConstantProfile(10_000), create_measurement())
+    elapsed = send(pacer, 200, 10)
+    assert elapsed == pytest.approx(0.2, abs=0.02)
+    assert pacer.deadline - pacer.start_time == pytest.approx(0.2)
+
+
+def test_deadlines_follow_the_profile():
+    pacer = Pacer(LinearRampProfile(10_000, 30_000, 0.1), create_measurement())
+    elapsed = send(pacer, 300, 10)
+    # 2000 tuples during the ramp, the remaining 1000 at 30000 tuples/s
+    assert elapsed == pytest.approx(0.1 + 1000 / 30_000, abs=0.02)
+
+
+def test_spinning_yields_to_the_event_loop():
+    pacer = Pacer(ConstantProfile(20_000), create_measurement())
+    ticks = 0
+
+    async def count_ticks():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def run():
+        # deadlines are 0.5ms apart, so the pacer never sleeps in the event loop
+        counter = asyncio.ensure_future(count_ticks())
+        pacer.start()
+        for _ in range(100):
+            await pacer.pace(10)
+        counter.cancel()
+
+    asyncio.run(run())
+    assert ticks > 100
+
+
+def test_deadline_is_reset_when_the_source_falls_behind():
+    pacer = Pacer(ConstantProfile(1_000), create_measurement())
+
+    async def run():
+        pacer.start()
+        time.sleep(2 * MAX_LAG_IN_SECONDS)
+        await pacer.pace(1)
+        lagging_deadline = pacer.deadline
+        started = time.perf_counter()
+        await pacer.pace(1)
+        return lagging_deadline, time.perf_counter() - started
+
+    lagging_deadline, wait = asyncio.run(run())
+    assert lagging_deadline > pacer.start_time + MAX_LAG_IN_SECONDS
+    # the next tuple is paced from the reset deadline instead of being sent in a burst
+    assert wait == pytest.approx(0.001, abs=0.0005)
+
+
+def test_infinite_rate_disables_pacing():
+    measurement = create_measurement()
+    pacer = Pacer(ConstantProfile(math.inf), measurement)
+    assert send(pacer, 100, UNPACED_BATCH_SIZE) < 0.05
+    assert pacer.batch_size == UNPACED_BATCH_SIZE
+
+
+def test_achieved_rates_are_reported():
+    measurement = create_measurement()
+    send(Pacer(ConstantProfile(10_000), measurement), 350, 10)
+    assert len(measurement.pacing_timestamps) == 3
+    assert measurement.target_rates == [10_000] * 3
+    assert all(rate == pytest.approx(10_000, rel=0.1) for rate in measurement.achieved_rates)
+
+
+def test_sharded_profile_divides_the_rate():
+    profile = ShardedProfile(LinearRampProfile(1000, 3000, 1.0), 4)
+    assert profile.rate(0.5, 0) == pytest.approx(500)
+    assert profile.name == 'linear'
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import SendData
+from pacing import ConstantProfile
+from testbench.common.experiment import ExperimentAbortedException
+
+NUMBER_OF_WORKERS = 2
+# Seconds after which the abort is requested, the workers are blocked in a socket read by then
+ABORT_DELAY_IN_SECONDS = 0.5
+
+
+def send_in_parallel(context: SendData.TestContext, client_sockets, columns):
+    threading.Timer(ABORT_DELAY_IN_SECONDS, context.stop_signal.set).start()
+    started = time.monotonic()
+    with pytest.raises(ExperimentAbortedException):
+        asyncio.run(SendData.handle_clients_in_parallel(client_sockets, context, columns, ConstantProfile(1e9), 1000,
+                                                        'binary'))
+    return time.monotonic() - started
+
+
+@pytest.fixture
+def connections():
+    pairs = [socket.socketpair() for _ in range(NUMBER_OF_WORKERS)]
+    yield [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+    for client_socket, peer in pairs:
+        client_socket.close()
+        peer.close()
+
+
+def create_context() -> SendData.TestContext:
+    return SendData.TestContext(logging.getLogger("test"), 100, 0, batch_size=64, number_of_workers=NUMBER_OF_WORKERS)
+
+
+def create_columns(number_of_tuples: int) -> np.ndarray:
+    return np.arange(5 * number_of_tuples, dtype=np.int32).reshape(5, number_of_tuples)
+
+
+def test_abort_cancels_workers_waiting_for_the_start_message(connections):
+    client_sockets, _ = connections
+    assert send_in_parallel(create_context(), client_sockets, create_columns(1000)) < 5.0
+
+
+def test_abort_cancels_workers_waiting_for_an_ack(connections):
+    client_sockets, peers = connections
+    for client_socket, peer in zip(client_sockets, peers):
+        # a small send buffer that is never read fills up, so the workers send BACK and wait for an ACK
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        peer.sendall(b"SEND TUPLES!")
+    assert send_in_parallel(create_context(), client_sockets, create_columns(100_000)) < 5.0
@@ -0,0 +1,25 @@
+from typing import List
+
+import numpy as np
+
+
+class Shard:
+
+    def __init__(self, index: int, columns: np.ndarray, first_tuple_id: int) -> None:
+        super().__init__()
+        self.index = index
+        self.columns = columns
+        self.first_tuple_id = first_tuple_id
+
+
+def shard_dataset(columns: np.ndarray, number_of_shards: int, scale: int) -> List[Shard]:
+    """
+    Splits the dataset into contiguous shards. Every shard sends its tuples `scale` times, the tuple ids of a shard
+    start after the ids of all preceding shards, so the id ranges of the workers are disjoint.
+    """
+    shards = []
+    first_tuple_id = 0
+    for index, shard_columns in enumerate(np.array_split(columns, number_of_shards, axis=1)):
+        shards.append(Shard(index, shard_columns, first_tuple_id))
+        first_tuple_id += shard_columns.shape[1] * scale
+    return shards